@@ -50,6 +50,8 @@ if not requirements_path.exists():
         "dearpygui",
         "colorama",
         "pandas",
+        "numpy",
+        "pyarrow",
         "pymongo",
         "py7zr",
         "rarfile",
@@ -58,6 +60,9 @@ if not requirements_path.exists():
         "tqdm",
         "msal",
         "dash",
+        "gunicorn",
+        "waitress",
+        "flask-compress",
         "python-dotenv",
         "geopandas",
         "pycountry",
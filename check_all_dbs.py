@@ -1,11 +1,21 @@
 import os
 import re
+import sys
 import csv
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+# Usage:
+#   python3 check_all_dbs.py                          yesterday's counts per collection (default)
+#   python3 check_all_dbs.py --rollup [--since DATE]  incremental daily rollup into db_counts/rollup.sqlite
+#       --since YYYY-MM-DD  first run: count from DATE only; later runs: backfill back to DATE
+#   python3 check_all_dbs.py --concurrent [--workers N]  yesterday's counts, issued from a thread pool
+#       --workers N  concurrent count_documents calls (default: check_all_dbs_workers in .env, or 16)
+
 # -----------------------------------
 # Load environment variables
 # -----------------------------------
@@ -17,6 +27,12 @@ mongo_auth_source = os.getenv("mongo_auth_source", "admin")
 mongo_host = os.getenv("mongo_host", "127.0.0.1")
 mongo_port = int(os.getenv("mongo_port", 27017))
 
+concurrent_mode = "--concurrent" in sys.argv
+scan_workers = int(os.getenv("check_all_dbs_workers", 16))
+if "--workers" in sys.argv:
+    scan_workers = int(sys.argv[sys.argv.index("--workers") + 1])
+scan_workers = max(1, scan_workers)
+
 # -----------------------------------
 # MongoDB connection
 # -----------------------------------
@@ -26,7 +42,8 @@ mongo_uri = (
     f"?authSource={mongo_auth_source}"
 )
 
-client = MongoClient(mongo_uri)
+# Keep a pooled connection for every worker so counts never queue for a socket
+client = MongoClient(mongo_uri, maxPoolSize=max(100, scan_workers + 4))
 
 # -----------------------------------
 # Date boundaries (UTC)
@@ -51,6 +68,134 @@ db_names = sorted(
     if db_pattern.search(db)
 )
 
+# -----------------------------------
+# Rollup mode: one $group per collection, only changed days re-counted
+# -----------------------------------
+if "--rollup" in sys.argv:
+    from db_counts_rollup import open_rollup_store, rollup_database
+
+    since = None
+    if "--since" in sys.argv:
+        since = sys.argv[sys.argv.index("--since") + 1]
+        datetime.strptime(since, "%Y-%m-%d")
+
+    conn = open_rollup_store()
+    try:
+        for db_name in tqdm(db_names, desc="Rolling up databases", unit="db"):
+            changed_days = rollup_database(conn, client[db_name], since=since)
+            if changed_days:
+                print(f"\n{db_name}: {len(changed_days)} day(s) updated "
+                      f"({min(changed_days)} → {max(changed_days)})")
+    finally:
+        conn.close()
+    sys.exit(0)
+
+# -----------------------------------
+# CSV + tree output per DB
+# -----------------------------------
+def write_db_counts(db_name, rows):
+    if not rows:
+        return
+    db_output_dir = os.path.join(BASE_OUTPUT_DIR, db_name)
+    os.makedirs(db_output_dir, exist_ok=True)
+
+    csv_path = os.path.join(
+        db_output_dir,
+        f"{db_name}_{date_str}.csv"
+    )
+
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "database_name",
+            "collection_name",
+            "date",
+            "document_count"
+        ])
+        writer.writerows(rows)
+
+    # Tree-style console output
+    print(f"\n{db_name}")
+    for i, (_, col_name, _, count) in enumerate(rows):
+        prefix = "└──" if i == len(rows) - 1 else "├──"
+        print(f"{prefix} {col_name:<35} [{count}]")
+
+
+def count_collection(db_name, col_name):
+    return client[db_name][col_name].count_documents({
+        "extracted_date": {
+            "$gte": yesterday,
+            "$lt": today
+        }
+    })
+
+
+# -----------------------------------
+# Concurrent mode: bounded pool, CSVs written as each DB completes
+# -----------------------------------
+if concurrent_mode:
+    started = time.perf_counter()
+    # At most this many counts are submitted but not finished at any time
+    max_in_flight = scan_workers * 2
+    in_flight = set()
+    future_meta = {}
+    pending = {}        # db_name -> collections still being counted
+    db_rows = {}
+    ops_done = 0
+    errors = 0
+    databases_done = 0
+
+    # Submission and bookkeeping stay on this thread; workers only run count_documents
+    def scan_tasks():
+        for db_name in db_names:
+            collections = client[db_name].list_collection_names()
+            if not collections:
+                continue
+            pending[db_name] = len(collections)
+            db_rows[db_name] = []
+            for col_name in collections:
+                yield db_name, col_name
+
+    def collect(done):
+        global ops_done, errors, databases_done
+        for future in done:
+            db_name, col_name = future_meta.pop(future)
+            try:
+                count = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"\n❌ {db_name}.{col_name}: {e}")
+                count = 0
+            ops_done += 1
+            progress.update(1)
+
+            if count > 0:
+                db_rows[db_name].append([db_name, col_name, date_str, count])
+            pending[db_name] -= 1
+            if pending[db_name] == 0:
+                rows = sorted(db_rows.pop(db_name), key=lambda row: row[1])
+                del pending[db_name]
+                write_db_counts(db_name, rows)
+                databases_done += 1
+
+    with ThreadPoolExecutor(max_workers=scan_workers) as pool, \
+            tqdm(desc=f"Counting ({scan_workers} workers)", unit="col") as progress:
+        for db_name, col_name in scan_tasks():
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = pool.submit(count_collection, db_name, col_name)
+            future_meta[future] = (db_name, col_name)
+            in_flight.add(future)
+        done, _ = wait(in_flight)
+        collect(done)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n[Summary] {databases_done} database(s), {ops_done} count(s) in {elapsed:.2f}s "
+          f"→ {ops_done / elapsed if elapsed else 0:.1f} ops/sec "
+          f"({scan_workers} workers, max {max_in_flight} in flight, {errors} error(s))")
+    sys.exit(0)
+
 # -----------------------------------
 # Scan databases with progress bars
 # -----------------------------------
@@ -66,14 +211,7 @@ for db_name in tqdm(db_names, desc="Scanning databases", unit="db"):
         unit="col",
         leave=False
     ):
-        col = db[col_name]
-
-        count = col.count_documents({
-            "extracted_date": {
-                "$gte": yesterday,
-                "$lt": today
-            }
-        })
+        count = count_collection(db_name, col_name)
 
         if count > 0:
             rows.append([
@@ -83,30 +221,4 @@ for db_name in tqdm(db_names, desc="Scanning databases", unit="db"):
                 count
             ])
 
-    # -----------------------------------
-    # Write CSV per DB
-    # -----------------------------------
-    if rows:
-        db_output_dir = os.path.join(BASE_OUTPUT_DIR, db_name)
-        os.makedirs(db_output_dir, exist_ok=True)
-
-        csv_path = os.path.join(
-            db_output_dir,
-            f"{db_name}_{date_str}.csv"
-        )
-
-        with open(csv_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "database_name",
-                "collection_name",
-                "date",
-                "document_count"
-            ])
-            writer.writerows(rows)
-
-        # Tree-style console output
-        print(f"\n{db_name}")
-        for i, (_, col_name, _, count) in enumerate(rows):
-            prefix = "└──" if i == len(rows) - 1 else "├──"
-            print(f"{prefix} {col_name:<35} [{count}]")
+    write_db_counts(db_name, rows)
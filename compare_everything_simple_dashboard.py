@@ -1,33 +1,145 @@
 import os
+import time
+import threading
+import numpy as np
 import pandas as pd
-from dash import Dash, dcc, html, Input, Output, State
+from dash import Dash, dcc, html, dash_table, Input, Output, State
 import plotly.express as px
+from dashboard_table_query import PAGE_SIZE, apply_table_query
 
 BASE_DATA_DIR = "db_counts"
+# How often (seconds) callbacks may re-check the folders for new or changed CSVs
+CUBE_REFRESH_SECONDS = 5
+
+CUBE_COLUMNS = ["database", "collection_name", "date", "document_count"]
 
 # -------------------------------------------------
-# Helpers
+# Counts cube
 # -------------------------------------------------
+# Every db_counts/<db>/<db>_<date>.csv is loaded once into one long frame
+# (database, collection_name, date, document_count). Each database keeps the
+# signature it was loaded with; only databases whose folder changed are re-read.
+_cube_lock = threading.Lock()
+_cube = {
+    "frame": pd.DataFrame(columns=CUBE_COLUMNS),
+    "db_frames": {},
+    "db_signatures": {},
+    "loaded": False,
+    "checked_at": 0.0,
+}
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
 def list_databases():
+    if not os.path.isdir(BASE_DATA_DIR):
+        return []
     return sorted(
-        d for d in os.listdir(BASE_DATA_DIR)
-        if os.path.isdir(os.path.join(BASE_DATA_DIR, d))
+        entry.name for entry in os.scandir(BASE_DATA_DIR)
+        if entry.is_dir()
     )
 
 
-def list_dates(db):
+def _db_signature(db):
+    # A same-day re-run or a --rollup export rewrites <db>_<date>.csv in place, which leaves the
+    # folder mtime unchanged, so the newest CSV mtime is part of the signature too
     path = os.path.join(BASE_DATA_DIR, db)
-    return sorted(
-        f.rsplit("_", 1)[-1].replace(".csv", "")
-        for f in os.listdir(path)
-        if f.endswith(".csv")
-    )
+    try:
+        with os.scandir(path) as entries:
+            newest_csv = max((entry.stat().st_mtime_ns for entry in entries if entry.name.endswith(".csv")), default=0)
+    except OSError:
+        newest_csv = 0
+    return (_mtime_ns(path), newest_csv)
+
+
+def _load_db_frame(db):
+    path = os.path.join(BASE_DATA_DIR, db)
+    frames = []
+    for f in os.listdir(path):
+        if not f.endswith(".csv"):
+            continue
+        date = f.rsplit("_", 1)[-1].replace(".csv", "")
+        df = pd.read_csv(os.path.join(path, f), usecols=["collection_name", "document_count"])
+        df["date"] = date
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    df["database"] = db
+    return df[CUBE_COLUMNS]
+
+
+def get_cube():
+    """The counts cube, refreshed when db_counts/ or one of its database folders changed."""
+    with _cube_lock:
+        now = time.monotonic()
+        if _cube["loaded"] and now - _cube["checked_at"] < CUBE_REFRESH_SECONDS:
+            return _cube["frame"]
+        _cube["checked_at"] = now
+
+        db_names = list_databases()
+        changed = False
+
+        for db in db_names:
+            signature = _db_signature(db)
+            if _cube["db_signatures"].get(db) != signature:
+                _cube["db_frames"][db] = _load_db_frame(db)
+                _cube["db_signatures"][db] = signature
+                changed = True
+
+        for db in set(_cube["db_frames"]) - set(db_names):
+            del _cube["db_frames"][db]
+            del _cube["db_signatures"][db]
+            changed = True
+
+        if changed or not _cube["loaded"]:
+            frames = [frame for frame in _cube["db_frames"].values() if not frame.empty]
+            cube = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CUBE_COLUMNS)
+            cube["document_count"] = cube["document_count"].astype("int64")
+            for col in ("database", "collection_name", "date"):
+                cube[col] = cube[col].astype("category")
+            _cube["frame"] = cube
+        _cube["loaded"] = True
+        return _cube["frame"]
+
+
+def list_dates(db=None):
+    cube = get_cube()
+    if db is not None:
+        cube = cube[cube["database"] == db]
+    return sorted(cube["date"].unique().tolist())
+
+
+def cube_slice(selected_dbs, dates, collections=None):
+    cube = get_cube()
+    mask = cube["database"].isin(selected_dbs) & cube["date"].isin(dates)
+    if collections:
+        mask &= cube["collection_name"].isin(collections)
+    df = cube[mask]
+    # Drop unused categories so groupby/pivot only see what was selected
+    return df.assign(**{col: df[col].astype(str) for col in ("database", "collection_name", "date")})
 
 
 def load_db_date(db, date):
-    path = os.path.join(BASE_DATA_DIR, db, f"{db}_{date}.csv")
-    df = pd.read_csv(path)
-    return df[["collection_name", "document_count"]]
+    df = cube_slice([db], [date])
+    return df[["collection_name", "document_count"]].reset_index(drop=True)
+
+
+def comparison_matrix(selected_dbs, date):
+    """collections x databases counts for one date, zero-filled, columns in selection order."""
+    df = cube_slice(selected_dbs, [date])
+    return df.pivot_table(
+        index="collection_name",
+        columns="database",
+        values="document_count",
+        aggfunc="sum",
+        fill_value=0
+    ).reindex(columns=selected_dbs, fill_value=0)
 
 
 # -------------------------------------------------
@@ -109,82 +221,186 @@ app.index_string = """
 """
 
 # -------------------------------------------------
-# Data
+# Layout (built per page load so new dates/databases show up)
 # -------------------------------------------------
-dbs = list_databases()
-default_db = dbs[0]
-dates = list_dates(default_db)
+TREND_DEFAULT_DAYS = 7
+
+CELL_STYLE = {"border": "1px solid #334155", "padding": "6px"}
+VALUE_COLORS = ["#e5e7eb", "#dc2626", "#16a34a", "#94a3b8"]
+
+
+def serve_layout():
+    dbs = list_databases()
+    default_db = dbs[0] if dbs else None
+    dates = list_dates()
+    collections = sorted(get_cube()["collection_name"].astype(str).unique().tolist())
+
+    return html.Div(
+        style={
+            "minHeight": "100vh",
+            "padding": "20px",
+            "fontFamily": "Inter, system-ui"
+        },
+        children=[
+
+            html.H2("Multi-Database Collection Comparison"),
+
+            html.P(
+                "All values are absolute. "
+                "For each collection: Red = highest value, Green = lowest value.",
+                style={"color": "#94a3b8", "marginBottom": "12px"}
+            ),
+
+            html.Div(
+                style={
+                    "display": "grid",
+                    "gridTemplateColumns": "2fr 1fr",
+                    "gap": "12px",
+                    "marginBottom": "20px"
+                },
+                children=[
+                    dcc.Dropdown(
+                        id="db-select",
+                        options=[{"label": d, "value": d} for d in dbs],
+                        value=[default_db] if default_db else [],
+                        multi=True,
+                        placeholder="Select databases",
+                        className="dark-dropdown"
+                    ),
+                    dcc.Dropdown(
+                        id="date-select",
+                        options=[{"label": d, "value": d} for d in dates],
+                        value=dates[-1] if dates else None,
+                        placeholder="Select date",
+                        className="dark-dropdown"
+                    )
+                ]
+            ),
+
+            dcc.Graph(id="chart"),
+
+            html.H4("Trend", style={"marginTop": "24px"}),
+
+            html.Div(
+                style={
+                    "display": "grid",
+                    "gridTemplateColumns": "1fr 1fr",
+                    "gap": "12px",
+                    "marginBottom": "12px"
+                },
+                children=[
+                    dcc.Dropdown(
+                        id="trend-dates",
+                        options=[{"label": d, "value": d} for d in dates],
+                        value=dates[-TREND_DEFAULT_DAYS:],
+                        multi=True,
+                        placeholder="Select dates for the trend",
+                        className="dark-dropdown"
+                    ),
+                    dcc.Dropdown(
+                        id="trend-collections",
+                        options=[{"label": c, "value": c} for c in collections],
+                        value=[],
+                        multi=True,
+                        placeholder="All collections",
+                        className="dark-dropdown"
+                    )
+                ]
+            ),
+
+            dcc.Graph(id="trend-chart"),
+
+            html.H4("Comparison Table", style={"marginTop": "24px"}),
+
+            # Only the visible page is sent; paging/sorting/filtering run on the server
+            dash_table.DataTable(
+                id="comparison-table",
+                columns=[],
+                data=[],
+                page_current=0,
+                page_size=PAGE_SIZE,
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
+                style_table={"overflowX": "auto", "marginTop": "12px"},
+                style_header={
+                    "backgroundColor": "#020617",
+                    "color": "#e5e7eb",
+                    "border": "1px solid #334155",
+                    "padding": "8px",
+                    "fontWeight": "600"
+                },
+                style_filter={"backgroundColor": "#0f172a", "color": "#e5e7eb"},
+                style_cell={
+                    **CELL_STYLE,
+                    "backgroundColor": "#020617",
+                    "color": "#e5e7eb",
+                    "fontSize": "13px",
+                    "textAlign": "left"
+                },
+                style_data={"fontWeight": "600"}
+            ),
+
+            html.Br(),
+
+            html.Button(
+                "Download Comparison CSV",
+                id="download-btn",
+                n_clicks=0,
+                style={
+                    "backgroundColor": "#020617",
+                    "color": "#e5e7eb",
+                    "border": "1px solid #334155",
+                    "padding": "8px 14px",
+                    "borderRadius": "6px",
+                    "cursor": "pointer"
+                }
+            ),
+
+            dcc.Download(id="download-csv")
+        ]
+    )
+
+
+app.layout = serve_layout
+
 
 # -------------------------------------------------
-# Layout
+# Table styles
 # -------------------------------------------------
-app.layout = html.Div(
-    style={
-        "minHeight": "100vh",
-        "padding": "20px",
-        "fontFamily": "Inter, system-ui"
-    },
-    children=[
-
-        html.H2("Multi-Database Collection Comparison"),
-
-        html.P(
-            "All values are absolute. "
-            "For each collection: Red = highest value, Green = lowest value.",
-            style={"color": "#94a3b8", "marginBottom": "12px"}
-        ),
-
-        html.Div(
-            style={
-                "display": "grid",
-                "gridTemplateColumns": "2fr 1fr",
-                "gap": "12px",
-                "marginBottom": "20px"
-            },
-            children=[
-                dcc.Dropdown(
-                    id="db-select",
-                    options=[{"label": d, "value": d} for d in dbs],
-                    value=[default_db],
-                    multi=True,
-                    placeholder="Select databases",
-                    className="dark-dropdown"
-                ),
-                dcc.Dropdown(
-                    id="date-select",
-                    options=[{"label": d, "value": d} for d in dates],
-                    value=dates[-1],
-                    placeholder="Select date",
-                    className="dark-dropdown"
-                )
-            ]
-        ),
-
-        dcc.Graph(id="chart"),
-
-        html.H4("Comparison Table", style={"marginTop": "24px"}),
-
-        html.Div(id="comparison-table"),
-
-        html.Br(),
-
-        html.Button(
-            "Download Comparison CSV",
-            id="download-btn",
-            n_clicks=0,
-            style={
-                "backgroundColor": "#020617",
-                "color": "#e5e7eb",
-                "border": "1px solid #334155",
-                "padding": "8px 14px",
-                "borderRadius": "6px",
-                "cursor": "pointer"
-            }
-        ),
-
-        dcc.Download(id="download-csv")
+def comparison_cell_styles(page_df, db_columns):
+    """Highest/lowest colours for the cells of one page, computed for all cells at once."""
+    if page_df.empty or not db_columns:
+        return []
+    values = page_df[db_columns].to_numpy()
+    row_max = values.max(axis=1, keepdims=True)
+    row_min = values.min(axis=1, keepdims=True)
+
+    # 0 = neither, 1 = highest, 2 = lowest, 3 = all equal
+    color_index = np.where(values == row_max, 1, np.where(values == row_min, 2, 0))
+    color_index[(row_max == row_min).ravel()] = 3
+
+    # Plain cells keep the default colour, so only highlighted cells need a style entry
+    row_idx, col_idx = np.nonzero(color_index)
+    columns = np.asarray(db_columns, dtype=object)
+    return [
+        {"if": {"row_index": int(r), "column_id": columns[c]}, "color": VALUE_COLORS[color_index[r, c]]}
+        for r, c in zip(row_idx.tolist(), col_idx.tolist())
     ]
-)
+
+
+def dark_layout(fig, **kwargs):
+    fig.update_layout(
+        plot_bgcolor="#020617",
+        paper_bgcolor="#020617",
+        font_color="#e5e7eb",
+        legend_title_text="Database",
+        **kwargs
+    )
+    return fig
 
 
 # -------------------------------------------------
@@ -192,22 +408,14 @@ app.layout = html.Div(
 # -------------------------------------------------
 @app.callback(
     Output("chart", "figure"),
-    Output("comparison-table", "children"),
     Input("db-select", "value"),
     Input("date-select", "value")
 )
 def update_dashboard(selected_dbs, date):
     if not selected_dbs or not date:
-        return {}, ""
-
-    frames = []
-
-    for db in selected_dbs:
-        df = load_db_date(db, date)
-        df["database"] = db
-        frames.append(df)
+        return {}
 
-    combined = pd.concat(frames)
+    combined = cube_slice(selected_dbs, [date])
 
     # -----------------------------
     # Chart
@@ -220,84 +428,60 @@ def update_dashboard(selected_dbs, date):
         barmode="group",
         title="Document Counts per Collection"
     )
+    return dark_layout(fig, xaxis_title="Collection", yaxis_title="Document Count")
 
-    fig.update_layout(
-        plot_bgcolor="#020617",
-        paper_bgcolor="#020617",
-        font_color="#e5e7eb",
-        legend_title_text="Database",
-        xaxis_title="Collection",
-        yaxis_title="Document Count"
-    )
 
-    # -----------------------------
-    # Smart comparison table
-    # -----------------------------
-    table_df = combined.pivot_table(
-        index="collection_name",
-        columns="database",
-        values="document_count",
-        fill_value=0
-    ).reset_index()
+# -----------------------------
+# Smart comparison table (one page at a time)
+# -----------------------------
+@app.callback(
+    Output("comparison-table", "columns"),
+    Output("comparison-table", "data"),
+    Output("comparison-table", "page_count"),
+    Output("comparison-table", "style_data_conditional"),
+    Input("db-select", "value"),
+    Input("date-select", "value"),
+    Input("comparison-table", "page_current"),
+    Input("comparison-table", "page_size"),
+    Input("comparison-table", "sort_by"),
+    Input("comparison-table", "filter_query")
+)
+def update_comparison_table(selected_dbs, date, page_current, page_size, sort_by, filter_query):
+    if not selected_dbs or not date:
+        return [], [], 1, []
 
-    header = html.Tr(
-        [html.Th("Collection", style={"border": "1px solid #334155", "padding": "8px"})] +
-        [html.Th(db, style={"border": "1px solid #334155", "padding": "8px"})
-         for db in selected_dbs]
-    )
+    matrix = comparison_matrix(selected_dbs, date).reset_index()
+    matrix.columns.name = None
+    page_df, page_count = apply_table_query(matrix, page_current, page_size, sort_by, filter_query)
+
+    columns = [{"name": "Collection", "id": "collection_name", "type": "text"}] + [
+        {"name": db, "id": db, "type": "numeric"} for db in selected_dbs
+    ]
+    return columns, page_df.to_dict("records"), page_count, comparison_cell_styles(page_df, list(selected_dbs))
 
-    rows = []
 
-    for _, row in table_df.iterrows():
-        values = [row[db] for db in selected_dbs]
-        max_val = max(values)
-        min_val = min(values)
+@app.callback(
+    Output("trend-chart", "figure"),
+    Input("db-select", "value"),
+    Input("trend-dates", "value"),
+    Input("trend-collections", "value")
+)
+def update_trend(selected_dbs, trend_dates, trend_collections):
+    if not selected_dbs or not trend_dates:
+        return {}
 
-        cells = [
-            html.Td(
-                row["collection_name"],
-                style={"border": "1px solid #334155", "padding": "6px"}
-            )
-        ]
+    df = cube_slice(selected_dbs, trend_dates, trend_collections)
+    totals = df.groupby(["database", "date"], as_index=False)["document_count"].sum().sort_values("date")
 
-        for db in selected_dbs:
-            val = row[db]
-
-            if max_val == min_val:
-                color = "#94a3b8"
-            elif val == max_val:
-                color = "#dc2626"
-            elif val == min_val:
-                color = "#16a34a"
-            else:
-                color = "#e5e7eb"
-
-            cells.append(
-                html.Td(
-                    int(val),
-                    style={
-                        "border": "1px solid #334155",
-                        "padding": "6px",
-                        "fontWeight": "600",
-                        "color": color
-                    }
-                )
-            )
-
-        rows.append(html.Tr(cells))
-
-    table = html.Table(
-        [header] + rows,
-        style={
-            "width": "100%",
-            "borderCollapse": "collapse",
-            "marginTop": "12px",
-            "fontSize": "13px",
-            "backgroundColor": "#020617"
-        }
+    fig = px.line(
+        totals,
+        x="date",
+        y="document_count",
+        color="database",
+        markers=True,
+        title="Document Counts over Time" + (" (selected collections)" if trend_collections else "")
     )
-
-    return fig, table
+    return dark_layout(fig, xaxis_title="Date", yaxis_title="Document Count", xaxis_type="category")
 
 
 # -------------------------------------------------
@@ -314,22 +498,24 @@ def download_csv(n_clicks, selected_dbs, date):
     if not selected_dbs or not date:
         return None
 
-    frames = []
+    merged = comparison_matrix(selected_dbs, date).reset_index()
+    merged.columns.name = None
 
-    for db in selected_dbs:
-        df = load_db_date(db, date)
-        df = df.rename(columns={"document_count": db})
-        frames.append(df)
+    filename = f"comparison_{date}.csv"
 
-    merged = frames[0]
-    for df in frames[1:]:
-        merged = merged.merge(df, on="collection_name", how="outer")
+    return dcc.send_data_frame(merged.to_csv, filename, index=False)
 
-    merged = merged.fillna(0).astype({db: int for db in selected_dbs})
 
-    filename = f"comparison_{date}.csv"
+# -------------------------------------------------
+# Production serving
+# -------------------------------------------------
+# WSGI entry point for serve_dashboards.py (gunicorn/waitress)
+server = app.server
 
-    return dcc.send_data_frame(merged.to_csv, filename, index=False)
+
+def warm_cache():
+    """Build the counts cube before workers start, so it is shared copy-on-write."""
+    get_cube()
 
 
 # -------------------------------------------------
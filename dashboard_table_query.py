@@ -0,0 +1,87 @@
+import pandas as pd
+
+# ========== SERVER-SIDE TABLES FOR THE DASHBOARDS ==========
+# DataTables with page_action/sort_action/filter_action="custom" send their page, sort_by and
+# filter_query to a callback; apply_table_query() answers with just the rows of that page.
+
+PAGE_SIZE = 25
+
+FILTER_OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+def split_filter_part(filter_part):
+    """'{col} op value' -> (col, op, value), following the DataTable filter syntax."""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(operator, 1)
+            name = name_part[name_part.find("{") + 1: name_part.rfind("}")]
+
+            value_part = value_part.strip()
+            v0 = value_part[0] if value_part else ""
+            if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                value = value_part[1:-1].replace("\\" + v0, v0)
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+
+            # "contains " / "datestartswith " carry their trailing space only for matching
+            return name, operator_type[0].strip(), value
+    return None, None, None
+
+
+def apply_filter(df, filter_query):
+    for filter_part in (filter_query or "").split(" && "):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        column = df[col_name]
+        if operator in ("eq", "ne", "lt", "le", "gt", "ge"):
+            if isinstance(value, float) and not pd.api.types.is_numeric_dtype(column):
+                value = str(value).removesuffix(".0")
+            if operator == "eq":
+                df = df[column == value]
+            elif operator == "ne":
+                df = df[column != value]
+            elif operator == "lt":
+                df = df[column < value]
+            elif operator == "le":
+                df = df[column <= value]
+            elif operator == "gt":
+                df = df[column > value]
+            else:
+                df = df[column >= value]
+        elif operator == "contains":
+            df = df[column.astype(str).str.contains(str(value), case=False, regex=False, na=False)]
+        elif operator == "datestartswith":
+            df = df[column.astype(str).str.startswith(str(value), na=False)]
+    return df
+
+
+def apply_table_query(df, page_current, page_size, sort_by, filter_query):
+    """Filter, sort and page df. Returns (page as a DataFrame, page_count)."""
+    df = apply_filter(df, filter_query)
+    if sort_by:
+        df = df.sort_values(
+            [col["column_id"] for col in sort_by],
+            ascending=[col["direction"] == "asc" for col in sort_by],
+            kind="stable"
+        )
+
+    page_size = page_size or PAGE_SIZE
+    page_count = max(1, -(-len(df) // page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    start = page_current * page_size
+    return df.iloc[start:start + page_size], page_count
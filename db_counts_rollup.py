@@ -0,0 +1,207 @@
+import os
+import csv
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from knowledgebase_storage import is_report_collection
+
+# ========== DAILY ROLLUP STORE ==========
+# db_counts/rollup.sqlite keeps one row per (database, collection, day) with the number of
+# documents whose extracted_date falls on that day, plus per-collection state:
+#   last_id        newest _id counted so far; newer ObjectIds mark the days that changed
+#   covered_since  earliest day counted ("" = full history), so --since can backfill further back
+
+BASE_OUTPUT_DIR = "db_counts"
+ROLLUP_DB_PATH = os.path.join(BASE_OUTPUT_DIR, "rollup.sqlite")
+
+DAY_EXPRESSION = {"$dateToString": {"format": "%Y-%m-%d", "date": "$extracted_date"}}
+
+
+def open_rollup_store(path=ROLLUP_DB_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_counts (
+            database_name   TEXT NOT NULL,
+            collection_name TEXT NOT NULL,
+            day             TEXT NOT NULL,
+            document_count  INTEGER NOT NULL,
+            counted_at      TEXT NOT NULL,
+            PRIMARY KEY (database_name, collection_name, day)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_counts_day ON daily_counts (day, database_name)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS collection_state (
+            database_name   TEXT NOT NULL,
+            collection_name TEXT NOT NULL,
+            last_id         TEXT,
+            covered_since   TEXT NOT NULL DEFAULT '',
+            updated_at      TEXT NOT NULL,
+            PRIMARY KEY (database_name, collection_name)
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def get_collection_state(conn, db_name, coll_name):
+    row = conn.execute(
+        "SELECT last_id, covered_since FROM collection_state WHERE database_name = ? AND collection_name = ?",
+        (db_name, coll_name)
+    ).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def save_collection_state(conn, db_name, coll_name, last_id, covered_since):
+    conn.execute("""
+        INSERT INTO collection_state (database_name, collection_name, last_id, covered_since, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (database_name, collection_name)
+        DO UPDATE SET last_id = excluded.last_id, covered_since = excluded.covered_since, updated_at = excluded.updated_at
+    """, (db_name, coll_name, last_id, covered_since, datetime.now(timezone.utc).isoformat()))
+
+
+def upsert_day_counts(conn, db_name, coll_name, day_counts):
+    counted_at = datetime.now(timezone.utc).isoformat()
+    conn.executemany("""
+        INSERT INTO daily_counts (database_name, collection_name, day, document_count, counted_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (database_name, collection_name, day)
+        DO UPDATE SET document_count = excluded.document_count, counted_at = excluded.counted_at
+    """, [(db_name, coll_name, day, count, counted_at) for day, count in day_counts.items()])
+
+
+def stored_days(conn, db_name, coll_name):
+    return [row[0] for row in conn.execute(
+        "SELECT day FROM daily_counts WHERE database_name = ? AND collection_name = ?",
+        (db_name, coll_name)
+    )]
+
+
+def load_day_rows(conn, db_name, day):
+    return conn.execute("""
+        SELECT database_name, collection_name, day, document_count FROM daily_counts
+        WHERE database_name = ? AND day = ? AND document_count > 0
+        ORDER BY collection_name
+    """, (db_name, day)).fetchall()
+
+
+# ========== MONGO SIDE ==========
+
+def _day_start(day):
+    return datetime.strptime(day, "%Y-%m-%d")
+
+
+def group_counts_by_day(collection, match):
+    """One $group over extracted_date: {"YYYY-MM-DD": count} for documents matching `match`."""
+    pipeline = [
+        {"$match": {**match, "extracted_date": {**match.get("extracted_date", {}), "$type": "date"}}},
+        {"$group": {"_id": DAY_EXPRESSION, "count": {"$sum": 1}}}
+    ]
+    return {doc["_id"]: doc["count"] for doc in collection.aggregate(pipeline, allowDiskUse=True) if doc["_id"]}
+
+
+def changed_days_since(collection, last_id):
+    """Days touched by documents inserted after last_id (ObjectIds grow with insertion time)."""
+    pipeline = [
+        {"$match": {"_id": {"$gt": last_id}, "extracted_date": {"$type": "date"}}},
+        {"$group": {"_id": DAY_EXPRESSION}}
+    ]
+    return sorted(doc["_id"] for doc in collection.aggregate(pipeline, allowDiskUse=True) if doc["_id"])
+
+
+def recount_days(collection, days):
+    if not days:
+        return {}
+    windows = [
+        {"extracted_date": {"$gte": _day_start(day), "$lt": _day_start(day) + timedelta(days=1)}}
+        for day in days
+    ]
+    counts = group_counts_by_day(collection, {"$or": windows})
+    # Days that no longer have documents are stored as 0 rather than left stale
+    return {day: counts.get(day, 0) for day in days}
+
+
+def newest_id(collection):
+    doc = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return doc["_id"] if doc else None
+
+
+def rollup_collection(conn, collection, db_name, since=None):
+    """
+    Bring one collection's daily counts up to date. Returns the days whose counts were
+    (re)written. `since` is a YYYY-MM-DD string or None for the full history.
+    """
+    from bson import ObjectId
+
+    coll_name = collection.name
+    state = get_collection_state(conn, db_name, coll_name)
+    # Read the high-water mark first: anything inserted while counting is picked up next run
+    current_id = newest_id(collection)
+    touched = {}
+
+    if state is None:
+        match = {"extracted_date": {"$gte": _day_start(since)}} if since else {}
+        touched.update(group_counts_by_day(collection, match))
+        covered_since = since or ""
+    else:
+        last_id, covered_since = state
+        if since and covered_since and since < covered_since:
+            # Backfill only the range before what is already covered
+            touched.update(group_counts_by_day(collection, {
+                "extracted_date": {"$gte": _day_start(since), "$lt": _day_start(covered_since)}
+            }))
+            covered_since = since
+
+        if current_id is not None and last_id is None:
+            # Empty at the last run (created by an index build or emptied by archival): nothing to diff
+            # against, so count the whole covered range and zero days that no longer have documents
+            match = {"extracted_date": {"$gte": _day_start(covered_since)}} if covered_since else {}
+            counts = group_counts_by_day(collection, match)
+            for day in stored_days(conn, db_name, coll_name):
+                if day not in counts and (not covered_since or day >= covered_since):
+                    counts[day] = 0
+            touched.update(counts)
+        elif current_id is not None and str(current_id) != last_id:
+            days = changed_days_since(collection, ObjectId(last_id))
+            if covered_since:
+                days = [day for day in days if day >= covered_since]
+            touched.update(recount_days(collection, days))
+
+    if touched:
+        upsert_day_counts(conn, db_name, coll_name, touched)
+    save_collection_state(conn, db_name, coll_name, str(current_id) if current_id else None, covered_since)
+    conn.commit()
+    return set(touched)
+
+
+def export_day_csvs(conn, db_name, days, base_output_dir=BASE_OUTPUT_DIR):
+    """Rewrite db_counts/<db>/<db>_<day>.csv for the given days from the rollup store.
+    A day with no rows left has its CSV removed, so the dashboard does not keep stale counts."""
+    written = []
+    db_output_dir = os.path.join(base_output_dir, db_name)
+    for day in sorted(days):
+        rows = load_day_rows(conn, db_name, day)
+        csv_path = os.path.join(db_output_dir, f"{db_name}_{day}.csv")
+        if not rows:
+            if os.path.exists(csv_path):
+                os.remove(csv_path)
+            continue
+        os.makedirs(db_output_dir, exist_ok=True)
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["database_name", "collection_name", "date", "document_count"])
+            writer.writerows(rows)
+        written.append(csv_path)
+    return written
+
+
+def rollup_database(conn, db, since=None):
+    """Roll up every report collection of one database and refresh its CSVs. Returns the changed days."""
+    changed_days = set()
+    for coll_name in db.list_collection_names():
+        if not is_report_collection(coll_name):
+            continue
+        changed_days |= rollup_collection(conn, db[coll_name], db.name, since=since)
+    export_day_csvs(conn, db.name, changed_days)
+    return changed_days
@@ -2,11 +2,9 @@ import os
 import re
 import csv
 import datetime
-import geopandas as gpd
 import pycountry
 import matplotlib
 matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
 import pandas as pd
 import gc
 import requests
@@ -14,8 +12,10 @@ import zipfile
 from collections import defaultdict
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from knowledgebase_storage import is_consolidated, get_asn_database_index, list_known_asns, iter_report_sources
+from threat_map_rendering import available_country_codes, render_attack_map, map_job, render_map_batch, map_flowable
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image
+    SimpleDocTemplate, Paragraph, Spacer, PageBreak
 )
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
@@ -103,7 +103,6 @@ def get_shapefile_path(shapefile_type="admin_0_countries_110m"):
 
 
 shapefile_cache = {}
-gdf_cache = {}
 
 def select_best_shapefile(required_codes, verbose=True):
     ignored_codes = {"ZZ"}  # codes to ignore
@@ -119,12 +118,8 @@ def select_best_shapefile(required_codes, verbose=True):
         else:
             path = shapefile_cache[shapefile_type]
 
-        # Load GeoDataFrame with cache
-        if shapefile_type not in gdf_cache:
-            gdf_cache[shapefile_type] = gpd.read_file(path)
-
-        gdf = gdf_cache[shapefile_type]
-        available = set(gdf["ISO_A2"].dropna().str.upper())
+        # Country codes come from the cached centroid table, so shapefiles are only read on a cache miss
+        available = available_country_codes(path)
 
         if filtered_codes.issubset(available):
             if verbose:
@@ -164,43 +159,8 @@ def load_asn_mapping(csv_path):
     return mapping
 
 def create_attack_map(attack_data, output_path, shapefile_path):
-    world = gpd.read_file(shapefile_path)
-    fig, ax = plt.subplots(figsize=(14, 8))
-    world.plot(ax=ax, color='lightgrey', edgecolor='white')
-
-    # Project world to metric CRS for accurate centroid calculation
-    world_proj = world.to_crs(epsg=3857)
-    centroids_proj = world_proj.set_index('ISO_A2').centroid
-
-    # Convert centroids back to original geographic CRS (e.g., EPSG:4326)
-    centroids = centroids_proj.to_crs(world.crs)
-
-    # Convert to dictionary: {country_code: Point}
-    centroid_dict = centroids.to_dict()
-
-    src_set, dst_set = set(), set()
-    for src, dst, count in attack_data:
-        if src not in centroid_dict or dst not in centroid_dict:
-            continue
-        sp, dp = centroid_dict[src], centroid_dict[dst]
-        ax.plot([sp.x, dp.x], [sp.y, dp.y],
-                color='red', linewidth=0.5 + min(count / 10, 3), alpha=0.6)
-        src_set.add(src)
-        dst_set.add(dst)
-
-    ax.set_title(f"Reported Malicious Communication ({yesterday})", fontsize=16)
-    ax.axis('off')
-
-    fig.subplots_adjust(bottom=0.15)
-    label = f"From: {', '.join(sorted(src_set))} | To: {', '.join(sorted(dst_set))}"
-    fig.text(0.5, 0.08, label, ha="center", fontsize=10, wrap=True)
-
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close(fig)
-    del fig, ax
-
-    return src_set, dst_set
+    # Basemap, centroids and geometry are cached per shapefile; only the attack lines are drawn here
+    return render_attack_map(attack_data, output_path, shapefile_path, yesterday)
 
 
 
@@ -252,7 +212,7 @@ def generate_pdf_report(org, db, coll_atks, pdf_path, cert_name):
             ))
 
         story.append(Spacer(1, 12))
-        story.append(Image(data['map'], width=500, height=280))
+        story.append(map_flowable(data['map'], width=500, height=280))
         story.append(PageBreak())
 
     def header_footer(canvas_obj, doc_obj):
@@ -312,6 +272,49 @@ def generate_pdf_report(org, db, coll_atks, pdf_path, cert_name):
     doc.build(story, onFirstPage=header_footer, onLaterPages=header_footer)
 
 
+def collect_geo_pairs(collection, base_filter, window_start, window_end):
+    """
+    One aggregation per collection: group the day's rows by (src_geo, http_referer_geo, dst_geo).
+    Returns (country codes seen, {src: {dst: count}}) using the same fallbacks as the report:
+    src_geo, then http_referer_geo, with "ZZ" and self-pairs left out of the attack pairs.
+    """
+    pipeline = [
+        {"$match": {**base_filter, "extracted_date": {"$gte": window_start, "$lt": window_end}}},
+        {"$group": {
+            "_id": {"src_geo": "$src_geo", "http_referer_geo": "$http_referer_geo", "dst_geo": "$dst_geo"},
+            "count": {"$sum": 1}
+        }}
+    ]
+    codes = set()
+    attack_counter = defaultdict(lambda: defaultdict(int))
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        key = group["_id"]
+        src = key.get("src_geo") or key.get("http_referer_geo")
+        dst = key.get("dst_geo")
+        if src:
+            codes.add(src.upper())
+        if dst:
+            codes.add(dst.upper())
+
+        src = (src or "ZZ").upper()
+        dst = (dst or "ZZ").upper()
+        if src != "ZZ" and dst != "ZZ" and src != dst:
+            attack_counter[src][dst] += group["count"]
+    return codes, attack_counter
+
+
+def collect_report_units(client):
+    # One unit per per-ASN database, or per ASN slice of the consolidated database
+    asn_dbs = {} if is_consolidated() else get_asn_database_index(client)
+    units = []
+    for asn in (sorted(asn_dbs, key=int) if asn_dbs else list_known_asns(client)):
+        grouped = {}
+        for label, collection, base_filter in iter_report_sources(client, asn, asn_dbs):
+            grouped.setdefault(label, []).append((collection, base_filter))
+        units.extend((asn, label, sources) for label, sources in grouped.items())
+    return units
+
+
 def main():
     load_dotenv()
     cert_name = os.getenv("cert_name", "CERT Intelligence Team")
@@ -335,24 +338,20 @@ def main():
     yesterday_date = (datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=1)).date()
     today_str = datetime.datetime.now().strftime("%Y-%m-%d")
 
-    all_codes = set()
-    dbs = client.list_database_names()
-    for db_name in dbs:
-        match = re.search(r"_as(\d+)", db_name)
-        if not match:
-            continue
+    window_start = datetime.datetime.combine(yesterday_date, datetime.time.min, tzinfo=datetime.timezone.utc)
+    window_end = datetime.datetime.combine(yesterday_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
 
-        colls = client[db_name].list_collection_names()
-        for col in colls:
-            if col.startswith("files_"):
-                continue
-            query = {"extracted_date": {"$gte": datetime.datetime.combine(yesterday_date, datetime.time.min, tzinfo=datetime.timezone.utc),
-                                        "$lt": datetime.datetime.combine(yesterday_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)}}
-            for doc in client[db_name][col].find(query, {"src_geo": 1, "dst_geo": 1, "http_referer_geo": 1}):
-                src = doc.get("src_geo") or doc.get("http_referer_geo")
-                dst = doc.get("dst_geo")
-                if src: all_codes.add(src.upper())
-                if dst: all_codes.add(dst.upper())
+    # Single pass: one $group per collection yields the global code set, the per-database codes and the attack pairs
+    all_codes = set()
+    unit_results = []
+    for asn, db_name, sources in collect_report_units(client):
+        collected = {}
+        for collection, base_filter in sources:
+            codes, attack_counter = collect_geo_pairs(collection, base_filter, window_start, window_end)
+            if codes or attack_counter:
+                all_codes |= codes
+                collected[collection.name] = (codes, attack_counter)
+        unit_results.append((asn, db_name, collected))
 
     def clean_codes(codes):
         valid_codes = set()
@@ -371,52 +370,18 @@ def main():
 					
     shapefile_path = select_best_shapefile(all_codes)
 
-    dbs = client.list_database_names()
-
-    for db_name in dbs:
-        match = re.search(r"_as(\d+)", db_name)
-        if not match:
-            continue
-        asn = match.group(1)
+    # Plan every map first so they can be rendered as one batch on the process pool
+    report_plans = []
+    map_jobs = []
+    for asn, db_name, collected in unit_results:
         org = asn_map.get(asn)
         if not org:
             continue
 
-        # Collect country codes for this org's db
         # Collect country codes for this org's db
         required_codes = set()
-        db = client[db_name]
-        colls = db.list_collection_names()
-
-        for col in colls:
-            if col.startswith("files_"):
-                continue
-
-            query = {
-                "extracted_date": {
-                    "$gte": datetime.datetime.combine(
-                        yesterday_date,
-                        datetime.time.min,
-                        tzinfo=datetime.timezone.utc
-                    ),
-                    "$lt": datetime.datetime.combine(
-                        yesterday_date + datetime.timedelta(days=1),
-                        datetime.time.min,
-                        tzinfo=datetime.timezone.utc
-                    )
-                }
-            }
-
-            for doc in db[col].find(
-                query,
-                {"src_geo": 1, "dst_geo": 1, "http_referer_geo": 1}
-            ):
-                src = doc.get("src_geo") or doc.get("http_referer_geo")
-                dst = doc.get("dst_geo")
-                if src:
-                    required_codes.add(src.upper())
-                if dst:
-                    required_codes.add(dst.upper())
+        for codes, _ in collected.values():
+            required_codes |= codes
 
         # Skip organisation if no country codes found (means no data)
         if not required_codes:
@@ -427,44 +392,38 @@ def main():
         print(f"\nOrganisation: {org}, Database: {db_name}, selected shapefile: {shapefile_type}")
 
         collection_attacks = {}
-        # Continue processing attacks and building reports/maps with shapefile_path...
-        for col in colls:
-            if col.startswith("files_"):
-                continue
-            query = {
-                "extracted_date": {
-                    "$gte": datetime.datetime.combine(yesterday_date, datetime.time.min, tzinfo=datetime.timezone.utc),
-                    "$lt": datetime.datetime.combine(yesterday_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
-                }
-            }
-            if not db[col].count_documents(query):
-                continue
-
-            attack_counter = defaultdict(lambda: defaultdict(int))
-            for doc in db[col].find(query, {"src_geo": 1, "dst_geo": 1, "http_referer_geo": 1}):
-                src = (doc.get("src_geo") or doc.get("http_referer_geo") or "ZZ").upper()
-                dst = (doc.get("dst_geo") or "ZZ").upper()
-                if src != "ZZ" and dst != "ZZ" and src != dst:
-                    attack_counter[src][dst] += 1
-
+        for col, (_, attack_counter) in collected.items():
             attacks = [(src, dst, cnt) for src, dsts in attack_counter.items() for dst, cnt in dsts.items()]
             if not attacks:
                 continue
 
             org_dir = os.path.join("statistical_data", org, "generated_threatmaps")
             os.makedirs(org_dir, exist_ok=True)
-            map_path = os.path.join(org_dir, f"{safe_filename(org)}_{today_str}_{safe_filename(col)}_map.png")
-            create_attack_map(attacks, map_path, shapefile_path)
+            # The database is part of the name: one org can own several ASN databases and their maps render in parallel
+            map_base = f"{safe_filename(org)}_{safe_filename(db_name)}_{today_str}_{safe_filename(col)}_map"
+            job = map_job(attacks, os.path.join(org_dir, map_base), shapefile_path, yesterday)
+            map_jobs.append(job)
 
             meta = desc_lookup.get(col, {})
             collection_attacks[col] = {
                 "attacks": attacks,
-                "map": map_path,
+                "map": job["output_path"],
                 "title": meta.get("title", "Untitled"),
                 "severity": meta.get("severity", "Unknown"),
                 "description": meta.get("description", ""),
             }
 
+        if collection_attacks:
+            report_plans.append((org, db_name, collection_attacks))
+
+    failed_maps = set()
+    for job, result in zip(map_jobs, render_map_batch(map_jobs)):
+        if isinstance(result, Exception):
+            print(f"Map rendering failed for {job['output_path']}: {result}")
+            failed_maps.add(job["output_path"])
+
+    for org, db_name, collection_attacks in report_plans:
+        collection_attacks = {col: data for col, data in collection_attacks.items() if data["map"] not in failed_maps}
         if collection_attacks:
             pdf = os.path.join("statistical_data", org, f"{safe_filename(org)}_{today_str}_attack_report.pdf")
             generate_pdf_report(org, db_name, collection_attacks, pdf, cert_name)
@@ -12,6 +12,7 @@ import io
 from datetime import datetime
 from collections import deque
 from resource_monitor import ResourceMonitorApp
+from pipeline_events import EventChannel, format_progress, progress_fraction
 
 import dearpygui.dearpygui as dpg
 
@@ -183,6 +184,10 @@ class ShadowCommandCenter:
         }
         
         self.running_commands = set()
+        # Latest structured progress event and error count per running command
+        self.stage_progress = {}
+        self.stage_errors = {}
+        self.progress_dirty = False
         self.command_history = []
         
         # Performance optimization flags
@@ -422,6 +427,10 @@ class ShadowCommandCenter:
             dpg.add_text("Ready to execute commands", tag="status_text")
             dpg.add_spacer(width=20)
             dpg.add_text("Running: 0", tag="running_count", color=(136, 136, 136))
+            dpg.add_spacer(width=20)
+            # Live stage progress from the pipeline's event channel
+            dpg.add_progress_bar(tag="stage_progress_bar", default_value=0.0, width=200, overlay="")
+            dpg.add_text("", tag="stage_progress_text", color=(136, 136, 136))
 
     def toggle_archive_dropdown(self):
         """Toggle archive folders dropdown"""
@@ -1164,7 +1173,13 @@ class ShadowCommandCenter:
                 self._simulate_command(command)
             else:
                 # Run the actual command
-                cmd = [sys.executable, script_path, command]
+                # --progress: per-item lines go to logging/console_detail/ instead of through this pipe;
+                # the progress bar is fed by the event channel
+                cmd = [sys.executable, script_path, command, "--progress"]
+                # Progress events arrive as NDJSON on their own channel, separate from stdout
+                channel = EventChannel()
+                # stdout is a pipe here, so the child would block-buffer it without this
+                channel.env["PYTHONUNBUFFERED"] = "1"
                 
                 # Configure process creation for proper signal handling
                 if sys.platform == 'win32':
@@ -1174,7 +1189,9 @@ class ShadowCommandCenter:
                         stderr=subprocess.STDOUT,
                         universal_newlines=True,
                         bufsize=1,
-                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+                        env=channel.env,
+                        **channel.popen_kwargs
                     )
                 else:
                     process = subprocess.Popen(
@@ -1183,11 +1200,15 @@ class ShadowCommandCenter:
                         stderr=subprocess.STDOUT,
                         universal_newlines=True,
                         bufsize=1,
-                        preexec_fn=os.setsid
+                        preexec_fn=os.setsid,
+                        env=channel.env,
+                        **channel.popen_kwargs
                     )
                 
                 # Register process for management
                 self.process_manager.add_process(command, process)
+                channel.started()
+                threading.Thread(target=self._read_events, args=(command, channel, process), daemon=True).start()
                 
                 # Read output
                 output_lines = []
@@ -1235,6 +1256,14 @@ class ShadowCommandCenter:
                 self.process_manager.remove_process(command)
             self.output_queue.put(("finish", command))
 
+    def _read_events(self, command, channel, process):
+        """Forward the pipeline's progress events to the monitor loop"""
+        try:
+            for event in channel.events(process):
+                self.output_queue.put(("progress_event", (command, event)))
+        except Exception as e:
+            self.output_queue.put(("warning", f"Progress channel closed: {str(e)}"))
+
     def _simulate_command(self, command):
         """Simulate command execution for testing"""
         messages = [
@@ -1291,7 +1320,20 @@ class ShadowCommandCenter:
             while messages_processed < max_messages_per_update:
                 msg_type, content = self.output_queue.get_nowait()
                 
-                if msg_type == "finish":
+                if msg_type == "progress_event":
+                    command, event = content
+                    if command not in self.running_commands:
+                        pass  # late event from a command that already finished
+                    elif event.get("event") == "error":
+                        self.stage_errors[command] = self.stage_errors.get(command, 0) + 1
+                    elif event.get("stage"):
+                        self.stage_progress[command] = event
+                    self.progress_dirty = True
+
+                elif msg_type == "finish":
+                    self.stage_progress.pop(content, None)
+                    self.stage_errors.pop(content, None)
+                    self.progress_dirty = True
                     self.running_commands.discard(content)
                     self.update_status_indicator()
                     
@@ -1312,6 +1354,28 @@ class ShadowCommandCenter:
         except queue.Empty:
             pass
 
+        if self.progress_dirty:
+            self.render_progress()
+
+    def render_progress(self):
+        """Show the most recently updated command's stage, rate and ETA in the status bar"""
+        self.progress_dirty = False
+        if not self.stage_progress:
+            dpg.set_value("stage_progress_bar", 0.0)
+            dpg.configure_item("stage_progress_bar", overlay="")
+            dpg.set_value("stage_progress_text", "")
+            return
+
+        command, event = max(self.stage_progress.items(), key=lambda item: item[1].get("ts", 0))
+        text = f"{command}: {format_progress(event)}"
+        if self.stage_errors.get(command):
+            text += f" | {self.stage_errors[command]} error(s)"
+        dpg.set_value("stage_progress_text", text)
+
+        fraction = progress_fraction(event)
+        dpg.set_value("stage_progress_bar", fraction or 0.0)
+        dpg.configure_item("stage_progress_bar", overlay=f"{fraction:.0%}" if fraction is not None else event.get("stage", ""))
+
     def log_message(self, message, msg_type="info"):
         """Log a message (external interface)"""
         self.output_queue.put((msg_type, message))
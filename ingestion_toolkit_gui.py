@@ -14,6 +14,7 @@ import random
 from collections import deque
 from customtkinter import CTkScrollbar
 from resource_monitor import ResourceMonitorApp
+from pipeline_events import EventChannel, format_progress, progress_fraction
 import io
 import csv
 
@@ -21,6 +22,13 @@ import csv
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+# Console limits: the widget keeps the newest CONSOLE_MAX_LINES lines (trimmed CONSOLE_TRIM_CHUNK
+# lines at a time) and new output is drawn at most CONSOLE_FPS times per second
+CONSOLE_MAX_LINES = 5000
+CONSOLE_TRIM_CHUNK = 500
+CONSOLE_FPS = 30
+CONSOLE_TAGS = {"info", "success", "warning", "error"}
+
 
 class AsyncConsoleRedirector:
     """Thread-safe console redirector with buffering"""
@@ -47,6 +55,66 @@ class AsyncConsoleRedirector:
                 self.buffer.clear()
                 self.output_queue.put(("batch_output", messages))
 
+class RingBufferConsole:
+    """Line-capped console model: reader threads append, the Tk loop renders once per frame"""
+    def __init__(self, max_lines=CONSOLE_MAX_LINES, trim_chunk=CONSOLE_TRIM_CHUNK):
+        self.max_lines = max_lines
+        self.trim_chunk = trim_chunk
+        # Lines not drawn yet; during a burst bigger than the cap the oldest ones fall off
+        self.pending = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.widget_lines = 0
+        self.lock = threading.Lock()
+
+    def extend(self, messages, msg_type="output"):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        with self.lock:
+            for message in messages:
+                if len(self.pending) == self.max_lines:
+                    self.dropped += 1
+                self.pending.append((timestamp, message, msg_type))
+
+    def append(self, message, msg_type="output"):
+        self.extend([message], msg_type)
+
+    def render(self, text_widget, auto_scroll=True):
+        """Insert all pending lines with one Text.insert and trim the oldest lines in chunks"""
+        with self.lock:
+            if not self.pending:
+                return 0
+            entries = list(self.pending)
+            self.pending.clear()
+            dropped, self.dropped = self.dropped, 0
+
+        chunks = []
+        if dropped:
+            chunks += [f"... {dropped} line(s) skipped ...\n", "warning"]
+            self.widget_lines += 1
+        for timestamp, message, msg_type in entries:
+            chunks += [f"[{timestamp}] ", "timestamp", f"{message}\n", msg_type if msg_type in CONSOLE_TAGS else ()]
+            self.widget_lines += message.count("\n") + 1
+
+        text_widget.config(state=tk.NORMAL)
+        text_widget.insert(tk.END, *chunks)
+        if self.widget_lines > self.max_lines + self.trim_chunk:
+            excess = self.widget_lines - self.max_lines
+            text_widget.delete("1.0", f"{excess + 1}.0")
+            self.widget_lines -= excess
+        text_widget.config(state=tk.DISABLED)
+
+        if auto_scroll:
+            text_widget.see(tk.END)
+        return len(entries)
+
+    def clear(self, text_widget):
+        with self.lock:
+            self.pending.clear()
+            self.dropped = 0
+        text_widget.config(state=tk.NORMAL)
+        text_widget.delete("1.0", tk.END)
+        text_widget.config(state=tk.DISABLED)
+        self.widget_lines = 0
+
 class ProcessManager:
     """Manages running processes with proper cleanup"""
     def __init__(self):
@@ -142,7 +210,7 @@ class ModernCommandGUI:
         # Initialize UI attributes first
         self.console_text = None
         self.auto_scroll_var = None
-        self.console_buffer = deque(maxlen=5000)
+        self.console = RingBufferConsole()
         
         # Archive folders to check
         self.archive_folders = {
@@ -190,6 +258,10 @@ class ModernCommandGUI:
         }
         
         self.running_commands = set()
+        # Latest structured progress event and error count per running command
+        self.stage_progress = {}
+        self.stage_errors = {}
+        self.progress_dirty = False
         self.command_history = []
         
         # Performance optimization flags
@@ -1652,6 +1724,19 @@ class ModernCommandGUI:
             text_color="#888888"
         )
         self.running_count_label.pack(side="right", padx=15, pady=8)
+
+        # Live stage progress from the pipeline's event channel
+        self.progress_label = ctk.CTkLabel(
+            status_frame,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="#888888"
+        )
+        self.progress_label.pack(side="right", padx=10, pady=8)
+
+        self.progress_bar = ctk.CTkProgressBar(status_frame, width=200, height=10)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="right", padx=10, pady=8)
         
     def setup_animations(self):
         """Setup animation effects"""
@@ -1704,7 +1789,13 @@ class ModernCommandGUI:
                 self._simulate_command(command)
             else:
                 # Run the actual command with proper buffering
-                cmd = [sys.executable, script_path, command]
+                # --progress: per-item lines go to logging/console_detail/ instead of through this pipe;
+                # the progress bar is fed by the event channel
+                cmd = [sys.executable, script_path, command, "--progress"]
+                # Progress events arrive as NDJSON on their own channel, separate from stdout
+                channel = EventChannel()
+                # stdout is a pipe here, so the child would block-buffer it without this
+                channel.env["PYTHONUNBUFFERED"] = "1"
                 
                 # Configure process creation for proper signal handling
                 if sys.platform == 'win32':
@@ -1715,7 +1806,9 @@ class ModernCommandGUI:
                         stderr=subprocess.STDOUT,
                         universal_newlines=True,
                         bufsize=1,  # Line buffered
-                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+                        env=channel.env,
+                        **channel.popen_kwargs
                     )
                 else:
                     # On Unix-like systems, create new process group
@@ -1725,45 +1818,25 @@ class ModernCommandGUI:
                         stderr=subprocess.STDOUT,
                         universal_newlines=True,
                         bufsize=1,  # Line buffered
-                        preexec_fn=os.setsid  # Create new process group
+                        preexec_fn=os.setsid,  # Create new process group
+                        env=channel.env,
+                        **channel.popen_kwargs
                     )
                 
                 # Register process for management
                 self.process_manager.add_process(command, process)
+                channel.started()
+                threading.Thread(target=self._read_events, args=(command, channel, process), daemon=True).start()
                 
-                # Read output with timeout to prevent blocking
-                output_lines = []
-                while True:
-                    try:
-                        # Check if process is still running
-                        if process.poll() is not None:
-                            # Process finished, read remaining output
-                            remaining = process.stdout.read()
-                            if remaining:
-                                for line in remaining.splitlines():
-                                    if line.strip():
-                                        output_lines.append(line.strip())
-                            break
-                            
-                        # Read available output without blocking
-                        line = process.stdout.readline()
-                        if line:
-                            output_lines.append(line.strip())
-                            
-                            # Batch output updates to reduce GUI load
-                            if len(output_lines) >= 10:
-                                self.output_queue.put(("batch_output", output_lines.copy()))
-                                output_lines.clear()
-                        else:
-                            time.sleep(0.01)  # Small delay to prevent CPU spinning
-                            
-                    except Exception as e:
-                        self.output_queue.put(("error", f"Error reading output: {str(e)}"))
-                        break
-                
-                # Send any remaining output
-                if output_lines:
-                    self.output_queue.put(("batch_output", output_lines))
+                # This thread blocks on the pipe; lines go straight into the ring buffer and
+                # the UI loop draws whatever arrived once per frame
+                try:
+                    for line in process.stdout:
+                        line = line.rstrip()
+                        if line.strip():
+                            self.console.append(line)
+                except Exception as e:
+                    self.output_queue.put(("error", f"Error reading output: {str(e)}"))
                 
                 # Wait for process to complete
                 return_code = process.wait()
@@ -1783,6 +1856,14 @@ class ModernCommandGUI:
                 self.process_manager.remove_process(command)
             self.output_queue.put(("finish", command))
             
+    def _read_events(self, command, channel, process):
+        """Forward the pipeline's progress events to the UI loop"""
+        try:
+            for event in channel.events(process):
+                self.output_queue.put(("progress_event", (command, event)))
+        except Exception as e:
+            self.output_queue.put(("warning", f"Progress channel closed: {str(e)}"))
+
     def _simulate_command(self, command):
         """Simulate command execution for testing"""
         messages = [
@@ -1842,7 +1923,20 @@ class ModernCommandGUI:
             while messages_processed < max_messages_per_update:
                 msg_type, content = self.output_queue.get_nowait()
                 
-                if msg_type == "finish":
+                if msg_type == "progress_event":
+                    command, event = content
+                    if command not in self.running_commands:
+                        pass  # late event from a command that already finished
+                    elif event.get("event") == "error":
+                        self.stage_errors[command] = self.stage_errors.get(command, 0) + 1
+                    elif event.get("stage"):
+                        self.stage_progress[command] = event
+                    self.progress_dirty = True
+
+                elif msg_type == "finish":
+                    self.stage_progress.pop(content, None)
+                    self.stage_errors.pop(content, None)
+                    self.progress_dirty = True
                     self.running_commands.discard(content)
                     self.update_status_indicator()
                     # Reset button appearance
@@ -1851,11 +1945,7 @@ class ModernCommandGUI:
                     self.stop_buttons[content].pack_forget()
                     
                 elif msg_type == "batch_output":
-                    # Handle batch output efficiently
-                    for message in content:
-                        if message.strip():
-                            self.log_message_batch(message, "output")
-                    self.flush_console_batch()
+                    self.console.extend([message for message in content if message.strip()])
                     
                 elif msg_type in ["output", "info", "success", "warning", "error"]:
                     self.log_message(content, msg_type)
@@ -1864,98 +1954,58 @@ class ModernCommandGUI:
                     
         except queue.Empty:
             pass
-            
-        # Schedule next check with adaptive timing
-        delay = 10 if self.running_commands else 50
+
+        # One redraw per frame, however many lines arrived since the last one
+        self.flush_console_batch()
+        if self.progress_dirty:
+            self.render_progress()
+        delay = 1000 // CONSOLE_FPS if self.running_commands else 100
         self.root.after(delay, self.check_output_queue)
     
-    def log_message_batch(self, message, msg_type="info"):
-        """Add message to batch without immediately updating GUI"""
-        if self.console_text is None:
+    def render_progress(self):
+        """Show the most recently updated command's stage, rate and ETA in the status bar"""
+        self.progress_dirty = False
+        if not self.stage_progress:
+            self.progress_label.configure(text="")
+            # A stage without a total leaves the bar animating (e.g. after Ctrl+C); stop it
+            if self.progress_bar.cget("mode") == "indeterminate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate")
+            self.progress_bar.set(0)
             return
-            
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.console_buffer.append({
-            "timestamp": timestamp,
-            "message": message,
-            "type": msg_type
-        })
+
+        command, event = max(self.stage_progress.items(), key=lambda item: item[1].get("ts", 0))
+        text = f"{command}: {format_progress(event)}"
+        if self.stage_errors.get(command):
+            text += f" | {self.stage_errors[command]} error(s)"
+        self.progress_label.configure(text=text)
+
+        fraction = progress_fraction(event)
+        if fraction is None:
+            if self.progress_bar.cget("mode") != "indeterminate":
+                self.progress_bar.configure(mode="indeterminate")
+                self.progress_bar.start()
+        else:
+            if self.progress_bar.cget("mode") == "indeterminate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate")
+            self.progress_bar.set(fraction)
+
+    def log_message_batch(self, message, msg_type="info"):
+        """Add message to the console model without touching the widget"""
+        self.console.append(message, msg_type)
     
     def flush_console_batch(self):
-        """Flush batched messages to console"""
-        if not self.console_buffer or self.console_text is None:
+        """Draw the pending console lines"""
+        if self.console_text is None:
             return
-
-        self.console_text.config(state=tk.NORMAL)
-
-        # Collect all the batched messages into one string
-        output = ""
-        for msg_data in self.console_buffer:
-            timestamp = msg_data["timestamp"]
-            message = msg_data["message"]
-            msg_type = msg_data["type"]
-
-            # Add timestamp
-            output += f"[{timestamp}] "
-
-            # Add message with appropriate color
-            if msg_type == "success":
-                output += f"{message}\n"
-            elif msg_type == "warning":
-                output += f"{message}\n"
-            elif msg_type == "error":
-                output += f"{message}\n"
-            elif msg_type == "info":
-                output += f"{message}\n"
-            else:
-                output += f"{message}\n"
-
-        self.console_text.insert(tk.END, output)  # Insert all at once
-        self.console_text.config(state=tk.DISABLED)
-
-        # Auto-scroll if enabled, and smoothly update the scrollbar position
-        if self.auto_scroll_var and self.auto_scroll_var.get():
-            self.console_text.see(tk.END)  # This ensures auto-scroll is smooth
-
-        # Clear the buffer after flush
-        self.console_buffer.clear()
-
+        auto_scroll = bool(self.auto_scroll_var and self.auto_scroll_var.get())
+        self.console.render(self.console_text, auto_scroll)
         
     def log_message(self, message, msg_type="info"):
-        """Log a message to the console (single message)"""
-        if self.console_text is None:
-            # Store in buffer if console not ready yet
-            self.console_buffer.append({
-                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                "message": message,
-                "type": msg_type
-            })
-            return
-            
+        """Log a message to the console (safe to call from worker threads; drawn on the next frame)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        self.console_text.config(state=tk.NORMAL)
-        
-        # Add timestamp
-        self.console_text.insert(tk.END, f"[{timestamp}] ", "timestamp")
-        
-        # Add message with appropriate color
-        if msg_type == "success":
-            self.console_text.insert(tk.END, f"{message}\n", "success")
-        elif msg_type == "warning":
-            self.console_text.insert(tk.END, f"{message}\n", "warning")
-        elif msg_type == "error":
-            self.console_text.insert(tk.END, f"{message}\n", "error")
-        elif msg_type == "info":
-            self.console_text.insert(tk.END, f"{message}\n", "info")
-        else:
-            self.console_text.insert(tk.END, f"{message}\n")
-            
-        self.console_text.config(state=tk.DISABLED)
-        
-        # Auto-scroll if enabled
-        if self.auto_scroll_var and self.auto_scroll_var.get():
-            self.console_text.see(tk.END)
+        self.console.append(message, msg_type)
         
         # Update command history (limited)
         if len(self.command_history) > 1000:
@@ -1972,10 +2022,7 @@ class ModernCommandGUI:
         if self.console_text is None:
             return
             
-        self.console_text.config(state=tk.NORMAL)
-        self.console_text.delete(1.0, tk.END)
-        self.console_text.config(state=tk.DISABLED)
-        self.console_buffer.clear()
+        self.console.clear(self.console_text)
         self.log_message("Console cleared", "info")
         
     def update_status_indicator(self):
@@ -2013,8 +2060,7 @@ class ModernCommandGUI:
 		
         
         # Now that console is ready, flush any buffered messages
-        if self.console_buffer and self.console_text:
-            self.flush_console_batch()
+        self.flush_console_batch()
             
         self.log_message("š Shadow Command Center initialized", "success")
         self.log_message("š Archive folder status checked - see navigation bar", "info")
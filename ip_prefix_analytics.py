@@ -0,0 +1,96 @@
+import ipaddress
+import numpy as np
+import pandas as pd
+
+# ========== VECTORISED PREFIX ANALYTICS ==========
+# IPv4 addresses are packed into uint32 and grouped by their /24 (value >> 8).
+# IPv6 addresses are packed into their upper 64 bits (uint64), which is the /64 network.
+# Prefix membership is counted with np.unique instead of per-IP dict-of-sets bookkeeping.
+
+IPV4_PREFIX_LENGTH = 24
+IPV6_PREFIX_LENGTH = 64
+
+# Same rules as ipaddress.IPv4Address: 0-255 per octet, no leading zeros
+_OCTET = r"(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_IPV4_PATTERN = rf"^{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}$"
+
+
+def pack_ipv4(ips):
+    """
+    Pack dotted-quad strings into uint32. Returns (packed, valid); entries that are not
+    IPv4 addresses are left as 0 with valid=False.
+    """
+    octets = pd.Series(ips, dtype="object").astype(str).str.extract(_IPV4_PATTERN)
+    octets = octets.apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+    valid = ~np.isnan(octets).any(axis=1)
+
+    packed = np.zeros(len(octets), dtype=np.uint32)
+    if valid.any():
+        o = octets[valid].astype(np.uint32)
+        packed[valid] = (o[:, 0] << 24) | (o[:, 1] << 16) | (o[:, 2] << 8) | o[:, 3]
+    return packed, valid
+
+
+def pack_ipv6_networks(ips):
+    """
+    Pack IPv6 strings into the upper 64 bits of the address (their /64 network).
+    There is no vectorised IPv6 text parser, so only strings containing ':' are parsed.
+    """
+    networks = np.zeros(len(ips), dtype=np.uint64)
+    valid = np.zeros(len(ips), dtype=bool)
+    for i, ip in enumerate(ips):
+        if ":" not in ip:
+            continue
+        try:
+            networks[i] = int(ipaddress.IPv6Address(ip)) >> 64
+            valid[i] = True
+        except ValueError:
+            continue
+    return networks, valid
+
+
+def format_ipv4_prefix(network):
+    value = int(network) << 8
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.0/{IPV4_PREFIX_LENGTH}"
+
+
+def format_ipv6_prefix(network):
+    return f"{ipaddress.IPv6Address(int(network) << 64).compressed}/{IPV6_PREFIX_LENGTH}"
+
+
+def summarise_prefixes(ips):
+    """
+    Infer the /24 (IPv4) or /64 (IPv6) prefix of every address in `ips` and count the
+    unique addresses under each prefix.
+
+    Returns (prefixes, prefix_counts): prefixes is aligned with `ips` (None for values
+    that are not IP addresses), prefix_counts maps prefix label → unique IP count.
+    """
+    ips = np.asarray([str(ip) for ip in ips], dtype=object)
+    prefixes = np.full(len(ips), None, dtype=object)
+    prefix_counts = {}
+    if not len(ips):
+        return prefixes.tolist(), prefix_counts
+
+    unique_ips, inverse = np.unique(ips, return_inverse=True)
+    unique_prefixes = np.full(len(unique_ips), None, dtype=object)
+
+    packed, v4_valid = pack_ipv4(unique_ips)
+    if v4_valid.any():
+        networks, network_index, counts = np.unique(packed[v4_valid] >> 8, return_inverse=True, return_counts=True)
+        labels = np.array([format_ipv4_prefix(n) for n in networks], dtype=object)
+        unique_prefixes[v4_valid] = labels[network_index]
+        prefix_counts.update(zip(labels.tolist(), counts.tolist()))
+
+    v6_candidates = ~v4_valid
+    if v6_candidates.any():
+        candidate_index = np.flatnonzero(v6_candidates)
+        v6_networks, v6_valid = pack_ipv6_networks(unique_ips[candidate_index].tolist())
+        if v6_valid.any():
+            networks, network_index, counts = np.unique(v6_networks[v6_valid], return_inverse=True, return_counts=True)
+            labels = np.array([format_ipv6_prefix(n) for n in networks], dtype=object)
+            unique_prefixes[candidate_index[v6_valid]] = labels[network_index]
+            prefix_counts.update(zip(labels.tolist(), counts.tolist()))
+
+    prefixes = unique_prefixes[inverse]
+    return prefixes.tolist(), prefix_counts
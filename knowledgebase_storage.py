@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import uuid
+from datetime import datetime, timezone
+
+# ========== STORAGE LAYOUTS ==========
+# per_asn      → one database per <org_folder>_as<asn>, one collection per report category (default)
+# consolidated → one events database, one collection per report category,
+#                with org_folder / owner_asn stored as indexed fields on every document.
+#                owner_asn is the ASN whose ingest pass stored the row, i.e. the per-ASN database
+#                it would live in, so both layouts hold the same rows per (org, ASN); the report's
+#                own asn column is kept as it is.
+
+STORAGE_MODE_PER_ASN = "per_asn"
+STORAGE_MODE_CONSOLIDATED = "consolidated"
+STORAGE_MODES = {STORAGE_MODE_PER_ASN, STORAGE_MODE_CONSOLIDATED}
+
+# Collections that hold ingestion bookkeeping rather than report rows
+BOOKKEEPING_PREFIXES = ("files_", "discovered_fields_", "archive_")
+
+ASN_DB_PATTERN = re.compile(r"_as(\d+)$")
+
+# Server-side change marker for the set of per-ASN databases. Ingest, the reset script and the
+# migration tool bump it whenever they create or drop databases, so a saved snapshot of the
+# ASN → databases index stays valid until the marker moves.
+STORAGE_META_DATABASE = "knowledgebase_meta"
+STORAGE_MARKERS_COLLECTION = "markers"
+ASN_DATABASES_MARKER_ID = "asn_databases"
+ASN_INDEX_SNAPSHOT_PATH = os.path.join("file_tracking_system", "asn_database_index.json")
+
+# Per-run cache: { id(client): { asn: [db_name, ...] } }
+_asn_index_cache = {}
+
+
+def get_storage_mode():
+    mode = os.getenv("knowledgebase_storage_mode", STORAGE_MODE_PER_ASN).strip('"').strip().lower()
+    if mode not in STORAGE_MODES:
+        print(f"[Storage] Unknown knowledgebase_storage_mode '{mode}'. Falling back to '{STORAGE_MODE_PER_ASN}'.")
+        return STORAGE_MODE_PER_ASN
+    return mode
+
+
+def is_consolidated():
+    return get_storage_mode() == STORAGE_MODE_CONSOLIDATED
+
+
+def get_consolidated_database_name():
+    return os.getenv("consolidated_database_name", "shadowserver_events").strip('"').strip()
+
+
+def is_report_collection(name):
+    return not name.startswith(BOOKKEEPING_PREFIXES)
+
+
+def per_asn_database_name(org_folder, asn):
+    raw_name = f"{org_folder}-as{asn}".replace("-", "_").replace(".", "_")
+    return raw_name[-63:] if len(raw_name) > 63 else raw_name
+
+
+def asn_field_value(asn):
+    asn = str(asn).strip()
+    return int(asn) if asn.isdigit() else asn
+
+
+def asn_filter_values(asns):
+    # ASNs may be stored as ints (current ingest) or strings (older data)
+    values = []
+    for asn in asns:
+        asn = str(asn).strip()
+        if not asn:
+            continue
+        values.append(asn)
+        if asn.isdigit():
+            values.append(int(asn))
+    return values
+
+
+def owner_query(asns):
+    return {"owner_asn": {"$in": asn_filter_values(asns)}}
+
+
+# ========== READ ADAPTERS ==========
+
+def list_asn_databases(client):
+    asn_dbs = {}
+    for db_name in client.list_database_names():
+        match = ASN_DB_PATTERN.search(db_name)
+        if match:
+            asn_dbs.setdefault(match.group(1), []).append(db_name)
+    return asn_dbs
+
+
+def asn_index_snapshot_enabled():
+    return os.getenv("asn_index_snapshot", "false").strip('"').strip().lower() == "true"
+
+
+def get_database_marker(client):
+    doc = client[STORAGE_META_DATABASE][STORAGE_MARKERS_COLLECTION].find_one({"_id": ASN_DATABASES_MARKER_ID})
+    return doc.get("version") if doc else None
+
+
+def bump_database_marker(client, reason=""):
+    client[STORAGE_META_DATABASE][STORAGE_MARKERS_COLLECTION].update_one(
+        {"_id": ASN_DATABASES_MARKER_ID},
+        {"$set": {"version": uuid.uuid4().hex, "updated_at": datetime.now(timezone.utc), "reason": reason}},
+        upsert=True
+    )
+    _asn_index_cache.clear()
+
+
+def load_asn_index_snapshot(marker, path=ASN_INDEX_SNAPSHOT_PATH):
+    if marker is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if snapshot.get("marker") != marker:
+        return None
+    return snapshot.get("asn_databases")
+
+
+def save_asn_index_snapshot(asn_dbs, marker, path=ASN_INDEX_SNAPSHOT_PATH):
+    if marker is None:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "marker": marker,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "asn_databases": asn_dbs
+        }, f, indent=2)
+
+
+def get_asn_database_index(client, use_snapshot=None, refresh=False):
+    """
+    ASN → per-ASN database names, parsed from list_database_names() once per run.
+    With asn_index_snapshot="true" the index is reused from disk while the
+    server-side marker is unchanged, which skips the database listing entirely.
+    """
+    key = id(client)
+    if not refresh and key in _asn_index_cache:
+        return _asn_index_cache[key]
+
+    use_snapshot = asn_index_snapshot_enabled() if use_snapshot is None else use_snapshot
+    marker = get_database_marker(client) if use_snapshot else None
+    if use_snapshot and marker is None:
+        # First snapshot on this server: start the marker so later runs can trust it
+        bump_database_marker(client, reason="asn index snapshot initialised")
+        marker = get_database_marker(client)
+
+    asn_dbs = None if refresh else load_asn_index_snapshot(marker)
+    if asn_dbs is None:
+        asn_dbs = list_asn_databases(client)
+        if use_snapshot:
+            save_asn_index_snapshot(asn_dbs, marker)
+    else:
+        print(f"[Storage] Reusing ASN database index snapshot ({len(asn_dbs)} ASNs).")
+
+    _asn_index_cache[key] = asn_dbs
+    return asn_dbs
+
+
+def list_known_asns(client):
+    if not is_consolidated():
+        return sorted(get_asn_database_index(client), key=int)
+
+    db = client[get_consolidated_database_name()]
+    asns = set()
+    for coll_name in db.list_collection_names():
+        if is_report_collection(coll_name):
+            asns.update(str(asn) for asn in db[coll_name].distinct("owner_asn") if asn is not None)
+    return sorted(asns, key=lambda a: (not a.isdigit(), int(a) if a.isdigit() else 0, a))
+
+
+def iter_report_sources(client, asn, asn_dbs=None):
+    """
+    Yield (source_label, collection, base_filter) for every report collection
+    holding rows for `asn`, whatever the storage layout. Callers merge
+    base_filter into their own query, e.g. {**base_filter, "extracted_date": ...}.
+    In consolidated mode each org gets its own source, labelled with the per-ASN
+    database name it replaces, so reports come out the same in both layouts.
+    """
+    if is_consolidated():
+        db = client[get_consolidated_database_name()]
+        owner_filter = owner_query([asn])
+        for coll_name in sorted(db.list_collection_names()):
+            if not is_report_collection(coll_name):
+                continue
+            collection = db[coll_name]
+            for org_folder in sorted(collection.distinct("org_folder", owner_filter)):
+                yield per_asn_database_name(org_folder, asn), collection, {**owner_filter, "org_folder": org_folder}
+        return
+
+    if asn_dbs is None:
+        asn_dbs = get_asn_database_index(client)
+    for db_name in asn_dbs.get(str(asn), []):
+        db = client[db_name]
+        for coll_name in db.list_collection_names():
+            if is_report_collection(coll_name):
+                yield db_name, db[coll_name], {}
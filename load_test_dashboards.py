@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Simple load test for a running dashboard: N concurrent users each fire callback requests
+# against /_dash-update-component and the latency percentiles are printed.
+# Usage: python3 load_test_dashboards.py portable|compare [--url http://127.0.0.1:8050] [--users 10] [--requests 20]
+# Selections default to the newest data on disk (statistical_data/ or db_counts/).
+
+
+def get_arg(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def component_id(id_value):
+    # Pattern-matching ids are sent as compact JSON with sorted keys
+    if isinstance(id_value, dict):
+        return json.dumps(id_value, sort_keys=True, separators=(",", ":"))
+    return id_value
+
+
+def callback_payload(outputs, inputs, state=(), match_keys=()):
+    """
+    Request body Dash expects for a callback: outputs [(id, prop)], inputs/state [(id, prop, value)].
+    match_keys names the id keys declared as MATCH, which the callback is registered under.
+    """
+    output_ids = [
+        f"{component_id({k: ['MATCH'] if k in match_keys else v for k, v in cid.items()} if isinstance(cid, dict) else cid)}.{prop}"
+        for cid, prop in outputs
+    ]
+    return {
+        "output": output_ids[0] if len(output_ids) == 1 else ".." + "...".join(output_ids) + "..",
+        "outputs": [{"id": cid, "property": prop} for cid, prop in outputs] if len(outputs) > 1
+        else {"id": outputs[0][0], "property": outputs[0][1]},
+        "inputs": [{"id": cid, "property": prop, "value": value} for cid, prop, value in inputs],
+        "changedPropIds": [f"{component_id(inputs[0][0])}.{inputs[0][1]}"],
+        "state": [{"id": cid, "property": prop, "value": value} for cid, prop, value in state],
+    }
+
+
+def newest_dates(paths, limit):
+    dates = sorted({os.path.basename(p).rsplit("_", 1)[-1].replace(".csv", "") for p in paths if p.endswith(".csv")})
+    return dates[-limit:]
+
+
+def compare_scenarios():
+    base_dir = "db_counts"
+    dbs = sorted(d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d)))[:int(get_arg("--dbs", 20))]
+    if not dbs:
+        raise SystemExit("No databases under db_counts/. Run check_all_dbs.py first.")
+    dates = newest_dates(os.listdir(os.path.join(base_dir, dbs[0])), 7)
+
+    table_outputs = [("comparison-table", prop) for prop in ("columns", "data", "page_count", "style_data_conditional")]
+    return {
+        "comparison table page": callback_payload(table_outputs, [
+            ("db-select", "value", dbs),
+            ("date-select", "value", dates[-1]),
+            ("comparison-table", "page_current", 0),
+            ("comparison-table", "page_size", 25),
+            ("comparison-table", "sort_by", [{"column_id": dbs[0], "direction": "desc"}]),
+            ("comparison-table", "filter_query", ""),
+        ]),
+    }
+
+
+def portable_scenarios():
+    base_dir = "statistical_data"
+    orgs = sorted(d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d)))
+    if not orgs:
+        raise SystemExit("No organisations under statistical_data/. Run the statistics job first.")
+    org = get_arg("--org", orgs[0])
+    dates = newest_dates(os.listdir(os.path.join(base_dir, org)), 7)
+
+    table_inputs = lambda table_type: [
+        ({"type": table_type, "org": org}, "page_current", 0),
+        ({"type": table_type, "org": org}, "page_size", 15),
+        ({"type": table_type, "org": org}, "sort_by", [{"column_id": "Count" if table_type == "ip-table" else "Category", "direction": "desc"}]),
+        ({"type": table_type, "org": org}, "filter_query", ""),
+    ]
+    table_state = lambda table_type: [
+        ({"type": table_type, "org": org}, "id", {"type": table_type, "org": org}),
+        ("date-dropdown", "value", dates),
+        ("category-dropdown", "value", []),
+    ]
+    return {
+        "category dropdown": callback_payload(
+            [("category-dropdown", "options"), ("category-dropdown", "value")],
+            [("org-dropdown", "value", [org]), ("date-dropdown", "value", dates)]
+        ),
+        "summary table page": callback_payload(
+            [({"type": "summary-table", "org": org}, "data"), ({"type": "summary-table", "org": org}, "page_count")],
+            table_inputs("summary-table"), table_state("summary-table"), match_keys=("org",)
+        ),
+        "ip detail page": callback_payload(
+            [({"type": "ip-table", "org": org}, "data"), ({"type": "ip-table", "org": org}, "page_count")],
+            table_inputs("ip-table"), table_state("ip-table"), match_keys=("org",)
+        ),
+    }
+
+
+def timed_request(url, body):
+    request = urllib.request.Request(
+        url, data=body,
+        headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"},
+        method="POST"
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            payload = response.read()
+            ok = response.status == 200
+    except Exception:
+        payload, ok = b"", False
+    return time.perf_counter() - started, ok, len(payload)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    dashboard = sys.argv[1] if len(sys.argv) > 1 else ""
+    if dashboard not in ("portable", "compare"):
+        print("Usage: python3 load_test_dashboards.py portable|compare [--url URL] [--users N] [--requests N]")
+        sys.exit(1)
+
+    base_url = get_arg("--url", "http://127.0.0.1:8050").rstrip("/")
+    users = int(get_arg("--users", 10))
+    requests_per_user = int(get_arg("--requests", 20))
+    scenarios = compare_scenarios() if dashboard == "compare" else portable_scenarios()
+    url = f"{base_url}/_dash-update-component"
+
+    print(f"[Load Test] {dashboard} dashboard at {base_url}: {users} users x {requests_per_user} requests per scenario")
+    for name, payload in scenarios.items():
+        body = json.dumps(payload).encode("utf-8")
+        # Warm-up request so the first cache fill is not counted
+        timed_request(url, body)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            results = list(pool.map(lambda _: timed_request(url, body), range(users * requests_per_user)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [seconds * 1000 for seconds, ok, _ in results if ok]
+        errors = sum(1 for _, ok, _ in results if not ok)
+        if not latencies:
+            print(f"❌ {name}: all {len(results)} requests failed")
+            continue
+        print(
+            f"✅ {name:<22} {len(results) / elapsed:7.1f} req/s | "
+            f"p50 {statistics.median(latencies):7.1f} ms | p95 {percentile(latencies, 95):7.1f} ms | "
+            f"p99 {percentile(latencies, 99):7.1f} ms | max {max(latencies):7.1f} ms | "
+            f"{statistics.mean(size for _, ok, size in results if ok) / 1024:.1f} KiB | {errors} error(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import signal
+import csv
+import json
+import gzip
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+# ========== BUFFERED LOG SINK ==========
+# Audit logs (eml exports, attachment arrivals, downloads, unzips, sort movements) are written
+# through one shared sink instead of opening the CSV for every row:
+#   - one file handle per log file stays open for the whole run
+#   - rows are buffered and written when a log reaches log_sink_flush_rows rows,
+#     when log_sink_flush_seconds have passed since the last flush, or at exit
+#   - log_sink_format=csv (default) | jsonl | both
+#     jsonl writes <log name>.jsonl.gz next to the CSV, one {header: value} object per line
+# The shared sink also flushes from a timer thread and closes on SIGTERM, so a GUI's terminate()
+# fallback does not drop the buffered rows (a hard kill loses at most log_sink_flush_seconds).
+
+DEFAULT_FLUSH_ROWS = 500
+DEFAULT_FLUSH_SECONDS = 5.0
+LOG_FORMATS = {"csv", "jsonl", "both"}
+
+
+class _LogFile:
+    def __init__(self, path, headers, log_format, truncate=False):
+        self.headers = list(headers)
+        self.pending = []
+        self.csv_file = None
+        self.jsonl_file = None
+
+        if log_format in ("csv", "both"):
+            is_new = truncate or not os.path.exists(path) or os.path.getsize(path) == 0
+            self.csv_file = open(path, "w" if truncate else "a", newline='', encoding="utf-8")
+            self.csv_writer = csv.writer(self.csv_file)
+            if is_new:
+                self.csv_writer.writerow(self.headers)
+
+        if log_format in ("jsonl", "both"):
+            # Appending adds a new gzip member; gzip readers treat the members as one stream
+            jsonl_path = os.path.splitext(path)[0] + ".jsonl.gz"
+            self.jsonl_file = gzip.open(jsonl_path, "wt" if truncate else "at", encoding="utf-8")
+
+    def flush(self):
+        if self.pending:
+            if self.csv_file:
+                self.csv_writer.writerows(self.pending)
+            if self.jsonl_file:
+                self.jsonl_file.writelines(
+                    json.dumps(dict(zip(self.headers, row)), default=str) + "\n" for row in self.pending
+                )
+            self.pending = []
+        for handle in (self.csv_file, self.jsonl_file):
+            if handle:
+                handle.flush()
+
+    def close(self):
+        self.flush()
+        for handle in (self.csv_file, self.jsonl_file):
+            if handle:
+                handle.close()
+
+
+class _RowWriter:
+    def __init__(self, sink, folder, logname, headers):
+        self.sink = sink
+        self.args = (folder, logname, headers)
+
+    def writerow(self, row):
+        self.sink.write(*self.args, row)
+
+
+class LogSink:
+    def __init__(self, flush_rows=None, flush_seconds=None, log_format=None):
+        self.flush_rows = int(flush_rows or os.getenv("log_sink_flush_rows", DEFAULT_FLUSH_ROWS))
+        self.flush_seconds = float(flush_seconds or os.getenv("log_sink_flush_seconds", DEFAULT_FLUSH_SECONDS))
+        log_format = (log_format or os.getenv("log_sink_format", "csv")).strip('"').strip().lower()
+        if log_format not in LOG_FORMATS:
+            print(f"[Log Sink] Unknown log_sink_format '{log_format}'. Falling back to 'csv'.")
+            log_format = "csv"
+        self.log_format = log_format
+        self.files = {}
+        self.last_flush = time.monotonic()
+        # Reentrant: the SIGTERM handler closes the sink on the main thread, possibly mid-write
+        self.lock = threading.RLock()
+        self.closed = threading.Event()
+
+    def _log_file(self, folder, logname, headers, truncate=False):
+        path = os.path.join(folder, logname)
+        log_file = self.files.get(path)
+        if log_file is not None and truncate:
+            log_file.close()
+            log_file = None
+        if log_file is None:
+            os.makedirs(folder, exist_ok=True)
+            log_file = self.files[path] = _LogFile(path, headers, self.log_format, truncate)
+        return log_file
+
+    def write_rows(self, folder, logname, headers, rows):
+        with self.lock:
+            log_file = self._log_file(folder, logname, headers)
+            log_file.pending.extend(list(row) for row in rows)
+            if len(log_file.pending) >= self.flush_rows:
+                log_file.flush()
+            if time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush_all()
+
+    def write(self, folder, logname, headers, row):
+        self.write_rows(folder, logname, headers, [row])
+
+    @contextmanager
+    def writer(self, folder, logname, headers, truncate=False):
+        """
+        Row writer for one log (csv.writer-like writerow); the log is flushed when the block exits.
+        truncate=True starts the log over, like open(..., "w").
+        """
+        if truncate:
+            with self.lock:
+                self._log_file(folder, logname, headers, truncate=True)
+        try:
+            yield _RowWriter(self, folder, logname, headers)
+        finally:
+            self.flush(os.path.join(folder, logname))
+
+    def _flush_all(self):
+        for log_file in self.files.values():
+            log_file.flush()
+        self.last_flush = time.monotonic()
+
+    def flush(self, path=None):
+        with self.lock:
+            if path is None:
+                self._flush_all()
+            elif path in self.files:
+                self.files[path].flush()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            for log_file in self.files.values():
+                log_file.close()
+            self.files = {}
+
+    def start_flush_timer(self):
+        """Flush every flush_seconds from a daemon thread, so rows do not wait for the next write."""
+        def run():
+            while not self.closed.wait(self.flush_seconds):
+                self.flush()
+        threading.Thread(target=run, name="log-sink-flush", daemon=True).start()
+
+
+def _close_on_sigterm(sink):
+    """Close the sink on SIGTERM, then terminate as the default handler would."""
+    if not hasattr(signal, "SIGTERM") or signal.getsignal(signal.SIGTERM) != signal.SIG_DFL:
+        return
+
+    def handler(signum, frame):
+        sink.close()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+    try:
+        signal.signal(signal.SIGTERM, handler)
+    except ValueError:
+        pass  # Not on the main thread; the flush timer still bounds what a kill can lose
+
+
+_shared_sink = None
+
+
+def get_log_sink():
+    """The process-wide sink shared by all stages; buffered rows are written at exit or SIGTERM."""
+    global _shared_sink
+    if _shared_sink is None:
+        _shared_sink = LogSink()
+        atexit.register(_shared_sink.close)
+        _shared_sink.start_flush_timer()
+        _close_on_sigterm(_shared_sink)
+    return _shared_sink
@@ -0,0 +1,196 @@
+import os
+import sys
+import csv
+import time
+import pandas as pd
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+from urllib.parse import quote_plus
+from knowledgebase_storage import (
+    ASN_DB_PATTERN, get_consolidated_database_name, asn_field_value, is_consolidated, per_asn_database_name,
+    bump_database_marker
+)
+
+# Copies every per-ASN database (<org_folder>_as<asn>) into the consolidated events database.
+# Usage: python3 migrate_to_consolidated_storage.py [--yes] [--drop-source]
+#   --yes          skip the confirmation prompt
+#   --drop-source  drop each per-ASN database once its copy has been verified: every collection's
+#                  exact document count must equal the target documents stamped with its
+#                  (org_folder, owner_asn), the keys its rows are merged on
+
+load_dotenv()
+
+username = os.getenv("mongo_username")
+password = os.getenv("mongo_password")
+auth_source = os.getenv("mongo_auth_source", "admin")
+host = os.getenv("mongo_host", "127.0.0.1")
+port = int(os.getenv("mongo_port", 27017))
+mongo_encoded_user = quote_plus(username)
+mongo_encoded_pass = quote_plus(password)
+# MongoDB URI
+uri = f"mongodb://{mongo_encoded_user}:{mongo_encoded_pass}@{host}:{port}/?authSource={auth_source}"
+
+auto_confirm = "--yes" in sys.argv
+drop_source = "--drop-source" in sys.argv
+
+# Setup log folder
+log_folder = os.path.join("logging", "storage_migration")
+os.makedirs(log_folder, exist_ok=True)
+
+timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+csv_log_path = os.path.join(log_folder, f"consolidated_migration_{timestamp}.csv")
+
+asn_map_path = os.path.join("shadowserver_analysis_system", "detected_companies", "asn_org_map.csv")
+
+client = MongoClient(uri)
+target_db_name = get_consolidated_database_name()
+target_db = client[target_db_name]
+
+
+def merge_keys(coll_name):
+    # Rows keep the identity they had in their per-ASN database, scoped by (org_folder, owner_asn)
+    if coll_name.startswith("files_"):
+        return ["org_folder", "owner_asn", "filename", "category"]
+    if coll_name.startswith("archive_"):
+        return ["_id"]
+    return ["org_folder", "owner_asn", "filename", "category", "line_hash"]
+
+
+def migrate_collection(source_coll, target_name, asn, org_folder):
+    # Server-side copy; keepExisting makes re-runs idempotent
+    pipeline = [
+        {"$addFields": {
+            "org_folder": org_folder,
+            "owner_asn": asn_field_value(asn),
+        }},
+        {"$merge": {
+            "into": {"db": target_db_name, "coll": target_name},
+            "on": merge_keys(target_name),
+            "whenMatched": "keepExisting",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    source_coll.aggregate(pipeline, allowDiskUse=True)
+
+
+def migrate_discovered_fields(source_coll, target_name):
+    ops = []
+    for doc in source_coll.find({}, {"_id": 0, "category": 1, "field_name": 1}):
+        if not doc.get("field_name"):
+            continue
+        key = {"category": doc.get("category"), "field_name": doc["field_name"]}
+        ops.append(UpdateOne(key, {"$setOnInsert": key}, upsert=True))
+    if ops:
+        target_db[target_name].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def ensure_target_indexes(coll_name):
+    coll = target_db[coll_name]
+    if coll_name.startswith("files_"):
+        coll.create_index([("org_folder", 1), ("owner_asn", 1), ("filename", 1), ("category", 1)], unique=True)
+        coll.create_index([("org_folder", 1), ("owner_asn", 1), ("filename", 1), ("category", 1), ("ingested", 1)])
+    elif coll_name.startswith("discovered_fields_"):
+        coll.create_index([("category", 1), ("field_name", 1)], unique=True)
+    elif coll_name.startswith("archive_"):
+        coll.create_index([("extracted_date", 1)])
+    else:
+        coll.create_index([("org_folder", 1), ("owner_asn", 1), ("filename", 1), ("category", 1), ("line_hash", 1)], unique=True)
+        coll.create_index([("owner_asn", 1), ("org_folder", 1), ("extracted_date", 1)])
+        coll.create_index([("org_folder", 1), ("extracted_date", 1)])
+        coll.create_index([("extracted_date", 1)])
+
+
+def load_org_folders():
+    # Database names are sanitised, so map them back to the org_folder ingest stores on each row
+    if not os.path.exists(asn_map_path):
+        return {}
+    asn_df = pd.read_csv(asn_map_path, dtype=str)
+    return {
+        per_asn_database_name(row["org_folder"], row["asn"]): row["org_folder"]
+        for _, row in asn_df.iterrows()
+    }
+
+
+org_folders = load_org_folders()
+all_dbs = client.list_database_names()
+source_dbs = [db for db in all_dbs if ASN_DB_PATTERN.search(db) and db != target_db_name]
+
+# Step 1: Dry run display
+print("=== DRY RUN ===")
+print(f"Target database: {target_db_name}")
+print("The following per-ASN databases will be copied into the target:")
+for db in source_dbs:
+    print(f"- {db}")
+if drop_source:
+    print("\nSource databases will be DROPPED after their copy is verified.")
+if not is_consolidated():
+    print("\nNote: knowledgebase_storage_mode is not 'consolidated' yet. Set it in .env once the migration succeeds.")
+
+if not source_dbs:
+    print("\nNo per-ASN databases found.")
+    sys.exit(0)
+
+# Step 2: Ask for confirmation
+if not auto_confirm:
+    choice = input("\nDo you want to proceed with the migration? (yes/no): ").strip().lower()
+    if choice not in ['yes', 'y']:
+        print("\nNo action taken. Migration canceled.")
+        sys.exit(0)
+
+print("\n=== MIGRATION STARTED ===")
+with open(csv_log_path, mode="w", newline="") as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["database_name", "collection_name", "source_count", "target_count", "verified", "seconds", "dropped", "migrated_at"])
+
+    for db_name in source_dbs:
+        asn = ASN_DB_PATTERN.search(db_name).group(1)
+        org_folder = org_folders.get(db_name, db_name[:ASN_DB_PATTERN.search(db_name).start()])
+        source_db = client[db_name]
+        db_verified = True
+
+        print(f"\n[Migrate] {db_name} → {target_db_name} (org_folder={org_folder}, asn={asn})")
+        for coll_name in source_db.list_collection_names():
+            started = time.perf_counter()
+            source_coll = source_db[coll_name]
+            source_count = source_coll.count_documents({})
+
+            try:
+                # $merge needs the unique index behind its "on" fields to exist first
+                ensure_target_indexes(coll_name)
+                if coll_name.startswith("discovered_fields_"):
+                    migrate_discovered_fields(source_coll, coll_name)
+                    # Field names are shared across ASNs, so only check every name arrived
+                    names = set(source_coll.distinct("field_name"))
+                    target_count = len(names & set(target_db[coll_name].distinct("field_name")))
+                    verified = target_count == len(names)
+                    source_count = len(names)
+                else:
+                    migrate_collection(source_coll, coll_name, asn, org_folder)
+                    # Only this source's rows carry its (org_folder, owner_asn), so the counts must match exactly.
+                    # Rows ingested in consolidated mode for the same owner make the target larger; the
+                    # source is then kept, since the copy can no longer be told apart from them by count.
+                    target_count = target_db[coll_name].count_documents(
+                        {"org_folder": org_folder, "owner_asn": asn_field_value(asn)}
+                    )
+                    verified = target_count == source_count
+            except Exception as e:
+                print(f"❌ [Migrate] {db_name}.{coll_name} failed: {e}")
+                target_count, verified = 0, False
+
+            elapsed = round(time.perf_counter() - started, 2)
+            db_verified = db_verified and verified
+            status = "✅" if verified else "⚠️"
+            print(f"{status} {coll_name}: {source_count} → {target_count} ({elapsed}s)")
+            writer.writerow([db_name, coll_name, source_count, target_count, verified, elapsed, False, datetime.now().isoformat()])
+
+        if drop_source and db_verified:
+            print(f"Dropping: {db_name}")
+            client.drop_database(db_name)
+            bump_database_marker(client, reason=f"migration dropped {db_name}")
+            writer.writerow([db_name, "*", "", "", True, "", True, datetime.now().isoformat()])
+        elif drop_source:
+            print(f"⚠️ Keeping {db_name}: one or more collections did not verify.")
+
+print(f"\n=== DONE. Log saved to: {csv_log_path} ===")
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+from datetime import datetime
+from log_sink import get_log_sink
+from pipeline_events import emit, events_enabled
+from pipeline_profiler import add_metric
+
+# ========== CONSOLE OUTPUT LEVELS ==========
+# normal   (default)     every per-item line is printed, as before
+# progress (--progress)  per-item lines go to logging/console_detail/ only; the console gets one
+#                        rate-limited progress line per stage (at most progress_updates_per_second)
+# quiet    (--quiet)     per-item lines go to logging/console_detail/ only, no progress lines
+# Stage banners, summaries, warnings and errors are plain print() calls and show in every mode.
+# progress()/progress_done()/report_error() also feed the structured event channel when one is open.
+# progress() counts items/bytes for the running stage's metrics (pipeline_profiler.py) in every mode.
+
+MODE_NORMAL = "normal"
+MODE_PROGRESS = "progress"
+MODE_QUIET = "quiet"
+
+DETAIL_LOG_DIR = os.path.join("logging", "console_detail")
+DETAIL_LOG_HEADERS = ["timestamp", "stage", "message"]
+
+_mode = MODE_NORMAL
+_detail_log_name = f"console_detail_{datetime.now().strftime('%Y-%m-%d_%H%M')}.csv"
+_progress = {}
+
+# Seconds between progress events on the structured channel (see pipeline_events.py)
+EVENT_INTERVAL = 0.25
+
+
+def mode_from_flags(flags):
+    if "--quiet" in flags:
+        return MODE_QUIET
+    if "--progress" in flags:
+        return MODE_PROGRESS
+    return MODE_NORMAL
+
+
+def set_console_mode(mode):
+    global _mode
+    _mode = mode
+
+
+def console_mode():
+    return _mode
+
+
+def detail(message, stage=""):
+    """A per-item line: printed in normal mode, otherwise written to the detail log."""
+    if _mode == MODE_NORMAL:
+        print(message)
+        return
+    get_log_sink().write(
+        DETAIL_LOG_DIR, _detail_log_name, DETAIL_LOG_HEADERS,
+        [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), stage, message.strip()]
+    )
+
+
+def progress_enabled():
+    """True when progress() output goes anywhere (progress mode or an event channel)."""
+    return _mode == MODE_PROGRESS or events_enabled()
+
+
+def _stage_state(stage, total, now):
+    state = _progress.get(stage)
+    if state is None:
+        state = _progress[stage] = {
+            "started": now, "printed": now, "emitted": now, "done": 0, "skipped": 0, "bytes": 0, "total": None
+        }
+        emit("stage_start", stage, total=total)
+    if total is not None:
+        state["total"] = total
+    return state
+
+
+def _progress_stats(state):
+    elapsed = max(time.monotonic() - state["started"], 1e-9)
+    done = state["done"]
+    total = state["total"]
+    # Skipped items (tracker hits, already ingested) count towards done but not towards the rate
+    rate = (done - state["skipped"]) / elapsed
+    stats = {
+        "done": done,
+        "total": total,
+        "skipped": state["skipped"] or None,
+        "bytes": state["bytes"] or None,
+        "rate": round(rate, 2),
+        "bytes_rate": round(state["bytes"] / elapsed) if state["bytes"] else None,
+        "elapsed": round(elapsed, 1),
+    }
+    if total and rate > 0:
+        stats["eta"] = round(max(total - done, 0) / rate, 1)
+    return stats
+
+
+def _progress_line(stage, stats):
+    count = f"{stats['done']}/{stats['total']}" if stats["total"] else f"{stats['done']}"
+    skipped = f" ({stats['skipped']} skipped)" if stats["skipped"] else ""
+    return f"[Progress] {stage}: {count} item(s){skipped} | {stats['rate']:.1f}/s | {stats['elapsed']:.0f}s elapsed"
+
+
+def progress_total(stage, total):
+    """Set the number of items stage will go through, so progress lines/events carry an ETA from the start."""
+    if progress_enabled():
+        _stage_state(stage, total, time.monotonic())
+
+
+def progress(stage, total=None, step=1, nbytes=0, skipped=False):
+    """
+    Count step item(s) (and nbytes) for stage; skipped=True counts items that were passed over
+    without work. In progress mode print at most progress_updates_per_second lines; with an
+    event channel emit a progress event every EVENT_INTERVAL.
+    """
+    if not skipped:
+        add_metric("items", step)
+        add_metric("bytes", nbytes)
+    if not progress_enabled():
+        return
+    now = time.monotonic()
+    state = _stage_state(stage, total, now)
+    state["done"] += step
+    if skipped:
+        state["skipped"] += step
+    else:
+        state["bytes"] += nbytes
+
+    if _mode == MODE_PROGRESS:
+        interval = 1.0 / max(float(os.getenv("progress_updates_per_second", 2)), 0.01)
+        if now - state["printed"] >= interval:
+            state["printed"] = now
+            print(_progress_line(stage, _progress_stats(state)))
+            sys.stdout.flush()
+
+    if now - state["emitted"] >= EVENT_INTERVAL:
+        state["emitted"] = now
+        emit("progress", stage, **_progress_stats(state))
+
+
+def progress_done(stage, total=None):
+    """Final progress line / stage_end event for stage, and reset its counter."""
+    state = _progress.pop(stage, None)
+    if state is None:
+        state = {"started": time.monotonic(), "done": 0, "skipped": 0, "bytes": 0, "total": None}
+    if total is not None:
+        state["total"] = total
+    stats = _progress_stats(state)
+    if _mode == MODE_PROGRESS and stats["done"]:
+        print(_progress_line(stage, stats) + " | done")
+        sys.stdout.flush()
+    emit("stage_end", stage, **stats)
+
+
+def report_error(message, stage=""):
+    """An error line: printed in every mode and sent as an error event."""
+    print(message)
+    emit("error", stage, message=message.strip())
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import tempfile
+
+# ========== STRUCTURED PROGRESS EVENTS ==========
+# The pipeline writes newline-delimited JSON progress events on a channel separate from stdout,
+# so the GUIs can draw progress bars without parsing console text:
+#   pipeline_events_fd=<fd>       write end of a pipe inherited from the GUI (Linux/macOS)
+#   pipeline_events_path=<path>   append to a file instead (Windows, or to record a run from a shell)
+# With neither set, emit() does nothing.
+#
+# One object per line, e.g.
+#   {"ts": 1760000000.0, "event": "progress", "stage": "ingest", "done": 120, "total": 400,
+#    "bytes": 5242880, "rate": 35.2, "bytes_rate": 1538000, "elapsed": 3.4, "eta": 7.9}
+# skipped (tracker hits / already ingested) is included in done but not in rate or bytes.
+# event: run_start (tasks) | stage_start | progress | stage_end | error (message)
+
+EVENTS_FD_ENV = "pipeline_events_fd"
+EVENTS_PATH_ENV = "pipeline_events_path"
+
+_channel = None
+
+
+def _open_channel():
+    fd = os.getenv(EVENTS_FD_ENV)
+    path = os.getenv(EVENTS_PATH_ENV)
+    try:
+        if fd:
+            return os.fdopen(int(fd), "w", encoding="utf-8", buffering=1)
+        if path:
+            return open(path, "a", encoding="utf-8", buffering=1)
+    except (OSError, ValueError) as e:
+        print(f"[Events] Could not open the progress event channel: {e}")
+    return False
+
+
+def events_enabled():
+    global _channel
+    if _channel is None:
+        _channel = _open_channel()
+    return bool(_channel)
+
+
+def emit(event, stage=None, **fields):
+    global _channel
+    if not events_enabled():
+        return
+    record = {"ts": round(time.time(), 3), "event": event}
+    if stage:
+        record["stage"] = stage
+    record.update({key: value for key, value in fields.items() if value is not None})
+    try:
+        _channel.write(json.dumps(record, default=str) + "\n")
+    except (OSError, ValueError):
+        # Reader went away (GUI closed); keep the pipeline running without events
+        _channel = False
+
+
+# ========== GUI SIDE ==========
+
+def parse_event(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and "event" in event else None
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def format_progress(event):
+    """One status-bar line for a progress/stage event, e.g. 'ingest 120/400 | 35.2/s | 1.5 MB/s | ETA 8s'."""
+    stage = event.get("stage", "")
+    if event["event"] == "error":
+        return f"{stage}: {event.get('message', 'error')}"
+
+    done = event.get("done", 0)
+    total = event.get("total")
+    parts = [f"{stage} {done}/{total}" if total else f"{stage} {done}"]
+    if event.get("rate") is not None:
+        parts.append(f"{event['rate']:.1f}/s")
+    if event.get("bytes_rate"):
+        parts.append(f"{event['bytes_rate'] / 1e6:.1f} MB/s")
+    if event["event"] == "stage_end":
+        parts.append(f"done in {format_duration(event.get('elapsed', 0))}")
+    elif event.get("eta") is not None:
+        parts.append(f"ETA {format_duration(event['eta'])}")
+    return " | ".join(parts)
+
+
+def progress_fraction(event):
+    """0..1 for a progress bar, or None when the stage has no known total."""
+    if event.get("event") == "stage_end":
+        return 1.0
+    total = event.get("total")
+    if not total:
+        return None
+    return min(event.get("done", 0) / total, 1.0)
+
+
+class EventChannel:
+    """
+    Event channel for one pipeline subprocess:
+        channel = EventChannel()
+        process = subprocess.Popen(cmd, env=channel.env, **channel.popen_kwargs, ...)
+        channel.started()
+        for event in channel.events(process): ...   # in a reader thread; ends when the child exits
+    """
+    def __init__(self):
+        self.env = dict(os.environ)
+        self.popen_kwargs = {}
+        self.read_fd = self.write_fd = self.path = None
+
+        if os.name == "posix":
+            self.read_fd, self.write_fd = os.pipe()
+            self.env[EVENTS_FD_ENV] = str(self.write_fd)
+            self.popen_kwargs["pass_fds"] = (self.write_fd,)
+        else:
+            # No fd inheritance by number on Windows: the child appends to a temp file that is tailed
+            fd, self.path = tempfile.mkstemp(prefix="pipeline_events_", suffix=".ndjson")
+            os.close(fd)
+            self.env[EVENTS_PATH_ENV] = self.path
+
+    def started(self):
+        # Drop the parent's copy of the write end so the reader sees EOF when the child exits
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+    def events(self, process):
+        if self.read_fd is not None:
+            read_fd, self.read_fd = self.read_fd, None
+            with os.fdopen(read_fd, "r", encoding="utf-8") as stream:
+                for line in stream:
+                    event = parse_event(line)
+                    if event:
+                        yield event
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as stream:
+                partial = ""
+                exited = False
+                while True:
+                    line = stream.readline()
+                    if line:
+                        partial += line
+                        if partial.endswith("\n"):
+                            event = parse_event(partial)
+                            partial = ""
+                            if event:
+                                yield event
+                    elif exited:
+                        break
+                    elif process.poll() is not None:
+                        exited = True  # one more pass for lines written just before exit
+                    else:
+                        time.sleep(0.2)
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,174 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+# ========== PIPELINE RUN PROFILER ==========
+# main() runs every task inside profile_stage(<task>); the stages bump counters with add_metric().
+# Per stage: wall time, CPU time, peak RSS, items/rows/bytes processed, Mongo operations, WHOIS calls.
+# At the end of the run:
+#   logging/pipeline_profiles/run_<timestamp>.json   one record per stage
+#   a summary table on the console
+# --profile                  run every stage under cProfile (<timestamp>_<stage>.prof + top functions .txt)
+# --profile=process,ingest   only those stages
+# profile_engine=pyinstrument in .env writes pyinstrument HTML instead, when pyinstrument is installed.
+
+PROFILE_DIR = os.path.join("logging", "pipeline_profiles")
+COUNTERS = ["items", "rows", "bytes", "mongo_ops", "whois_calls"]
+RSS_SAMPLE_SECONDS = 0.5
+
+_run = {"stages": [], "started": None, "timestamp": None, "profile_stages": set()}
+_current = None
+
+
+def start_run(tasks, profile_stages=()):
+    _run["started"] = time.perf_counter()
+    _run["started_at"] = datetime.now().isoformat(timespec="seconds")
+    _run["timestamp"] = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    _run["tasks"] = list(tasks)
+    _run["profile_stages"] = set(profile_stages)
+    _run["stages"] = []
+
+
+def profile_stages_from_flags(flags, tasks):
+    """--profile -> every task, --profile=a,b -> those stages, no flag -> none"""
+    for flag in flags:
+        if flag == "--profile":
+            return set(tasks)
+        if flag.startswith("--profile="):
+            return {name.strip() for name in flag.split("=", 1)[1].split(",") if name.strip()}
+    return set()
+
+
+def add_metric(metric, n=1):
+    """Add n to a counter of the running stage (no-op outside a stage)"""
+    if _current is not None and n:
+        _current[metric] += n
+
+
+def _current_rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class _RssSampler(threading.Thread):
+    """Samples this process's RSS while a stage runs and keeps the peak"""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = _current_rss()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(RSS_SAMPLE_SECONDS):
+            rss = _current_rss()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def stop(self):
+        self.stopped.set()
+        rss = _current_rss()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+        return self.peak
+
+
+def _start_profiler():
+    if os.getenv("profile_engine", "cprofile").strip('"').lower() == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            return "pyinstrument", profiler
+        except ImportError:
+            print("[Profile] pyinstrument not installed. Falling back to cProfile.")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return "cprofile", profiler
+
+
+def _save_profiler(engine, profiler, stage):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{_run['timestamp']}_{stage}")
+    if engine == "pyinstrument":
+        profiler.stop()
+        path = base + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        return path
+
+    profiler.disable()
+    path = base + ".prof"
+    profiler.dump_stats(path)
+    # Readable top list next to the .prof (open the .prof with snakeviz or pstats for the rest)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+    with open(base + "_top.txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    return path
+
+
+@contextmanager
+def profile_stage(stage):
+    global _current
+    record = {"stage": stage, "wall_seconds": 0, "cpu_seconds": 0, "peak_rss_mb": None,
+              **{name: 0 for name in COUNTERS}, "status": "ok"}
+    previous, _current = _current, record
+    sampler = _RssSampler()
+    sampler.start()
+    profiler = _start_profiler() if stage in _run["profile_stages"] else None
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except SystemExit as e:
+        record["status"] = f"exit({e.code})"
+        raise
+    except BaseException as e:
+        record["status"] = f"error: {type(e).__name__}: {e}"
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - wall_start, 3)
+        record["cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+        if profiler:
+            record["profile_path"] = _save_profiler(*profiler, stage)
+        peak = sampler.stop()
+        record["peak_rss_mb"] = round(peak / 1048576, 1) if peak else None
+        _current = previous
+        _run["stages"].append(record)
+
+
+def write_run_report():
+    """Write logging/pipeline_profiles/run_<timestamp>.json and print the summary table"""
+    if not _run["stages"]:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"run_{_run['timestamp']}.json")
+    report = {
+        "started_at": _run["started_at"],
+        "tasks": _run["tasks"],
+        "total_wall_seconds": round(time.perf_counter() - _run["started"], 3),
+        "stages": _run["stages"],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n[Profile] Stage metrics ({report['total_wall_seconds']:.1f}s total), saved to {path}")
+    header = f"  {'stage':<9}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'items':>9}{'rows':>11}{'MB':>9}{'mongo ops':>11}{'whois':>7}  status"
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+    for s in _run["stages"]:
+        peak = f"{s['peak_rss_mb']:.0f}" if s["peak_rss_mb"] is not None else "-"
+        print(
+            f"  {s['stage']:<9}{s['wall_seconds']:>9.1f}{s['cpu_seconds']:>9.1f}{peak:>9}{s['items']:>9}"
+            f"{s['rows']:>11}{s['bytes'] / 1048576:>9.1f}{s['mongo_ops']:>11}{s['whois_calls']:>7}  {s['status']}"
+        )
+        if s.get("profile_path"):
+            print(f"    profile: {s['profile_path']}")
+    return path
@@ -1,13 +1,15 @@
 import dash
 from dash import Dash, html, dcc, dash_table, clientside_callback, ClientsideFunction
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, MATCH
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import os
 import glob
-import re
+from functools import lru_cache
 from dotenv import load_dotenv
+from statistics_columnar_store import columnar_available, has_partition, read_category_counts, read_tidy_rows
+from dashboard_table_query import PAGE_SIZE, apply_table_query
 
 # === Load environment variables ===
 load_dotenv()
@@ -19,39 +21,125 @@ app = dash.Dash(__name__, external_stylesheets=[
 # Set path to the 'statistical_data' folder
 base_dir = 'statistical_data'
 
-# Get a list of all organization folders
-org_folders = [folder for folder in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, folder))]
+# Get a list of all organization folders (read per page load, so new organisations show up without a restart)
+def list_org_folders():
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(folder for folder in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, folder)))
 
-def load_csv_files(org_name, dates):
+# === Cached data layer ===
+# Parsed category counts are kept per file, keyed on (path, mtime, size): a file is read
+# again only after it changes, not on every dropdown or chart interaction.
+CATEGORY_PATTERN = r'(?:^|,)\s*([a-zA-Z0-9_]+)\[(\d+)\]'
+cache_size = int(os.getenv("dashboard_cache_size", 256))
+
+def extract_category_counts(df):
+    # "cat_a[3], cat_b[1]" -> one row per category, parsed for the whole column at once
+    matches = df['category'].astype('string').str.extractall(CATEGORY_PATTERN)
+    if matches.empty:
+        return pd.DataFrame({'Category': pd.Series(dtype='object'), 'Count': pd.Series(dtype='int64')})
+    count_df = pd.DataFrame({
+        'Category': matches[0].astype(str).to_numpy(),
+        'Count': matches[1].astype('int64').to_numpy()
+    })
+    return count_df.groupby('Category', as_index=False, sort=True)['Count'].sum()
+
+@lru_cache(maxsize=cache_size)
+def _cached_category_counts(file_path, mtime_ns, size):
+    return extract_category_counts(pd.read_csv(file_path, usecols=['category']))
+
+def file_category_counts(file_path):
+    stat = os.stat(file_path)
+    return _cached_category_counts(file_path, stat.st_mtime_ns, stat.st_size)
+
+use_columnar = columnar_available()
+
+def load_category_counts(org_name, dates):
+    """Category counts for an organization: columns Category, Count, Date (one row per category and source)."""
     folder_path = os.path.join(base_dir, org_name)
     data = []
-    
+
+    # Dates with a Parquet partition are read in one pruned scan; older dates fall back to the CSVs
+    columnar_dates = [date for date in dates if use_columnar and has_partition(org_name, date)]
+    if columnar_dates:
+        columnar_df = read_category_counts([org_name], columnar_dates)
+        data.append(columnar_df.rename(columns={'category': 'Category', 'count': 'Count', 'date': 'Date'})[['Category', 'Count', 'Date']])
+
     for date in dates:
-        pattern = os.path.join(folder_path, f"*{date}*.csv")
-        files = glob.glob(pattern)
-        
-        for file in files:
-            df = pd.read_csv(file)
-            df['Date'] = date
-            data.append(df)
-    
-    return pd.concat(data, ignore_index=True), files
+        if date in columnar_dates:
+            continue
+        for file in glob.glob(os.path.join(folder_path, f"*{date}*.csv")):
+            # Cached frames are shared between callbacks, so tag a copy with the date
+            count_df = file_category_counts(file).assign(Date=date)
+            data.append(count_df)
+
+    if not data:
+        raise ValueError(f"No CSV files found for {org_name} on the selected dates")
+    return pd.concat(data, ignore_index=True)
+
+IP_DETAIL_COLUMNS = ['Date', 'IP', 'Prefix', 'ASN', 'Category', 'Count']
+
+@lru_cache(maxsize=cache_size)
+def _cached_ip_rows(file_path, mtime_ns, size):
+    # One row per (IP or prefix, category), same shape as the columnar store
+    df = pd.read_csv(file_path, usecols=['ip_address', 'prefix', 'asn', 'category'], dtype=str).fillna('')
+    matches = df['category'].str.extractall(CATEGORY_PATTERN)
+    rows = df.iloc[matches.index.get_level_values(0)]
+    return pd.DataFrame({
+        'IP': rows['ip_address'].to_numpy(),
+        'Prefix': rows['prefix'].str.split(' (', n=1, regex=False).str[0].to_numpy(),
+        'ASN': rows['asn'].to_numpy(),
+        'Category': matches[0].to_numpy(),
+        'Count': matches[1].astype('int64').to_numpy()
+    })
 
-def extract_category_counts(df):
-    categories_split = df['category'].str.split(',')
-    all_counts = []
+def load_ip_rows(org_name, dates):
+    """Per-IP detail for an organization: columns Date, IP, Prefix, ASN, Category, Count."""
+    folder_path = os.path.join(base_dir, org_name)
+    data = []
+
+    columnar_dates = [date for date in dates if use_columnar and has_partition(org_name, date)]
+    if columnar_dates:
+        tidy_df = read_tidy_rows([org_name], columnar_dates)
+        data.append(tidy_df.rename(columns={
+            'date': 'Date', 'ip': 'IP', 'prefix': 'Prefix', 'asn': 'ASN', 'category': 'Category', 'count': 'Count'
+        })[IP_DETAIL_COLUMNS])
+
+    for date in dates:
+        if date in columnar_dates:
+            continue
+        for file in glob.glob(os.path.join(folder_path, f"*{date}*.csv")):
+            stat = os.stat(file)
+            data.append(_cached_ip_rows(file, stat.st_mtime_ns, stat.st_size).assign(Date=date)[IP_DETAIL_COLUMNS])
+
+    if not data:
+        return pd.DataFrame(columns=IP_DETAIL_COLUMNS)
+    return pd.concat(data, ignore_index=True)
+
+def build_summary_pivot(org_name, selected_dates, selected_categories):
+    """Category x date counts for an organization, with change columns between consecutive dates."""
+    count_df = load_category_counts(org_name, selected_dates)
+    if selected_categories:
+        count_df = count_df[count_df['Category'].isin(selected_categories)]
+
+    summed_count_df = count_df.groupby(['Category', 'Date'], as_index=False)['Count'].sum()
+    if summed_count_df.empty:
+        return summed_count_df, summed_count_df
 
-    for idx, categories in enumerate(categories_split):
-        for category in categories:
-            category = category.strip()
-            match = re.match(r'([a-zA-Z0-9_]+)\[(\d+)\]', category)
-            if match:
-                category_name = match.group(1)
-                count = int(match.group(2))
-                all_counts.append((category_name, count, df.loc[idx, 'Date']))
+    pivot_df = summed_count_df.pivot(index='Category', columns='Date', values='Count').reset_index()
+    pivot_df.columns.name = None
 
-    count_df = pd.DataFrame(all_counts, columns=['Category', 'Count', 'Date'])
-    return count_df
+    date_columns = sorted([col for col in pivot_df.columns if col != 'Category'], reverse=True)
+    pivot_df = pivot_df[['Category'] + date_columns]
+
+    # Calculate trends
+    if len(selected_dates) > 1:
+        for i in range(1, len(date_columns)):
+            date_col = date_columns[i]
+            prev_date_col = date_columns[i - 1]
+            pivot_df[f'Change ({prev_date_col} to {date_col})'] = pivot_df[date_col] - pivot_df[prev_date_col]
+
+    return summed_count_df, pivot_df
 
 # Professional CSS styles
 app.index_string = '''
@@ -450,109 +538,113 @@ app.index_string = '''
 # Professional layout
 cert_name = os.getenv("cert_name", "default-cert")
 # Professional layout
-app.layout = html.Div([
-    # Header
-    html.Div([
+def serve_layout():
+    org_folders = list_org_folders()
+    return html.Div([
+        # Header
         html.Div([
-            html.H1(cert_name, className="header-title"),
-            html.P("Aggregated Threat Intelligence and Security Analytics", className="header-subtitle")
-        ], className="header-content")
-    ], className="header"),
+            html.Div([
+                html.H1(cert_name, className="header-title"),
+                html.P("Aggregated Threat Intelligence and Security Analytics", className="header-subtitle")
+            ], className="header-content")
+        ], className="header"),
     
-    # Main container
-    html.Div([
-        # Controls section
+        # Main container
         html.Div([
+            # Controls section
             html.Div([
-                # Organization selector
                 html.Div([
-                    html.Label("Organization Selection", className="form-label"),
-                    dcc.Dropdown(
-                        id='org-dropdown',
-                        options=[{'label': org, 'value': org} for org in org_folders],
-                        value=org_folders[0] if org_folders else None,
-                        multi=True,
-                        placeholder="Select organizations to analyze",
-                        className="professional-dropdown"
-                    )
-                ], className="form-group"),
+                    # Organization selector
+                    html.Div([
+                        html.Label("Organization Selection", className="form-label"),
+                        dcc.Dropdown(
+                            id='org-dropdown',
+                            options=[{'label': org, 'value': org} for org in org_folders],
+                            value=org_folders[0] if org_folders else None,
+                            multi=True,
+                            placeholder="Select organizations to analyze",
+                            className="professional-dropdown"
+                        )
+                    ], className="form-group"),
                 
-                # Date selector
-                html.Div([
-                    html.Label("Date Range Selection", className="form-label"),
-                    dcc.Dropdown(
-                        id='date-dropdown',
-                        options=[],
-                        value=[],
-                        multi=True,
-                        placeholder="Select date range for analysis",
-                        className="professional-dropdown"
-                    )
-                ], className="form-group"),
+                    # Date selector
+                    html.Div([
+                        html.Label("Date Range Selection", className="form-label"),
+                        dcc.Dropdown(
+                            id='date-dropdown',
+                            options=[],
+                            value=[],
+                            multi=True,
+                            placeholder="Select date range for analysis",
+                            className="professional-dropdown"
+                        )
+                    ], className="form-group"),
                 
-                # Category selector
-                html.Div([
-                    html.Label("Category Filters", className="form-label"),
-                    dcc.Dropdown(
-                        id='category-dropdown',
-                        options=[],
-                        multi=True,
-                        placeholder="Filter by specific threat categories",
-                        className="professional-dropdown"
-                    )
-                ], className="form-group"),
-            ], className="card-body")
-        ], className="card", style={"margin-bottom": "2rem"}),
+                    # Category selector
+                    html.Div([
+                        html.Label("Category Filters", className="form-label"),
+                        dcc.Dropdown(
+                            id='category-dropdown',
+                            options=[],
+                            multi=True,
+                            placeholder="Filter by specific threat categories",
+                            className="professional-dropdown"
+                        )
+                    ], className="form-group"),
+                ], className="card-body")
+            ], className="card", style={"margin-bottom": "2rem"}),
         
-        # Results section
-        dcc.Loading(
-            id="loading",
-            type="default",
-            color="#3182ce",
-            children=[
-                # Data table section
-                html.Div(
-                    id='data-table',
-                    className="card-body"
-                ),
+            # Results section
+            dcc.Loading(
+                id="loading",
+                type="default",
+                color="#3182ce",
+                children=[
+                    # Data table section
+                    html.Div(
+                        id='data-table',
+                        className="card-body"
+                    ),
                 
-                # Charts section  
-                html.Div(
-                    id='charts-container'
-                )
-            ]
-        )
-    ], className="container"),
-    
-    # Footer
-    html.Div([
-        html.Div([
-            html.P(
-                [
-                    f"© 2025 {cert_name}. ",
-                    html.Span("Documentation: "),
-                    html.A(
-                        "https://anonghosty.github.io/shadowserver_email_automation/",
-                        href="https://anonghosty.github.io/shadowserver_email_automation/",
-                        target="_blank",
-                        style={"color": "inherit", "text-decoration": "underline"}
+                    # Charts section  
+                    html.Div(
+                        id='charts-container'
                     )
-                ],
-                style={
-                    "text-align": "center",
-                    "color": "var(--gray-500)",
-                    "font-size": "0.875rem",
-                    "padding": "2rem 0"
-                }
+                ]
             )
+        ], className="container"),
+    
+        # Footer
+        html.Div([
+            html.Div([
+                html.P(
+                    [
+                        f"© 2025 {cert_name}. ",
+                        html.Span("Documentation: "),
+                        html.A(
+                            "https://anonghosty.github.io/shadowserver_email_automation/",
+                            href="https://anonghosty.github.io/shadowserver_email_automation/",
+                            target="_blank",
+                            style={"color": "inherit", "text-decoration": "underline"}
+                        )
+                    ],
+                    style={
+                        "text-align": "center",
+                        "color": "var(--gray-500)",
+                        "font-size": "0.875rem",
+                        "padding": "2rem 0"
+                    }
+                )
 
-        ], className="container")
-    ], style={
-        "border-top": "1px solid var(--gray-200)",
-        "margin-top": "3rem",
-        "background": "var(--gray-50)"
-    })
-])
+            ], className="container")
+        ], style={
+            "border-top": "1px solid var(--gray-200)",
+            "margin-top": "3rem",
+            "background": "var(--gray-50)"
+        })
+    ])
+
+app.layout = serve_layout
 
 # Callback to update date dropdown
 @app.callback(
@@ -592,9 +684,7 @@ def update_category_dropdown(org_names, dates):
     all_category_counts = []
     for org_name in org_names:
         try:
-            df, files = load_csv_files(org_name, dates)
-            count_df = extract_category_counts(df)
-            all_category_counts.append(count_df)
+            all_category_counts.append(load_category_counts(org_name, dates))
         except Exception as e:
             continue
 
@@ -608,7 +698,46 @@ def update_category_dropdown(org_names, dates):
     
     return category_options, [category_options[0]['value']] if category_options else []
 
-# Main callback to update dashboard
+TABLE_STYLE = dict(
+    style_table={
+        'overflowX': 'auto',
+        'border': 'none'
+    },
+    style_header={
+        'fontWeight': '600',
+        'textTransform': 'uppercase',
+        'fontSize': '12px',
+        'letterSpacing': '0.05em'
+    },
+    style_cell={
+        'fontFamily': 'Inter, sans-serif',
+        'fontSize': '14px',
+        'padding': '12px',
+        'textAlign': 'left'
+    }
+)
+
+def server_side_table(table_id, columns, style_data_conditional=None):
+    # Only the requested page is sent; paging/sorting/filtering are answered by the callbacks below
+    return dash_table.DataTable(
+        id=table_id,
+        columns=columns,
+        data=[],
+        page_current=0,
+        page_size=15,
+        page_action="custom",
+        sort_action="custom",
+        sort_mode="multi",
+        sort_by=[],
+        filter_action="custom",
+        filter_query="",
+        style_data_conditional=style_data_conditional or [],
+        export_format="xlsx",
+        export_headers="display",
+        **TABLE_STYLE
+    )
+
+# Main callback to update dashboard (in-process, so the category-count cache stays warm)
 @app.callback(
     [Output('data-table', 'children'),
      Output('charts-container', 'children')],
@@ -628,57 +757,23 @@ def update_dashboard(org_names, selected_dates, selected_categories):
     if isinstance(org_names, str):
         org_names = [org_names]
 
+    if isinstance(selected_categories, str):
+        selected_categories = [selected_categories]
+
     charts = []
     all_tables = []
     
     for org_name in org_names:
         try:
-            df, files = load_csv_files(org_name, selected_dates)
-            count_df = extract_category_counts(df)
-
-            if isinstance(selected_categories, str):
-                selected_categories = [selected_categories]
+            summed_count_df, pivot_df = build_summary_pivot(org_name, selected_dates, selected_categories)
 
-            if selected_categories:
-                count_df = count_df[count_df['Category'].isin(selected_categories)]
-
-            if count_df.empty:
+            if summed_count_df.empty:
                 continue
 
-            # Create summary table
-            summed_count_df = count_df.groupby(['Category', 'Date'], as_index=False)['Count'].sum()
-            pivot_df = summed_count_df.pivot(index='Category', columns='Date', values='Count').reset_index()
-
-            date_columns = sorted([col for col in pivot_df.columns if col != 'Category'], reverse=True)
-            pivot_df = pivot_df[['Category'] + date_columns]
-
-            # Calculate trends
-            if len(selected_dates) > 1:
-                for i in range(1, len(date_columns)):
-                    date_col = date_columns[i]
-                    prev_date_col = date_columns[i - 1]
-                    pivot_df[f'Change ({prev_date_col} to {date_col})'] = pivot_df[date_col] - pivot_df[prev_date_col]
-
             # Professional table
-            table = dash_table.DataTable(
+            table = server_side_table(
+                {'type': 'summary-table', 'org': org_name},
                 columns=[{"name": col, "id": col, "type": "numeric" if col != "Category" else "text"} for col in pivot_df.columns],
-                data=pivot_df.head(50).to_dict('records'),
-                style_table={
-                    'overflowX': 'auto',
-                    'border': 'none'
-                },
-                style_header={
-                    'fontWeight': '600',
-                    'textTransform': 'uppercase',
-                    'fontSize': '12px',
-                    'letterSpacing': '0.05em'
-                },
-                style_cell={
-                    'fontFamily': 'Inter, sans-serif',
-                    'fontSize': '14px',
-                    'padding': '12px',
-                    'textAlign': 'left'
-                },
                 style_data_conditional=[
                     {
                         'if': {'column_id': col, 'filter_query': f'{{{col}}} > 0'},
@@ -691,34 +786,25 @@ def update_dashboard(org_names, selected_dates, selected_categories):
                         'backgroundColor': 'rgba(56, 161, 105, 0.1)',
                         'color': '#2d7738'
                     } for col in pivot_df.columns if 'Change' in col
-                ],
-                page_size=15,
-                sort_action="native",
-                filter_action="native",
-                export_format="xlsx",
-                export_headers="display"
+                ]
+            )
+
+            # Full per-IP detail, paged on the server
+            ip_table = server_side_table(
+                {'type': 'ip-table', 'org': org_name},
+                columns=[{"name": col, "id": col, "type": "numeric" if col == "Count" else "text"} for col in IP_DETAIL_COLUMNS]
             )
 
             all_tables.append(html.Div([
                 html.H4(f"{org_name} Summary", className="heading-4", style={"margin-bottom": "1rem"}),
-                table
+                table,
+                html.H4(f"{org_name} IP Detail", className="heading-4", style={"margin": "1.5rem 0 1rem"}),
+                ip_table
             ], style={"margin-bottom": "2rem"}))
 
-            # Create professional chart
-            comparison_data = []
-            for date in selected_dates:
-                file_data = load_csv_files(org_name, [date])[0]
-                file_count_df = extract_category_counts(file_data)
-                summed_file_count_df = file_count_df.groupby('Category', as_index=False)['Count'].sum()
-                summed_file_count_df['Date'] = date
-                comparison_data.append(summed_file_count_df)
-
-            comparison_df = pd.concat(comparison_data)
-            if selected_categories:
-                comparison_df = comparison_df[comparison_df['Category'].isin(selected_categories)]
-
-            if comparison_df.empty:
-                continue
+            # Create professional chart from the same counts (dates kept in selection order)
+            date_order = {date: i for i, date in enumerate(selected_dates)}
+            comparison_df = summed_count_df.sort_values('Date', key=lambda dates: dates.map(date_order), kind='stable')
 
             # Professional chart with clean styling
             figure = px.bar(
@@ -790,5 +876,59 @@ def update_dashboard(org_names, selected_dates, selected_categories):
         html.P("No data available for the selected criteria.", className="text-muted", style={"text-align": "center"})
     ]), charts
 
+# Server-side pages for the summary and IP detail tables (read from the in-process cache)
+@app.callback(
+    Output({'type': 'summary-table', 'org': MATCH}, 'data'),
+    Output({'type': 'summary-table', 'org': MATCH}, 'page_count'),
+    Input({'type': 'summary-table', 'org': MATCH}, 'page_current'),
+    Input({'type': 'summary-table', 'org': MATCH}, 'page_size'),
+    Input({'type': 'summary-table', 'org': MATCH}, 'sort_by'),
+    Input({'type': 'summary-table', 'org': MATCH}, 'filter_query'),
+    State({'type': 'summary-table', 'org': MATCH}, 'id'),
+    State('date-dropdown', 'value'),
+    State('category-dropdown', 'value')
+)
+def page_summary_table(page_current, page_size, sort_by, filter_query, table_id, selected_dates, selected_categories):
+    if not selected_dates:
+        return [], 1
+    if isinstance(selected_categories, str):
+        selected_categories = [selected_categories]
+    _, pivot_df = build_summary_pivot(table_id['org'], selected_dates, selected_categories)
+    page_df, page_count = apply_table_query(pivot_df, page_current, page_size or PAGE_SIZE, sort_by, filter_query)
+    return page_df.to_dict('records'), page_count
+
+@app.callback(
+    Output({'type': 'ip-table', 'org': MATCH}, 'data'),
+    Output({'type': 'ip-table', 'org': MATCH}, 'page_count'),
+    Input({'type': 'ip-table', 'org': MATCH}, 'page_current'),
+    Input({'type': 'ip-table', 'org': MATCH}, 'page_size'),
+    Input({'type': 'ip-table', 'org': MATCH}, 'sort_by'),
+    Input({'type': 'ip-table', 'org': MATCH}, 'filter_query'),
+    State({'type': 'ip-table', 'org': MATCH}, 'id'),
+    State('date-dropdown', 'value'),
+    State('category-dropdown', 'value')
+)
+def page_ip_table(page_current, page_size, sort_by, filter_query, table_id, selected_dates, selected_categories):
+    if not selected_dates:
+        return [], 1
+    if isinstance(selected_categories, str):
+        selected_categories = [selected_categories]
+    ip_df = load_ip_rows(table_id['org'], selected_dates)
+    if selected_categories:
+        ip_df = ip_df[ip_df['Category'].isin(selected_categories)]
+    page_df, page_count = apply_table_query(ip_df, page_current, page_size or PAGE_SIZE, sort_by, filter_query)
+    return page_df.to_dict('records'), page_count
+
+# === Production serving ===
+# WSGI entry point for serve_dashboards.py (gunicorn/waitress)
+server = app.server
+
+def warm_cache():
+    """Parse the newest day of every organisation so the first requests hit a warm cache."""
+    for org_name in list_org_folders():
+        files = sorted(glob.glob(os.path.join(base_dir, org_name, "*.csv")))
+        if files:
+            file_category_counts(files[-1])
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8050)
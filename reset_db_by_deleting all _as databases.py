@@ -4,6 +4,7 @@ from datetime import datetime
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from knowledgebase_storage import bump_database_marker
 # Load credentials from .env
 load_dotenv()
 
@@ -51,6 +52,7 @@ if dbs_to_delete:
                 client.drop_database(db)
                 deleted_at = datetime.now().isoformat()
                 writer.writerow([db, deleted_at])
+        bump_database_marker(client, reason=f"reset dropped {len(dbs_to_delete)} database(s)")
         print(f"=== DONE. Log saved to: {csv_log_path} ===")
     else:
         print("\nNo action taken. Deletion canceled.")
@@ -0,0 +1,125 @@
+import os
+import sys
+import importlib
+import multiprocessing
+from dotenv import load_dotenv
+
+# Production serving for the Dash dashboards (instead of the debug dev server in app.run).
+# Usage: python3 serve_dashboards.py portable|compare [--port 8050] [--workers N] [--threads N]
+#   gunicorn (Linux/macOS): N worker processes forked from one preloaded app, N threads each
+#   waitress (Windows, or when gunicorn is missing): one process, N x threads
+# Callback responses are gzip-compressed (flask-compress) and static assets get long cache headers.
+
+load_dotenv()
+
+DASHBOARDS = {
+    "portable": "portable_analytics_dashboard",
+    "compare": "compare_everything_simple_dashboard",
+}
+
+# Dash fingerprints its component bundles (?v=<version>), so they can be cached for a year
+STATIC_PREFIXES = ("/_dash-component-suites/", "/assets/")
+STATIC_MAX_AGE = 31536000
+
+
+def get_arg(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def configure_server(server):
+    try:
+        from flask_compress import Compress
+        server.config.setdefault("COMPRESS_MIMETYPES", [
+            "application/json", "text/html", "text/css", "application/javascript", "text/javascript"
+        ])
+        server.config.setdefault("COMPRESS_MIN_SIZE", 500)
+        Compress(server)
+        print("[Serve] gzip compression enabled")
+    except ImportError:
+        print("[Serve] flask-compress not installed. Responses are sent uncompressed.")
+
+    server.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE
+
+    @server.after_request
+    def cache_static_assets(response):
+        from flask import request
+        if request.path.startswith(STATIC_PREFIXES) and response.status_code == 200:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        return response
+
+    return server
+
+
+def load_dashboard(name):
+    module = importlib.import_module(DASHBOARDS[name])
+    configure_server(module.server)
+    # Preload: caches are filled once here, before gunicorn forks its workers
+    if hasattr(module, "warm_cache"):
+        print(f"[Serve] Warming {name} dashboard cache...")
+        module.warm_cache()
+    return module
+
+
+def serve_gunicorn(server, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class DashboardApplication(BaseApplication):
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    DashboardApplication(server, {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": 120,
+        "accesslog": "-",
+    }).run()
+
+
+def serve_waitress(server, host, port, threads):
+    from waitress import serve
+    serve(server, host=host, port=port, threads=threads)
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else ""
+    if name not in DASHBOARDS:
+        print(f"Usage: python3 serve_dashboards.py {'|'.join(DASHBOARDS)} [--port 8050] [--workers N] [--threads N]")
+        sys.exit(1)
+
+    host = os.getenv("dashboard_host", "0.0.0.0")
+    port = int(get_arg("--port", os.getenv("dashboard_port", 8050)))
+    workers = int(get_arg("--workers", os.getenv("dashboard_workers", multiprocessing.cpu_count())))
+    threads = int(get_arg("--threads", os.getenv("dashboard_threads", 4)))
+
+    module = load_dashboard(name)
+
+    try:
+        import gunicorn  # noqa: F401
+        use_gunicorn = os.name != "nt"
+    except ImportError:
+        use_gunicorn = False
+
+    if use_gunicorn:
+        print(f"[Serve] {name} dashboard on http://{host}:{port} (gunicorn, {workers} workers x {threads} threads)")
+        serve_gunicorn(module.server, host, port, workers, threads)
+    else:
+        print(f"[Serve] {name} dashboard on http://{host}:{port} (waitress, {workers * threads} threads)")
+        serve_waitress(module.server, host, port, workers * threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,8 @@ import gzip
 import warnings
 import json
 import subprocess
-import requests
 from io import StringIO
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from email import message_from_bytes
 from email.header import decode_header
@@ -29,28 +28,29 @@ from email.policy import default as default_policy
 from urllib.parse import quote_plus
 
 # === Third-party libraries ===
-import msal
-import aiohttp
+# Heavy libraries (pandas, pymongo, msal, aiohttp, bs4, py7zr, rarfile) are imported inside the task functions that use them
 import aiofiles
-import py7zr
-import rarfile
 import colorama
 import asyncio
-import pandas as pd
-from pymongo import MongoClient, InsertOne
-from pymongo.errors import BulkWriteError
-from pymongo.errors import OperationFailure
 from async_lru import alru_cache
 from colorama import Fore, Style
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 from dotenv import load_dotenv
+from log_sink import get_log_sink
+from pipeline_console import (
+    detail, progress, progress_done, progress_enabled, progress_total, report_error, set_console_mode, mode_from_flags
+)
+from pipeline_events import emit
+from pipeline_profiler import add_metric, profile_stage, profile_stages_from_flags, start_run, write_run_report
+from knowledgebase_storage import (
+    is_consolidated, get_consolidated_database_name, per_asn_database_name, asn_field_value,
+    bump_database_marker
+)
 # === Email parsing ===
 import email
 from email.header import decode_header
 
 # ========== CONSTANTS ==========
-load_dotenv(dotenv_path=".env", override=True)
 timestamp_now = datetime.now().strftime("%Y-%m-%d_%H%M")
 log_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -80,12 +80,11 @@ def save_last_received_timestamp(graph_last_received_path, latest_time):
         print(f"š Updated last received timestamp: {latest_time}")
     except Exception as e:
         print(f"ā ļø Error saving timestamp tracker: {e}")
-graph_last_received_path = os.path.join(tracker_dir, "graph_last_received.json")
-last_received_time = load_last_received_timestamp(graph_last_received_path)        
 
-for folder in [attachments_dir, metadata_dir, eml_export_dir, logging_dir, tracker_dir]:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+def ensure_base_folders():
+    for folder in [attachments_dir, metadata_dir, eml_export_dir, logging_dir, tracker_dir]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
 
 #New Implementation Will Clean Up After
 CONFIG_DIR = os.path.expanduser("~/.config/email_ingestion")
@@ -131,95 +130,6 @@ def save_graph_uids(uids):
 
         
 
-# === MongoDB Config ===
-mongo_username = os.getenv("mongo_username")
-mongo_password = os.getenv("mongo_password")
-mongo_auth_source = os.getenv("mongo_auth_source", "admin")
-mongo_host = os.getenv("mongo_host", "127.0.0.1")
-mongo_port = int(os.getenv("mongo_port", 27017))
-target_user = mongo_username
-target_db = mongo_auth_source
-
-print("\nš MongoDB Configuration:")
-print(f"  - Username       : {mongo_username}")
-print(f"  - Password       : {'*' * len(mongo_password) if mongo_password else 'None'}")
-print(f"  - Auth Source    : {mongo_auth_source}")
-print(f"  - Host           : {mongo_host}")
-print(f"  - Port           : {mongo_port}")
-
-#========= DB USER ROLES DIAGNOSTIC RUN ===========
-
-mongo_encoded_user = quote_plus(mongo_username)
-mongo_encoded_pass = quote_plus(mongo_password)
-uri = f"mongodb://{mongo_encoded_user}:{mongo_encoded_pass}@{mongo_host}:{mongo_port}/?authSource={mongo_auth_source}"
-client = MongoClient(uri)
-admin_db = client[mongo_auth_source]
-
-
-try:
-    user_data = admin_db.command("usersInfo", {"user": target_user, "db": target_db})
-except OperationFailure as e:
-    print(f"ā Could not fetch user info: {e}")
-    exit(1)
-
-if not user_data.get("users"):
-    print(f"ā User '{target_user}' not found in DB '{target_db}'.")
-    exit(1)
-
-user_info = user_data["users"][0]
-current_roles = [r["role"] for r in user_info["roles"]]
-
-print(f"\nš Current roles for {target_user}@{target_db}:")
-for role in current_roles:
-    print(f" - {role}")
-
-# === Define required baseline roles ===
-required_roles = ["readWriteAnyDatabase", "dbAdminAnyDatabase"]
-missing_roles = [role for role in required_roles if role not in current_roles]
-
-if missing_roles:
-    print("\nšØ This appears to be the first run for user role diagnostics.")
-    print("The following essential roles are missing for full administrative scripting:")
-    for role in missing_roles:
-        print(f" - {role}@admin")
-
-    proceed = input("\nDo you want to grant these roles to the user now? (yes/no): ").strip().lower()
-    if proceed not in ["yes", "y"]:
-        print("ā Operation cancelled by user.")
-    else:
-        try:
-            admin_db.command("grantRolesToUser", target_user, roles=[
-                {"role": role, "db": "admin"} for role in missing_roles
-            ])
-            print("\nā Roles successfully applied.")
-        except OperationFailure as e:
-            print(f"\nā Failed to update roles: {e}")
-            exit(1)
-
-        # Show updated roles
-        updated_info = admin_db.command("usersInfo", {"user": target_user, "db": target_db})["users"][0]
-        updated_roles = [r["role"] for r in updated_info["roles"]]
-
-        print(f"\nš Updated roles for {target_user}@{target_db}:")
-        for role in updated_roles:
-            print(f" - {role}")
-else:
-    print("\nā All required roles are already assigned. No changes needed.")
-
-
-# === Email Config ===
-mail_server = os.getenv("mail_server")
-email_address = os.getenv("email_address")
-password = os.getenv("email_password")
-imap_folder = os.getenv("imap_shadowserver_folder_or_email_processing_folder", "inbox").strip('"')
-# Retrieve from environment
-email_provider       = os.getenv("email_provider", "graph")
-graph_tenant_id      = os.getenv("graph_tenant_id", "unknown-tenant")
-graph_client_id      = os.getenv("graph_client_id", "unknown-client-id")
-graph_client_secret  = os.getenv("graph_client_secret", "")
-graph_user_email     = os.getenv("graph_user_email", "user@example.com")
-
-
 def mask_email(email):
     if "@" in email:
         local, domain = email.split("@", 1)
@@ -231,87 +141,233 @@ def mask_secret(secret):
     return "*" * len(secret) if secret else "None"
 
 
+# ========== RUNTIME CONFIGURATION ==========
+# Importing this module has no side effects: main() calls startup() for the selected tasks,
+# which loads .env and prints only the relevant configuration. MongoDB role diagnostics run
+# only for tasks that write to the knowledgebase, unless --skip-diagnostics is given.
 
-# Mask sensitive values
-masked_graph_email     = mask_email(graph_user_email)
-masked_client_secret   = mask_secret(graph_client_secret)
-masked_email_address   = mask_email(email_address)
-# Output
-print("\nš Microsoft Graph Configuration:")
-print(f"  - Provider                : {email_provider}")
-print(f"  - Tenant ID              : {graph_tenant_id}")
-print(f"  - Client ID              : {graph_client_id}")
-print(f"  - Mailbox Email          : {masked_graph_email}")
-
-print("\nš§ IMAP Configuration:")
-print(f"  - Mail Host               : {mail_server}")
-print(f"  - Email Address           : {masked_email_address}")
-print(f"  - Email Password          : {'*' * len(password) if password else 'None'}")
-print(f"  - IMAP Folder to Monitor  : {imap_folder}")
-
-
-# === Regex Patterns ===
-raw_fallback = os.getenv("geo_csv_fallback_regex", "")
-raw_primary = os.getenv("geo_csv_regex", "")
-
-print("\nš Regex Patterns(Safety: Fallback Runs in Code First Before Primary to Detect Unique Codes:")
-print(f"  - Raw Primary    : {raw_primary}")
-print(f"  - Raw Fallback   : {raw_fallback}")
-
-
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore", category=DeprecationWarning)
-    try:
-        GEO_CSV_PATTERN = re.compile(raw_primary.encode().decode("unicode_escape"))
-        print(f"  ā Compiled Primary Pattern: {GEO_CSV_PATTERN.pattern}")
-    except re.error as e:
-        GEO_CSV_PATTERN = None
-        print(f"  ā Failed to compile primary pattern: {e}")
-
-    try:
-        GEO_CSV_FALLBACK_PATTERN = re.compile(raw_fallback.encode().decode("unicode_escape"))
-        print(f"  ā Compiled Fallback Pattern: {GEO_CSV_FALLBACK_PATTERN.pattern}")
-    except re.error as e:
-        GEO_CSV_FALLBACK_PATTERN = None
-        print(f"  ā Failed to compile fallback pattern: {e}")
-
-
-# Display Performance Settings (safe defaults)
-shadowserver_buffer_size = int(os.getenv("buffer_size", "1024"))
-shadowserver_flush_row_count_threshold = int(os.getenv("flush_row_count", "100"))
-shadowserver_tracker_update_batch_size = int(os.getenv("tracker_batch_size", "1000"))
-shadowserver_service_sorting_batch_size = int(os.getenv("service_sorting_batch_size", "1000"))
-shadowserver_knowledgebase_ingestion_file_batch_size = int(
-    os.getenv("number_of_files_ingested_into_knowledgebase_per_batch", "2000")
-)
+# Base directories
+root_directory = "shadowserver_analysis_system/sorted_companies_by_country"
+asn_map_path = "shadowserver_analysis_system/detected_companies/asn_org_map.csv"
 
-# Print configuration for performance-related settings
-print("\nš [Shadowserver Performance Configuration]")
-print(f"  ā¢ Buffer size for in-memory operations:                   {shadowserver_buffer_size}")
-print(f"  ā¢ Row count threshold before flush to disk:               {shadowserver_flush_row_count_threshold}")
-print(f"  ā¢ Tracker update batch size per cycle:                    {shadowserver_tracker_update_batch_size}")
-print(f"  ā¢ Batch size for categorizing and sorting services:       {shadowserver_service_sorting_batch_size}")
-print(f"  ā¢ File ingestion batch size for knowledgebase insertion:  {shadowserver_knowledgebase_ingestion_file_batch_size}\n")
+_config_loaded = False
+
+def load_config():
+    global mongo_username, mongo_password, mongo_auth_source, mongo_host, mongo_port, target_user, target_db, \
+        mail_server, email_address, password, imap_folder, email_provider, \
+        graph_tenant_id, graph_client_id, graph_client_secret, graph_user_email, \
+        shadowserver_buffer_size, shadowserver_flush_row_count_threshold, shadowserver_tracker_update_batch_size, \
+        shadowserver_service_sorting_batch_size, shadowserver_knowledgebase_ingestion_file_batch_size, \
+        KNOWLEDGEBASE_VERIFY_INDEX_REGISTRY, KNOWLEDGEBASE_FORCE_GC, \
+        KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS, KNOWLEDGEBASE_ARCHIVE_TTL_DAYS, \
+        BUFFER_SIZE, FLUSH_ROW_COUNT, _config_loaded
+    if _config_loaded:
+        return
+    load_dotenv(dotenv_path=".env", override=True)
+
+    # === MongoDB Config ===
+    mongo_username = os.getenv("mongo_username")
+    mongo_password = os.getenv("mongo_password")
+    mongo_auth_source = os.getenv("mongo_auth_source", "admin")
+    mongo_host = os.getenv("mongo_host", "127.0.0.1")
+    mongo_port = int(os.getenv("mongo_port", 27017))
+    target_user = mongo_username
+    target_db = mongo_auth_source
+
+    # === Email Config ===
+    mail_server = os.getenv("mail_server")
+    email_address = os.getenv("email_address")
+    password = os.getenv("email_password")
+    imap_folder = os.getenv("imap_shadowserver_folder_or_email_processing_folder", "inbox").strip('"')
+    # Retrieve from environment
+    email_provider       = os.getenv("email_provider", "graph")
+    graph_tenant_id      = os.getenv("graph_tenant_id", "unknown-tenant")
+    graph_client_id      = os.getenv("graph_client_id", "unknown-client-id")
+    graph_client_secret  = os.getenv("graph_client_secret", "")
+    graph_user_email     = os.getenv("graph_user_email", "user@example.com")
+
+    # Display Performance Settings (safe defaults)
+    shadowserver_buffer_size = int(os.getenv("buffer_size", "1024"))
+    shadowserver_flush_row_count_threshold = int(os.getenv("flush_row_count", "100"))
+    shadowserver_tracker_update_batch_size = int(os.getenv("tracker_batch_size", "1000"))
+    shadowserver_service_sorting_batch_size = int(os.getenv("service_sorting_batch_size", "1000"))
+    shadowserver_knowledgebase_ingestion_file_batch_size = int(
+        os.getenv("number_of_files_ingested_into_knowledgebase_per_batch", "2000")
+    )
 
+    # Knowledgebase housekeeping (index registry and forced garbage collection are opt-in)
+    KNOWLEDGEBASE_VERIFY_INDEX_REGISTRY = os.getenv("verify_index_registry", "false").strip('"').lower() == "true"
+    KNOWLEDGEBASE_FORCE_GC = os.getenv("knowledgebase_force_gc", "false").strip('"').lower() == "true"
+    KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS = int(os.getenv("knowledgebase_archive_after_days", "0").strip('"') or 0)
+    KNOWLEDGEBASE_ARCHIVE_TTL_DAYS = int(os.getenv("knowledgebase_archive_ttl_days", "0").strip('"') or 0)
+
+    # ====== Future Plans  ======
+    BUFFER_SIZE = int(os.getenv("buffer_size", "1024"))
+    FLUSH_ROW_COUNT = int(os.getenv("flush_row_count", "100"))  # Tune based on memory budget
+    _config_loaded = True
+
+def print_mongo_configuration():
+    print("\nš MongoDB Configuration:")
+    print(f"  - Username       : {mongo_username}")
+    print(f"  - Password       : {'*' * len(mongo_password) if mongo_password else 'None'}")
+    print(f"  - Auth Source    : {mongo_auth_source}")
+    print(f"  - Host           : {mongo_host}")
+    print(f"  - Port           : {mongo_port}")
+
+def print_email_configuration():
+    # Mask sensitive values
+    masked_graph_email     = mask_email(graph_user_email)
+    masked_client_secret   = mask_secret(graph_client_secret)
+    masked_email_address   = mask_email(email_address)
+    # Output
+    print("\nš Microsoft Graph Configuration:")
+    print(f"  - Provider                : {email_provider}")
+    print(f"  - Tenant ID              : {graph_tenant_id}")
+    print(f"  - Client ID              : {graph_client_id}")
+    print(f"  - Client Secret          : {masked_client_secret}")
+    print(f"  - Mailbox Email          : {masked_graph_email}")
+
+    print("\nš§ IMAP Configuration:")
+    print(f"  - Mail Host               : {mail_server}")
+    print(f"  - Email Address           : {masked_email_address}")
+    print(f"  - Email Password          : {'*' * len(password) if password else 'None'}")
+    print(f"  - IMAP Folder to Monitor  : {imap_folder}")
+
+def print_regex_configuration():
+    # === Regex Patterns ===
+    raw_fallback = os.getenv("geo_csv_fallback_regex", "")
+    raw_primary = os.getenv("geo_csv_regex", "")
+
+    print("\nš Regex Patterns(Safety: Fallback Runs in Code First Before Primary to Detect Unique Codes:")
+    print(f"  - Raw Primary    : {raw_primary}")
+    print(f"  - Raw Fallback   : {raw_fallback}")
+
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=DeprecationWarning)
+        try:
+            GEO_CSV_PATTERN = re.compile(raw_primary.encode().decode("unicode_escape"))
+            print(f"  ā Compiled Primary Pattern: {GEO_CSV_PATTERN.pattern}")
+        except re.error as e:
+            GEO_CSV_PATTERN = None
+            print(f"  ā Failed to compile primary pattern: {e}")
 
+        try:
+            GEO_CSV_FALLBACK_PATTERN = re.compile(raw_fallback.encode().decode("unicode_escape"))
+            print(f"  ā Compiled Fallback Pattern: {GEO_CSV_FALLBACK_PATTERN.pattern}")
+        except re.error as e:
+            GEO_CSV_FALLBACK_PATTERN = None
+            print(f"  ā Failed to compile fallback pattern: {e}")
 
-# Base directories
-root_directory = "shadowserver_analysis_system/sorted_companies_by_country"
-asn_map_path = "shadowserver_analysis_system/detected_companies/asn_org_map.csv"
+def print_performance_configuration():
+    # Print configuration for performance-related settings
+    print("\nš [Shadowserver Performance Configuration]")
+    print(f"  ā¢ Buffer size for in-memory operations:                   {shadowserver_buffer_size}")
+    print(f"  ā¢ Row count threshold before flush to disk:               {shadowserver_flush_row_count_threshold}")
+    print(f"  ā¢ Tracker update batch size per cycle:                    {shadowserver_tracker_update_batch_size}")
+    print(f"  ā¢ Batch size for categorizing and sorting services:       {shadowserver_service_sorting_batch_size}")
+    print(f"  ā¢ File ingestion batch size for knowledgebase insertion:  {shadowserver_knowledgebase_ingestion_file_batch_size}\n")
 
+def run_role_diagnostics():
+    from pymongo import MongoClient
+    from pymongo.errors import OperationFailure
 
+    #========= DB USER ROLES DIAGNOSTIC RUN ===========
 
-# ====== Future Plans  ======
-BUFFER_SIZE = int(os.getenv("buffer_size", "1024"))
-FLUSH_ROW_COUNT = int(os.getenv("flush_row_count", "100"))  # Tune based on memory budget
+    mongo_encoded_user = quote_plus(mongo_username)
+    mongo_encoded_pass = quote_plus(mongo_password)
+    uri = f"mongodb://{mongo_encoded_user}:{mongo_encoded_pass}@{mongo_host}:{mongo_port}/?authSource={mongo_auth_source}"
+    client = MongoClient(uri)
+    admin_db = client[mongo_auth_source]
 
-# SSL Context for IMAP connections
-context = ssl.create_default_context()
-context.check_hostname = False
-context.verify_mode = ssl.CERT_NONE
 
-# Initialize colorama
-colorama.init(autoreset=True)
+    try:
+        user_data = admin_db.command("usersInfo", {"user": target_user, "db": target_db})
+    except OperationFailure as e:
+        print(f"ā Could not fetch user info: {e}")
+        exit(1)
+
+    if not user_data.get("users"):
+        print(f"ā User '{target_user}' not found in DB '{target_db}'.")
+        exit(1)
+
+    user_info = user_data["users"][0]
+    current_roles = [r["role"] for r in user_info["roles"]]
+
+    print(f"\nš Current roles for {target_user}@{target_db}:")
+    for role in current_roles:
+        print(f" - {role}")
+
+    # === Define required baseline roles ===
+    required_roles = ["readWriteAnyDatabase", "dbAdminAnyDatabase"]
+    missing_roles = [role for role in required_roles if role not in current_roles]
+
+    if missing_roles:
+        print("\nšØ This appears to be the first run for user role diagnostics.")
+        print("The following essential roles are missing for full administrative scripting:")
+        for role in missing_roles:
+            print(f" - {role}@admin")
+
+        proceed = input("\nDo you want to grant these roles to the user now? (yes/no): ").strip().lower()
+        if proceed not in ["yes", "y"]:
+            print("ā Operation cancelled by user.")
+        else:
+            try:
+                admin_db.command("grantRolesToUser", target_user, roles=[
+                    {"role": role, "db": "admin"} for role in missing_roles
+                ])
+                print("\nā Roles successfully applied.")
+            except OperationFailure as e:
+                print(f"\nā Failed to update roles: {e}")
+                exit(1)
+
+            # Show updated roles
+            updated_info = admin_db.command("usersInfo", {"user": target_user, "db": target_db})["users"][0]
+            updated_roles = [r["role"] for r in updated_info["roles"]]
+
+            print(f"\nš Updated roles for {target_user}@{target_db}:")
+            for role in updated_roles:
+                print(f" - {role}")
+    else:
+        print("\nā All required roles are already assigned. No changes needed.")
+    client.close()
+
+def imap_ssl_context():
+    # SSL Context for IMAP connections
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+# Tasks that need each part of the startup output
+STARTUP_SECTIONS = {
+    "mongo": {"ingest", "all"},
+    "email": {"email", "all"},
+    "regex": {"service", "all"},
+    "performance": {"process", "country", "service", "ingest", "all"},
+}
+
+def startup(tasks, skip_diagnostics=False):
+    selected = set(tasks)
+    # Initialize colorama
+    colorama.init(autoreset=True)
+    load_config()
+    ensure_base_folders()
+
+    if selected & STARTUP_SECTIONS["mongo"]:
+        print_mongo_configuration()
+    if selected & STARTUP_SECTIONS["email"]:
+        print_email_configuration()
+    if selected & STARTUP_SECTIONS["regex"]:
+        print_regex_configuration()
+    if selected & STARTUP_SECTIONS["performance"]:
+        print_performance_configuration()
+
+    if selected & STARTUP_SECTIONS["mongo"]:
+        if skip_diagnostics:
+            print("\n[Startup] --skip-diagnostics: MongoDB role check skipped.")
+        else:
+            run_role_diagnostics()
 
 # ========== COMMON HELPERS ==========
 
@@ -330,14 +386,11 @@ def save_tracker(path, data_set):
         json.dump(sorted(data_set), f, indent=2)
 
 def write_log_csv(folder, logname, headers, row):
-    ensure_dir(folder)
-    path = os.path.join(folder, logname)
-    is_new = not os.path.exists(path)
-    with open(path, "a", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if is_new:
-            writer.writerow(headers)
-        writer.writerow(row)
+    # Buffered through the shared sink: the file stays open and rows are flushed in batches
+    get_log_sink().write(folder, logname, headers, row)
+
+def write_log_rows(folder, logname, headers, rows):
+    get_log_sink().write_rows(folder, logname, headers, rows)
 
 # ========== HASHING FUNCTION ==========
 
@@ -350,38 +403,351 @@ async def hash_line(row):
     - Build consistent JSON string
     - Hash it
     """
-    cleaned_row = {}
-    for k, v in row.items():
-        if isinstance(v, str):
-            cleaned_value = v.strip().lower()
-            cleaned_row[k] = cleaned_value
-        else:
-            cleaned_row[k] = v
+    return hash_normalized_row(normalize_row_values(row))
+
+def normalize_row_values(row):
+    return {k: (v.strip().lower() if isinstance(v, str) else v) for k, v in row.items()}
 
+def hash_normalized_row(cleaned_row):
+    # Same canonical hash as hash_line() for a row whose strings are already stripped and lowercased
     ordered_row = dict(sorted(cleaned_row.items()))
     json_string = json.dumps(ordered_row, separators=(',', ':'), ensure_ascii=False)
     return hashlib.sha256(json_string.encode('utf-8')).hexdigest()
 
+# ========== COLUMNAR NORMALIZATION ==========
+
+# Shadowserver fields stored as integers instead of lowercase strings.
+# "default" applies to every report; other keys match categories by prefix.
+SHADOWSERVER_NUMERIC_FIELDS = {
+    "default": {
+        "asn", "src_asn", "dst_asn", "http_referer_asn",
+        "port", "src_port", "dst_port", "http_referer_port",
+        "naics", "sic", "src_naics", "src_sic", "dst_naics", "dst_sic",
+    },
+    "scan_ntp": {"stratum"},
+    "scan_ntpmonitor": {"packets", "size"},
+}
+
+numeric_fields_cache = {}
+
+def get_numeric_fields(category):
+    fields = numeric_fields_cache.get(category)
+    if fields is None:
+        fields = set(SHADOWSERVER_NUMERIC_FIELDS["default"])
+        for prefix, extra in SHADOWSERVER_NUMERIC_FIELDS.items():
+            if prefix != "default" and category.startswith(prefix):
+                fields |= extra
+        extra_env = os.getenv(f"numeric_fields_{category}", "").strip('"')
+        fields |= {f.strip() for f in extra_env.split(",") if f.strip()}
+        numeric_fields_cache[category] = fields
+    return fields
+
+def cast_numeric_value(value):
+    # isdigit() also accepts "²" or "①", which int() rejects: only plain ASCII digits are cast
+    if isinstance(value, str) and value.isascii():
+        digits = value[1:] if value.startswith("-") else value
+        if digits.isdecimal():
+            return int(value)
+    return value
+
+def parse_report_timestamp(value):
+    # fromisoformat() is a C fast path for Shadowserver's "%Y-%m-%d %H:%M:%S" timestamps
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        date_entry = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if date_entry.tzinfo is not None:
+        date_entry = date_entry.astimezone(timezone.utc).replace(tzinfo=None)
+    return date_entry, date_entry.strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_timestamp_column(values):
+    parsed = {value: parse_report_timestamp(value) for value in set(values)}
+    return [parsed[value] for value in values]
+
+def normalize_report_columns(headers, records, category):
+    """
+    Normalize a parsed CSV report column by column.
+
+    Every value is stripped and lowercased exactly once, timestamps are parsed
+    once per distinct value and known numeric fields are cast to int.
+    Yields (normalized_row, document, timestamp) per valid record, where
+    normalized_row keeps the string form used for line hashing.
+    """
+    width = len(headers)
+    records = [record for record in records if record and len(record) == width]
+    if not records:
+        return
+
+    columns = [[value.strip().lower() for value in column] for column in zip(*records)]
+    del records
+
+    numeric_fields = get_numeric_fields(category)
+    typed_columns = [
+        [cast_numeric_value(value) for value in column] if header in numeric_fields else column
+        for header, column in zip(headers, columns)
+    ]
+
+    if "timestamp" in headers:
+        # dict(zip(...)) keeps the last duplicate header, so parse that column
+        timestamp_index = width - 1 - headers[::-1].index("timestamp")
+        timestamps = parse_timestamp_column(columns[timestamp_index])
+    else:
+        timestamps = [None] * len(columns[0])
+
+    for values, typed_values, timestamp in zip(zip(*columns), zip(*typed_columns), timestamps):
+        yield dict(zip(headers, values)), dict(zip(headers, typed_values)), timestamp
+
+def normalize_report_object(json_object, category):
+    normalized = normalize_row_values(json_object)
+    numeric_fields = get_numeric_fields(category)
+    document = {k: (cast_numeric_value(v) if k in numeric_fields else v) for k, v in normalized.items()}
+    return normalized, document, parse_report_timestamp(normalized.get("timestamp"))
+
 # ========== DATABASE HELPERS ==========
 
 async def get_dynamic_database(org_folder, asn, client):
-    raw_name = f"{org_folder}-as{asn}".replace("-", "_").replace(".", "_")
-    db_name = raw_name[-63:] if len(raw_name) > 63 else raw_name
-    return client[db_name]
+    if is_consolidated():
+        return client[get_consolidated_database_name()]
+    return client[per_asn_database_name(org_folder, asn)]
+
+# ========== INDEX REGISTRY ==========
+
+index_registry_path = os.path.join(tracker_dir, "knowledgebase_index_registry.json")
+
 
-async def create_database_and_collections(category, db):
-    db_collection = db[category]
-    db_collection.create_index([("filename", 1), ("category", 1), ("line_hash", 1)], unique=True)
+class KnowledgebaseIndexRegistry:
+    """
+    Process-wide record of indexes already ensured on the knowledgebase.
 
-    discovered_fields_collection = db[f"discovered_fields_{category}"]
-    files_collection = db[f"files_{category}"]
-    files_collection.create_index([("filename", 1), ("category", 1), ("ingested", 1)])
+    Entries are stored as "<db>.<collection>|<index_name>[|<options>]" using MongoDB's
+    default index naming, so they can be checked against index_information().
+    Options (e.g. expireAfterSeconds) are part of the entry, so changing them in .env
+    re-applies the index instead of being skipped.
+    The registry is persisted in the tracker folder and reused across runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ensured = load_tracker(path)
+        self.handles = {}
+        self.dirty = False
+
+    @staticmethod
+    def index_name(keys):
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    @staticmethod
+    def index_options(kwargs):
+        return ",".join(f"{key}={kwargs[key]}" for key in sorted(kwargs) if key not in ("name", "background"))
+
+    def collection(self, db, name):
+        key = f"{db.name}.{name}"
+        handle = self.handles.get(key)
+        if handle is None:
+            handle = db[name]
+            self.handles[key] = handle
+        return handle
+
+    def ensure_index(self, collection, keys, **kwargs):
+        from pymongo.errors import OperationFailure
+
+        index_name = self.index_name(keys)
+        base_entry = f"{collection.full_name}|{index_name}"
+        options = self.index_options(kwargs)
+        entry = f"{base_entry}|{options}" if options else base_entry
+        if entry in self.ensured:
+            return False
+
+        try:
+            collection.create_index(keys, **kwargs)
+        except OperationFailure as e:
+            if e.code != 85:  # IndexOptionsConflict: same keys, different options
+                raise
+            modified = False
+            if "expireAfterSeconds" in kwargs:
+                try:
+                    collection.database.command(
+                        "collMod", collection.name,
+                        index={"keyPattern": dict(keys), "expireAfterSeconds": kwargs["expireAfterSeconds"]}
+                    )
+                    modified = True
+                except OperationFailure as mod_error:
+                    # MongoDB < 5.1 cannot turn a regular index into a TTL index with collMod
+                    print(f"[Index Registry] {collection.full_name}: collMod on {index_name} failed ({mod_error}). Rebuilding it.")
+            if not modified:
+                # collMod cannot remove a TTL (or add one before 5.1), so the index is rebuilt instead
+                collection.drop_index(index_name)
+                collection.create_index(keys, **kwargs)
+            print(f"[Index Registry] {collection.full_name}: updated {index_name} options ({options or 'none'})")
+
+        # Drop entries recorded for the same index with other options
+        self.ensured -= {e for e in self.ensured if e == base_entry or e.startswith(base_entry + "|")}
+        self.ensured.add(entry)
+        self.dirty = True
+        return True
+
+    def forget_database(self, db_name):
+        stale = {entry for entry in self.ensured if entry.split(".", 1)[0] == db_name}
+        if stale:
+            self.ensured -= stale
+            self.dirty = True
+        for key in [k for k in self.handles if k.split(".", 1)[0] == db_name]:
+            del self.handles[key]
+
+    def prune_missing_databases(self, client):
+        # One round trip: forget databases dropped since the last run (e.g. by the reset script)
+        existing = set(client.list_database_names())
+        for db_name in {entry.split(".", 1)[0] for entry in self.ensured} - existing:
+            print(f"[Index Registry] Database {db_name} no longer exists. Forgetting its indexes.")
+            self.forget_database(db_name)
+        return existing
+
+    def verify(self, client):
+        from pymongo.errors import OperationFailure
+        
+        # Full sweep: confirm every recorded index still exists on the server
+        by_collection = {}
+        for entry in self.ensured:
+            full_name, index_name = entry.split("|")[:2]
+            by_collection.setdefault(full_name, {}).setdefault(index_name, []).append(entry)
+
+        removed = 0
+        for full_name, entries in tqdm(by_collection.items(), desc="Verifying index registry", unit="col"):
+            db_name, coll_name = full_name.split(".", 1)
+            try:
+                present = set(client[db_name][coll_name].index_information())
+            except OperationFailure:
+                present = set()
+            for index_name in set(entries) - present:
+                for entry in entries[index_name]:
+                    self.ensured.discard(entry)
+                    removed += 1
+
+        if removed:
+            self.dirty = True
+        print(f"[Index Registry] Verified {len(by_collection)} collection(s), {removed} stale entr{'y' if removed == 1 else 'ies'} removed.")
+        return removed
+
+    def save(self):
+        if self.dirty:
+            save_tracker(self.path, self.ensured)
+            self.dirty = False
+
+
+_index_registry = None
+
+def get_index_registry():
+    global _index_registry
+    if _index_registry is None:
+        _index_registry = KnowledgebaseIndexRegistry(index_registry_path)
+    return _index_registry
+
+# ========== REPORT QUERY INDEXES & ARCHIVAL ==========
+
+REPORT_IP_FIELDS = ("ip", "src_ip", "http_referer_ip")
+ARCHIVE_COLLECTION_PREFIX = "archive_"
+archive_sweep_tracker_path = os.path.join(tracker_dir, "knowledgebase_archive_sweeps.json")
+
+def ensure_report_query_indexes(collection, field_names, registry=None):
+    # Back the reporting scripts' {"extracted_date": {"$gte": ..., "$lt": ...}} queries
+    registry = registry or get_index_registry()
+    registry.ensure_index(collection, [("extracted_date", 1)])
+    registry.ensure_index(collection, [("geo_folder", 1), ("extracted_date", 1)])
+    for ip_field in REPORT_IP_FIELDS:
+        if ip_field in field_names:
+            registry.ensure_index(collection, [(ip_field, 1), ("extracted_date", 1)])
+    if is_consolidated():
+        registry.ensure_index(collection, [("owner_asn", 1), ("org_folder", 1), ("extracted_date", 1)])
+        registry.ensure_index(collection, [("org_folder", 1), ("extracted_date", 1)])
+
+def load_archive_sweeps():
+    if os.path.exists(archive_sweep_tracker_path):
+        try:
+            with open(archive_sweep_tracker_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[Archive] Could not read sweep tracker: {e}")
+    return {}
+
+def save_archive_sweeps(sweeps):
+    with open(archive_sweep_tracker_path, "w") as f:
+        json.dump(sweeps, f, indent=2, sort_keys=True)
+
+def archive_expired_documents(db, category, archive_after_days, archive_ttl_days=0, sweeps=None, registry=None):
+    """
+    Move documents whose extracted_date is older than archive_after_days from
+    <category> into archive_<category>, keeping the live collection small so
+    "yesterday" report queries stay fast. Runs at most once per day per collection.
+
+    Archived rows still count for dedup: ingest also checks archive_<category> for a
+    file's line hashes (see create_database_and_collections for its index), so a file
+    ingested again is not re-inserted. Rows removed by the archive TTL are forgotten.
+    """
+    registry = registry or get_index_registry()
+    source = registry.collection(db, category)
+    today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    if sweeps is not None and sweeps.get(source.full_name) == today_str:
+        return 0
+
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=archive_after_days)
+    expired = {"extracted_date": {"$lt": cutoff}}
+    moved = 0
+
+    if source.find_one(expired, {"_id": 1}):
+        archive = registry.collection(db, f"{ARCHIVE_COLLECTION_PREFIX}{category}")
+        if archive_ttl_days > 0:
+            registry.ensure_index(archive, [("extracted_date", 1)], expireAfterSeconds=archive_ttl_days * 86400)
+        else:
+            registry.ensure_index(archive, [("extracted_date", 1)])
+
+        source.aggregate([
+            {"$match": expired},
+            {"$merge": {"into": archive.name, "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+        ])
+        moved = source.delete_many(expired).deleted_count
+        print(f"[Archive] {source.full_name}: moved {moved} document(s) older than {cutoff:%Y-%m-%d} to {archive.name}")
+
+    if sweeps is not None:
+        sweeps[source.full_name] = today_str
+    return moved
+
+async def create_database_and_collections(category, db, registry=None):
+    registry = registry or get_index_registry()
+
+    # Consolidated storage shares collections across orgs and ASNs, so row and file identity is
+    # scoped by (org_folder, owner_asn), the per-ASN database the row would otherwise live in
+    owner_keys = [("org_folder", 1), ("owner_asn", 1)] if is_consolidated() else []
+
+    db_collection = registry.collection(db, category)
+    registry.ensure_index(db_collection, owner_keys + [("filename", 1), ("category", 1), ("line_hash", 1)], unique=True)
+    if KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS > 0:
+        # Ingest looks up line hashes in the archive too, so it gets the same (non-unique) identity index
+        archive_collection = registry.collection(db, f"{ARCHIVE_COLLECTION_PREFIX}{category}")
+        registry.ensure_index(archive_collection, owner_keys + [("filename", 1), ("category", 1), ("line_hash", 1)])
+
+    discovered_fields_collection = registry.collection(db, f"discovered_fields_{category}")
+    registry.ensure_index(discovered_fields_collection, [("category", 1), ("field_name", 1)], unique=True)
+    files_collection = registry.collection(db, f"files_{category}")
+    registry.ensure_index(files_collection, owner_keys + [("filename", 1), ("category", 1), ("ingested", 1)])
 
     return db_collection, discovered_fields_collection, files_collection
 
 async def count_total_files(category_path):
     return sum(len(files) for _, _, files in os.walk(category_path))
 
+def count_folder_files(paths):
+    """Regular files directly inside each existing folder in paths (progress totals for the sorters)."""
+    total = 0
+    for path in paths:
+        try:
+            with os.scandir(path) as entries:
+                total += sum(1 for entry in entries if entry.is_file())
+        except OSError:
+            continue
+    return total
+
 def update_discovered_fields(collection, category, field_name):
     return collection.update_one(
         {"category": category, "field_name": field_name},
@@ -389,6 +755,48 @@ def update_discovered_fields(collection, category, field_name):
         upsert=True
     )
 
+# === Schema discovery: in-memory cache of field names already recorded per discovered_fields collection
+discovered_fields_cache = {}
+
+def load_discovered_fields(collection, category):
+    cached = discovered_fields_cache.get(collection.full_name)
+    if cached is None:
+        cached = set(
+            doc["field_name"]
+            for doc in collection.find({"category": category}, {"field_name": 1, "_id": 0})
+            if doc.get("field_name")
+        )
+        discovered_fields_cache[collection.full_name] = cached
+    return cached
+
+async def flush_discovered_fields(collection, category, field_names):
+    from pymongo import UpdateOne
+    
+    if not field_names:
+        return 0
+    known_fields = load_discovered_fields(collection, category)
+    new_fields = sorted(set(field_names) - known_fields)
+    field_names.clear()
+    if not new_fields:
+        return 0
+
+    operations = [
+        UpdateOne(
+            {"category": category, "field_name": field_name},
+            {"$setOnInsert": {"category": category, "field_name": field_name}},
+            upsert=True
+        )
+        for field_name in new_fields
+    ]
+    add_metric("mongo_ops", len(operations))
+    await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: collection.bulk_write(operations, ordered=False)
+    )
+    known_fields.update(new_fields)
+    print(f"[Schema] {category}: recorded {len(new_fields)} new field(s) in {collection.name}")
+    return len(new_fields)
+
 # ========== DECORATORS ==========
 
 def set_user_agent(func):
@@ -429,14 +837,16 @@ def extract_archive(file_path, ext, output_dir):
                 with open(out_path, 'wb') as f_out:
                     shutil.copyfileobj(f_in, f_out)
         elif ext == "7z":
+            import py7zr
             with py7zr.SevenZipFile(file_path, mode='r') as archive:
                 archive.extractall(path=output_dir)
         elif ext == "rar":
+            import rarfile
             with rarfile.RarFile(file_path) as rf:
                 rf.extractall(path=output_dir)
         return True
     except Exception as e:
-        print(f"[ERROR] Failed to extract {file_path}: {e}")
+        report_error(f"[ERROR] Failed to extract {file_path}: {e}", "migrate")
         return False
 
 
@@ -446,6 +856,9 @@ def extract_archive(file_path, ext, output_dir):
 
 
 async def main_email_ingestion():
+    import aiohttp
+    from bs4 import BeautifulSoup
+    
     print("Attempting to establish connection to the mail IMAP server...")
 
 
@@ -476,7 +889,7 @@ async def main_email_ingestion():
     imap = None
     try:
         imaplib._MAXLINE = 50_000_000
-        imap = imaplib.IMAP4_SSL(mail_server, ssl_context=context)
+        imap = imaplib.IMAP4_SSL(mail_server, ssl_context=imap_ssl_context())
         print("Connection established successfully.")
         imap.login(email_address, password)
         print("Logged in successfully.")
@@ -502,9 +915,10 @@ async def main_email_ingestion():
              for email_id in email_ids:
                 typ, uid_data = imap.uid('fetch', email_id, '(UID)')
                 uid = uid_data[0].decode().split('UID ')[-1].split(')')[0]
-                print(f"\n[Email] Checking UID: {uid}", end="\n", flush=True)
+                progress("email", total=len(email_ids))
+                detail(f"[Email] Checking UID: {uid}", "email")
                 if last_seen_uid and int(uid) <= int(last_seen_uid):
-                    print(f"\n[Skip] UID {uid} already processed. Skipping.", end="\n", flush=True)
+                    detail(f"[Skip] UID {uid} already processed. Skipping.", "email")
                     continue
 
                 status, email_data = imap.uid('fetch', email_id, "(RFC822)")
@@ -563,7 +977,7 @@ async def main_email_ingestion():
                             if not os.path.exists(attachment_path):
                                 with open(attachment_path, "wb") as f:
                                     f.write(payload)
-                                print(f"\rDownloaded {decoded_filename}", end="\r", flush=True)
+                                detail(f"Downloaded {decoded_filename}", "email")
 
 
                                 write_log_csv(
@@ -620,7 +1034,7 @@ async def main_email_ingestion():
                                         with open(file_path, "wb") as f:
                                             f.write(await resp.read())
 
-                                        print(f"ā Downloaded from Shadowserver: {filename}")
+                                        detail(f"ā Downloaded from Shadowserver: {filename}", "email")
 
                                         write_log_csv(
                                             os.path.join(logging_dir, "downloads_from_links"),
@@ -629,9 +1043,9 @@ async def main_email_ingestion():
                                             [log_time_str, uid, link, filename, file_path]
                                         )
                                     else:
-                                        print(f"ā ļø Failed to download {link} (HTTP {resp.status})")
+                                        report_error(f"ā ļø Failed to download {link} (HTTP {resp.status})", "email")
                             except Exception as e:
-                                print(f"ā Error downloading {link}: {str(e)}")
+                                report_error(f"ā Error downloading {link}: {str(e)}", "email")
                     else:
                         print("ā No Shadowserver links found.")
 
@@ -667,12 +1081,13 @@ async def main_email_ingestion():
 
         # ā Close IMAP connection at the very end
         imap.logout()
+        progress_done("email")
         print("\nLogged out from IMAP server.", end="\n", flush=True)
 
     except imaplib.IMAP4.error as e:
-        print(f"[IMAP Error] {e}")
+        report_error(f"[IMAP Error] {e}", "email")
     except Exception as e:
-        print(f"[General Error] {e}")
+        report_error(f"[General Error] {e}", "email")
 
 
 async def attachment_sorting_shadowserver_report_migration():
@@ -694,9 +1109,11 @@ async def attachment_sorting_shadowserver_report_migration():
             dst = os.path.join(ext_folder, file)
             if not os.path.exists(dst):
                 shutil.move(src, dst)
-                print(f"\r[Sort] Processing: {ext_folder}", end="\r", flush=True)
+                progress("migrate")
+                detail(f"[Sort] Processing: {ext_folder}", "migrate")
             else:
-                print(f"\r[Sort] already sorted: {file}", end="\r", flush=True)
+                progress("migrate")
+                detail(f"[Sort] already sorted: {file}", "migrate")
 
     # === UNZIP & ARCHIVE HANDLING ===
     unzipped_dir = "unzipped_backup"
@@ -719,11 +1136,13 @@ async def attachment_sorting_shadowserver_report_migration():
 
         for file in os.listdir(sorted_folder):
             if file in archive_trackers[ext]:
-                print(f"\r[Unzipper] already extracted: {file}", end="\r", flush=True)
+                progress("migrate")
+                detail(f"[Unzipper] already extracted: {file}", "migrate")
                 continue
 
             archive_path = os.path.join(sorted_folder, file)
-            print(f"\r[Unzipper] Extracting: {archive_path} ā {output_folder}", end="\r", flush=True)
+            progress("migrate")
+            detail(f"[Unzipper] Extracting: {archive_path} ā {output_folder}", "migrate")
 
             success = extract_archive(archive_path, ext, output_folder)
             if success:
@@ -743,7 +1162,7 @@ async def attachment_sorting_shadowserver_report_migration():
                     [log_time_str, file, output_folder]
                 )
             else:
-                print(f"\r[Unzipper][ERROR] Failed to extract: {file}", end="\r", flush=True)
+                report_error(f"[Unzipper][ERROR] Failed to extract: {file}", "migrate")
 
     for ext, path in archive_tracker_paths.items():
         save_tracker(path, archive_trackers[ext])
@@ -772,9 +1191,11 @@ async def attachment_sorting_shadowserver_report_migration():
                     dest_path = os.path.join(shadowserver_dest, file)
                     if not os.path.exists(dest_path):
                         shutil.move(src_path, dest_path)
-                        print(f"\r[Shadowserver] Moved: {file} ā {shadowserver_dest}", end="\r", flush=True)
+                        progress("migrate")
+                        detail(f"[Shadowserver] Moved: {file} ā {shadowserver_dest}", "migrate")
                     else:
-                        print(f"\r[Shadowserver] Skipped (already exists): {file}", end="\r", flush=True)
+                        progress("migrate")
+                        detail(f"[Shadowserver] Skipped (already exists): {file}", "migrate")
 
 
     # ==== DISSEMINATED ADVISORY CSV RELOCATION ====
@@ -793,9 +1214,11 @@ async def attachment_sorting_shadowserver_report_migration():
                 dest_path = os.path.join(advisories_dest, file)
                 if not os.path.exists(dest_path):
                     shutil.move(src_path, dest_path)
-                    print(f"\r[Advisories] Moved: {file} ā {advisories_dest}", end="\r", flush=True)
+                    progress("migrate")
+                    detail(f"[Advisories] Moved: {file} ā {advisories_dest}", "migrate")
                 else:
-                    print(f"\r[Advisories] Skipped (already exists): {file}", end="\r", flush=True)
+                    progress("migrate")
+                    detail(f"[Advisories] Skipped (already exists): {file}", "migrate")
 
     # ==== DISSEMINATED ADVISORY PDF RELOCATION ====
     advisory_pdf_dest = os.path.join(advisories_base, "attached_pdf_reports")
@@ -811,12 +1234,19 @@ async def attachment_sorting_shadowserver_report_migration():
                 dest_path = os.path.join(advisory_pdf_dest, file)
                 if not os.path.exists(dest_path):
                     shutil.move(src_path, dest_path)
-                    print(f"\r[Advisories] Moved: {file} ā {advisory_pdf_dest}", end="\r", flush=True)
+                    progress("migrate")
+                    detail(f"[Advisories] Moved: {file} ā {advisory_pdf_dest}", "migrate")
                 else:
-                    print(f"\r[Advisories] Skipped (already exists): {file}", end="\r", flush=True)
+                    progress("migrate")
+                    detail(f"[Advisories] Skipped (already exists): {file}", "migrate")
+
+    progress_done("migrate")
 
 
 async def ingest_microsoft_graph():
+    import msal
+    import requests
+    
     print("š Authenticating with Microsoft Graph API...")
     authority = f"https://login.microsoftonline.com/{graph_tenant_id}"
     scope = ["https://graph.microsoft.com/.default"]
@@ -863,7 +1293,7 @@ async def ingest_microsoft_graph():
 
     response = requests.get(graph_endpoint, headers=headers)
     if response.status_code != 200:
-        print(f"ā Error fetching emails: {response.status_code} - {response.text}")
+        report_error(f"ā Error fetching emails: {response.status_code} - {response.text}", "email")
         return
 
     emails = response.json().get("value", [])
@@ -881,13 +1311,14 @@ async def ingest_microsoft_graph():
         sender = email_entry.get("from", {}).get("emailAddress", {}).get("address")
         received_time = email_entry.get("receivedDateTime")
 
-        print(f"\nš§ Email: '{subject}' from {sender} at {received_time}")
+        progress("email", total=len(emails))
+        detail(f"š§ Email: '{subject}' from {sender} at {received_time}", "email")
 
         mime_url = f"https://graph.microsoft.com/v1.0/users/{graph_user_email}/messages/{message_id}/$value"
         raw_response = requests.get(mime_url, headers=headers)
 
         if raw_response.status_code != 200:
-            print(f"ā ļø Failed to get MIME content for message {message_id}: {raw_response.status_code}")
+            report_error(f"ā ļø Failed to get MIME content for message {message_id}: {raw_response.status_code}", "email")
             continue
 
         raw_email = raw_response.content
@@ -910,7 +1341,7 @@ async def ingest_microsoft_graph():
                     attachment_path = os.path.join(attachments_dir, filename)
                     with open(attachment_path, "wb") as f:
                         f.write(part.get_payload(decode=True))
-                    print(f"š Attachment found and saved: {filename}")
+                    detail(f"š Attachment found and saved: {filename}", "email")
 
         if not attachment_found:
             print("š­ No attachments found. Scanning body for Shadowserver links...")
@@ -926,10 +1357,10 @@ async def ingest_microsoft_graph():
             if shadow_links:
                 print(f"š Found {len(shadow_links)} Shadowserver link(s):")
                 for link in shadow_links:
-                    print(f"   ā¢ {link}")
+                    detail(f"   ā¢ {link}", "email")
 
                 # ā Log discovered links
-                write_log_csv(
+                write_log_rows(
                     os.path.join(logging_dir, "shadow_links"),
                     f"shadow_links_log_{log_time_str[:10]}.csv",
                     ["timestamp", "uid", "url"],
@@ -951,7 +1382,7 @@ async def ingest_microsoft_graph():
                             with open(file_path, "wb") as f:
                                 f.write(r.content)
 
-                            print(f"ā Downloaded from Shadowserver: {filename}")
+                            detail(f"ā Downloaded from Shadowserver: {filename}", "email")
 
                             write_log_csv(
                                 os.path.join(logging_dir, "downloads_from_links"),
@@ -960,9 +1391,9 @@ async def ingest_microsoft_graph():
                                 [log_time_str, message_id, link, filename, file_path]
                             )
                         else:
-                            print(f"ā ļø Failed to download {link} (HTTP {r.status_code})")
+                            report_error(f"ā ļø Failed to download {link} (HTTP {r.status_code})", "email")
                     except Exception as e:
-                        print(f"ā Error downloading {link}: {e}")
+                        report_error(f"ā Error downloading {link}: {e}", "email")
             else:
                 print("ā No Shadowserver links found in body.")
 
@@ -976,15 +1407,16 @@ async def ingest_microsoft_graph():
         )
 
         if attachment_found:
-            print(f"ā Attachments processed: {', '.join(attachment_names)}")
+            detail(f"ā Attachments processed: {', '.join(attachment_names)}", "email")
         else:
-            print("ā¹ļø No attachments. Shadowserver link scan completed.")
+            detail("ā¹ļø No attachments. Shadowserver link scan completed.", "email")
 
         new_uids.add(message_id)
         seen_uids.add(message_id)
         if received_time and (not latest_time or received_time > latest_time):
             latest_time = received_time
 
+    progress_done("email")
     if new_uids:
         with open(graph_tracker_path, "w") as f:
             json.dump(sorted(list(seen_uids)), f)
@@ -1005,6 +1437,8 @@ async def ingest_microsoft_graph():
 
 
 async def main_refresh_shadowserver_whois():
+    import pandas as pd
+    
     print("\n[ASN Refresh] Verifying all ASN entries in ASN map for updates...")
 
     asn_map_csv = os.path.join("shadowserver_analysis_system", "detected_companies", "asn_org_map.csv")
@@ -1022,12 +1456,14 @@ async def main_refresh_shadowserver_whois():
             current_folder = row["org_folder"]
             current_country = str(row["country_code"]).strip() if pd.notna(row["country_code"]) else ""
 
-            print(f"[ASN Refresh] Checking ASN {asn}...")
+            progress("refresh", total=len(asn_df))
+            detail(f"[ASN Refresh] Checking ASN {asn}...", "refresh")
 
             try:
                 cmd = ['whois', '-h', 'whois.cymru.com', f" -v as{asn}"]
+                add_metric("whois_calls")
                 result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                print(f"[WHOIS] Raw for ASN {asn}:\n{result.stdout.strip()}\n")
+                detail(f"[WHOIS] Raw for ASN {asn}:\n{result.stdout.strip()}\n", "refresh")
                 lines = result.stdout.strip().split('\n')
 
                 if len(lines) >= 2:
@@ -1092,7 +1528,9 @@ async def main_refresh_shadowserver_whois():
                     print(f"[ASN Refresh][WARN] No WHOIS response for ASN {asn}")
 
             except Exception as e:
-                print(f"[ASN Refresh][ERROR] Failed WHOIS lookup for ASN {asn}: {e}")
+                report_error(f"[ASN Refresh][ERROR] Failed WHOIS lookup for ASN {asn}: {e}", "refresh")
+
+        progress_done("refresh", total=len(asn_df))
 
         # Save after processing
         if updated_rows > 0:
@@ -1135,6 +1573,8 @@ async def main_refresh_shadowserver_whois():
 
 
 async def main_shadowserver_processing():
+    import pandas as pd
+    
     # ==== SHADOWSERVER ASN-BASED ORGANISATION FILTERING ====
 
     # ā Define base directories first
@@ -1173,18 +1613,19 @@ async def main_shadowserver_processing():
         asn_str = str(asn)
         if asn_str in known_asns:
             folder = known_asns[asn_str]
-            print(f"[Cached] ASN {asn} ā Folder: {folder}")
+            detail(f"[Cached] ASN {asn} ā Folder: {folder}", "process")
             return folder
 
         try:
             cmd = ['whois', '-h', 'whois.cymru.com', f" -v as{asn}"]
+            add_metric("whois_calls")
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-            print(f"\n[WHOIS] Raw response for ASN {asn}:\n{result.stdout.strip()}\n")
+            detail(f"[WHOIS] Raw response for ASN {asn}:\n{result.stdout.strip()}\n", "process")
             lines = result.stdout.strip().split('\n')
 
             if len(lines) >= 2:
                 data_line = lines[1]
-                print(f"[WHOIS] Parsed line for ASN {asn}: {data_line}")
+                detail(f"[WHOIS] Parsed line for ASN {asn}: {data_line}", "process")
                 parts = [part.strip() for part in data_line.split('|')]
 
                 if len(parts) == 5:
@@ -1200,14 +1641,14 @@ async def main_shadowserver_processing():
                         as_name = "-Reserved AS-, ZZ"
                         folder_name = f"reserved_as_{asn_str}"
                         new_country_code = "reserved"
-                        print(f"[WHOIS] ASN {asn} is reserved. Setting special fields.")
+                        detail(f"[WHOIS] ASN {asn} is reserved. Setting special fields.", "process")
 
                     # NO_NAME ASN handling
                     elif as_name.strip().upper() == "NO_NAME":
                         as_name = "no_name"
                         folder_name = "no_name"
                         new_country_code = "no_name"
-                        print(f"[WHOIS] ASN {asn} is NO_NAME. Setting special fields.")
+                        detail(f"[WHOIS] ASN {asn} is NO_NAME. Setting special fields.", "process")
 
                     # Invalid name/folder handling
                     elif is_name_invalid or is_folder_invalid:
@@ -1225,7 +1666,7 @@ async def main_shadowserver_processing():
                         "country_code": new_country_code
                     }
 
-                    print(f"[INLINE CHECK] ASN {asn} ā org_name='{as_name}', org_folder='{folder_name}', country_code='{new_country_code}'")
+                    detail(f"[INLINE CHECK] ASN {asn} ā org_name='{as_name}', org_folder='{folder_name}', country_code='{new_country_code}'", "process")
 
                     time.sleep(1)
                     return folder_name
@@ -1236,7 +1677,7 @@ async def main_shadowserver_processing():
                 print(f"[ASN WHOIS][WARN] No valid WHOIS response for ASN {asn}")
 
         except Exception as e:
-            print(f"[ASN WHOIS][ERROR] ASN {asn} resolution failed: {e}")
+            report_error(f"[ASN WHOIS][ERROR] ASN {asn} resolution failed: {e}", "process")
 
         return None
 
@@ -1246,32 +1687,36 @@ async def main_shadowserver_processing():
         new_asns = {}
         org_map = {}
 
-        for file in os.listdir(shadowserver_dir):
-            if not file.endswith(".csv"):
-                continue
+        csv_files = [file for file in os.listdir(shadowserver_dir) if file.endswith(".csv")]
+        progress_total("process", len(csv_files))
+
+        for file in csv_files:
             if file in asn_filtered_files:
-                print(f"\r[Tracker] Skipping already processed file: {file}", end="\r", flush=True)
+                detail(f"[Tracker] Skipping already processed file: {file}", "process")
+                progress("process", skipped=True)
                 continue
 
             file_path = os.path.join(shadowserver_dir, file)
+            progress("process", nbytes=os.path.getsize(file_path))
             try:
                 df = pd.read_csv(file_path)
             except Exception as e:
-                print(f"[SKIP] Could not read {file}: {e}")
+                report_error(f"[SKIP] Could not read {file}: {e}", "process")
                 continue
+            add_metric("rows", len(df))
 
             asn_field = next((col for col in df.columns if col in ["asn", "src_asn", "http_referer_asn"]), None)
 
             if not asn_field:
                 # No ASN field found. Handle as "other_intelligence_gh"
-                print(f"[Info] No ASN field found in {file}. Assigning to 'other_intelligence_gh'")
+                detail(f"[Info] No ASN field found in {file}. Assigning to 'other_intelligence_gh'", "process")
                 folder_name = "other_intelligence_gh"
                 target_dir = os.path.join(reported_base, folder_name)
                 ensure_dir(target_dir)
 
                 save_path = os.path.join(target_dir, file)
                 df.to_csv(save_path, index=False)
-                print(f"[Save] {file} saved to {folder_name}/")
+                detail(f"[Save] {file} saved to {folder_name}/", "process")
 
                 asn_filtered_files.add(file)
                 save_tracker(asn_filter_tracker_path, asn_filtered_files)
@@ -1290,7 +1735,7 @@ async def main_shadowserver_processing():
                 }])
                 audit_df.to_csv(audit_save_path, index=False)
 
-                print(f"[Audit Save] Audit file generated for non-ASN file: {audit_save_path}")
+                detail(f"[Audit Save] Audit file generated for non-ASN file: {audit_save_path}", "process")
                 continue
 
             # Normalize ASN values
@@ -1344,12 +1789,12 @@ async def main_shadowserver_processing():
                             retry_hash = hashlib.md5(retry_content.encode("utf-8")).hexdigest()
 
                         if retry_hash != original_hash:
-                            print(f"\nšØ [FATAL] Validation still failed after retry for {save_name}")
+                            report_error(f"šØ [FATAL] Validation still failed after retry for {save_name}", "process")
                             sys.exit(1)
                         else:
                             print(f"\n[Validation ā] Retry succeeded for {save_name}")
                     else:
-                        print(f"\r[Shadowserver] {file} ā ASN {asn} ā {folder_name} ā Hash verified: {save_name}", end="\r", flush=True)
+                        detail(f"[Shadowserver] {file} ā ASN {asn} ā {folder_name} ā Hash verified: {save_name}", "process")
 
                     expected_row_count = len(filtered)
                     line_count_with_header = saved_content.count('\n')
@@ -1385,7 +1830,7 @@ async def main_shadowserver_processing():
                 "asn", "expected_rows", "saved_rows", "saved_lines_with_header", "save_file", "org_folder", "status"
             ])
 
-            print(f"\n[Audit Save] Audit file generated: {audit_save_path}")
+            detail(f"[Audit Save] Audit file generated: {audit_save_path}", "process")
 
             # === Optional: Pretty Print Audit Table
             if not audit_df.empty:
@@ -1453,11 +1898,14 @@ async def main_shadowserver_processing():
 
 
     await process_shadowserver_files() 
+    progress_done("process")
 
 
 
 
 async def sort_shadowserver_by_country(use_tracker=False, country_tracker_mode="manual"):
+    import pandas as pd
+    
     print("\n[Country Sorter] Organising reported companies by ASN country code...")
 
     # === Tracker Mode Logic ===
@@ -1523,6 +1971,7 @@ async def sort_shadowserver_by_country(use_tracker=False, country_tracker_mode="
             print(f"[WHOIS] Looking up ASN {asn} ({org_name})...")
             try:
                 cmd = ['whois', '-h', 'whois.cymru.com', f" -v as{asn}"]
+                add_metric("whois_calls")
                 result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
                 lines = result.stdout.strip().split('\n')
                 if len(lines) >= 2:
@@ -1562,14 +2011,16 @@ async def sort_shadowserver_by_country(use_tracker=False, country_tracker_mode="
                 ])
                 return False
         except Exception as e:
-            print(f"ā [Error Moving] {src_item}: {e}")
+            report_error(f"ā [Error Moving] {src_item}: {e}", "country")
             return False
 
-    with open(country_log_path, "w", encoding="utf-8", newline='') as log_f:
-        writer = csv.writer(log_f)
-        writer.writerow(["timestamp", "asn", "org_name", "org_folder", "country_code", "destination_path", "status"])
+    with get_log_sink().writer(log_folder, os.path.basename(country_log_path), [
+        "timestamp", "asn", "org_name", "org_folder", "country_code", "destination_path", "status"
+    ], truncate=True) as writer:
 
         print("[Step 3] Starting per-organization processing...\n")
+        if progress_enabled():
+            progress_total("country", count_folder_files(os.path.join(reported_base, folder) for folder in country_df["org_folder"]))
 
         for _, row in country_df.iterrows():
             asn = row["asn"]
@@ -1582,7 +2033,7 @@ async def sort_shadowserver_by_country(use_tracker=False, country_tracker_mode="
                 print(f"[Skip] {org_folder}: Folder does not exist.\n")
                 continue
 
-            print(f"[Country Sorter {country_code}] Now scanning: {org_folder}")
+            detail(f"[Country Sorter {country_code}] Now scanning: {org_folder}", "country")
             file_counter = 0
             org_files = [item for item in os.listdir(org_path) if os.path.isfile(os.path.join(org_path, item))]
 
@@ -1592,22 +2043,26 @@ async def sort_shadowserver_by_country(use_tracker=False, country_tracker_mode="
 
             for file_name in org_files:
                 if use_tracker and file_name in country_tracker.get(org_folder, []):
+                    progress("country", skipped=True)
                     continue
 
                 src_item = os.path.join(org_path, file_name)
                 dest_item = os.path.join(sorted_country_base, country_code, org_folder, file_name)
                 ensure_dir(os.path.dirname(dest_item))
 
+                progress("country")
                 moved = await move_one_file(src_item, dest_item, asn, org_name, org_folder, country_code, writer)
                 if moved:
                     file_counter += 1
-                    print(f"[Country Sorter: {country_code}/{org_folder}] Files_processed: {file_counter} ā {file_name}")
+                    detail(f"[Country Sorter: {country_code}/{org_folder}] Files_processed: {file_counter} ā {file_name}", "country")
 
             if file_counter == 0:
                 print(f"[Country Sorter: {org_folder}] Update ā No new files moved.")
             else:
                 print(f"[Country Sorter: {org_folder}] Update ā  {file_counter} file(s) moved.\n")
 
+    progress_done("country")
+
     # === Save tracker if enabled
     if use_tracker:
         with open(country_tracker_path, "w") as tf:
@@ -1620,6 +2075,8 @@ async def main_sort_country_code_only(use_tracker=False, country_tracker_mode="m
 
 
 async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="manual"):
+    import pandas as pd
+    
     print("\n[Service Sorter] Sorting shadowserver reports by service name using country map...")
 
     BATCH_SIZE = int(os.getenv("service_sorting_batch_size", "1000"))
@@ -1703,21 +2160,21 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
             try:
                 fallback_match = re.match(fallback_regex, filename)
                 if fallback_match:
-                    print(f"[Service Sorter] Fallback pattern matched: {filename}")
+                    detail(f"[Service Sorter] Fallback pattern matched: {filename}", "service")
                     reporting_code_match = re.search(r"-\d{3,6}", filename)
                     if reporting_code_match:
                         reporting_code = reporting_code_match.group(0)
-                        print(f"[Service Sorter] Reporting code detected: {reporting_code}")
+                        detail(f"[Service Sorter] Reporting code detected: {reporting_code}", "service")
                         cleaned_filename = filename.replace(reporting_code, "")
-                        print(f"[Service Sorter] Cleaned filename after removing reporting code: {cleaned_filename}")
+                        detail(f"[Service Sorter] Cleaned filename after removing reporting code: {cleaned_filename}", "service")
                     else:
-                        print(f"[Service Sorter] No reporting code found, using fallback-matched filename as-is.")
+                        detail(f"[Service Sorter] No reporting code found, using fallback-matched filename as-is.", "service")
                 else:
-                    print(f"[Service Sorter] Fallback regex did not match ā skipping reporting code cleanup: {filename}")
+                    detail(f"[Service Sorter] Fallback regex did not match ā skipping reporting code cleanup: {filename}", "service")
             except re.error as e:
                 print(f"[Service Sorter] Invalid fallback regex: {e}")
         else:
-            print("[Service Sorter] No fallback regex defined.")
+            detail("[Service Sorter] No fallback regex defined.", "service")
 
         # Step 2: Attempt standard GEO regex on cleaned filename
         geo_csv_regex = os.getenv("geo_csv_regex", "").strip('"')
@@ -1725,7 +2182,7 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
             try:
                 geo_match = re.match(geo_csv_regex, cleaned_filename)
                 if geo_match:
-                    print(f"[Service Sorter] Matched standard GEO format: {cleaned_filename}")
+                    detail(f"[Service Sorter] Matched standard GEO format: {cleaned_filename}", "service")
                     return {
                         "pattern_type": "geo",
                         "pattern_id": 0,
@@ -1734,11 +2191,11 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
                         "cleaned_filename": cleaned_filename
                     }
                 else:
-                    print(f"[Service Sorter] GEO regex did not match: {cleaned_filename}")
+                    detail(f"[Service Sorter] GEO regex did not match: {cleaned_filename}", "service")
             except re.error as e:
                 print(f"[Service Sorter] Invalid geo_csv_regex: {e}")
         else:
-            print("[Service Sorter] No standard geo regex defined.")
+            detail("[Service Sorter] No standard geo regex defined.", "service")
 
         # Step 3: Try anomaly patterns
         i = 1
@@ -1754,10 +2211,10 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
 
             if enabled and pattern:
                 try:
-                    print(f"[Service Sorter] Trying anomaly pattern {i}: {pattern}")
+                    detail(f"[Service Sorter] Trying anomaly pattern {i}: {pattern}", "service")
                     anomaly_match = re.match(pattern, cleaned_filename)
                     if anomaly_match:
-                        print(f"[Service Sorter] Matched anomaly pattern {i}: {cleaned_filename}")
+                        detail(f"[Service Sorter] Matched anomaly pattern {i}: {cleaned_filename}", "service")
                         return {
                             "pattern_type": f"anomaly_{i}",
                             "pattern_id": i,
@@ -1769,7 +2226,7 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
                     print(f"[Service Sorter] Invalid regex in {pattern_key}: {e}")
             i += 1
 
-        print(f"[Service Sorter] No known pattern matched: {original_filename}")
+        detail(f"[Service Sorter] No known pattern matched: {original_filename}", "service")
         return {
             "pattern_type": None,
             "pattern_id": -1,
@@ -1814,12 +2271,17 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
                 else:
                     return False
             except Exception as e:
-                print(f"šØ [Error Move[{task_id}]] {file}: {e}")
+                report_error(f"šØ [Error Move[{task_id}]] {file}: {e}", "service")
                 return False
 
-        with open(movement_log_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["timestamp", "country_code", "org_folder", "service_name", "original_filename", "destination_path"])
+        with get_log_sink().writer(log_folder, os.path.basename(movement_log_path), [
+            "timestamp", "country_code", "org_folder", "service_name", "original_filename", "destination_path"
+        ], truncate=True) as writer:
+            if progress_enabled():
+                progress_total("service", count_folder_files(
+                    os.path.join(sorted_base, str(country).strip(), str(org).strip())
+                    for country, org in zip(df["country_code"], df["org_folder"])
+                ))
 
             for _, row in df.iterrows():
                 country_code = str(row.get("country_code", "")).strip()
@@ -1835,17 +2297,19 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
                     print(f"[Service Sorter] Skipping missing folder: {org_path}")
                     continue
 
-                print(f"\n[Service Sorter ({country_code})] Now scanning: {org_folder}")
+                detail(f"[Service Sorter ({country_code})] Now scanning: {org_folder}", "service")
                 file_counter = 0
 
                 for file in os.listdir(org_path):
-                    if use_tracker and file in service_tracker.get(org_folder, []):
-                        continue
-
                     file_path = os.path.join(org_path, file)
                     if not os.path.isfile(file_path):
                         continue
 
+                    if use_tracker and file in service_tracker.get(org_folder, []):
+                        progress("service", skipped=True)
+                        continue
+
+                    progress("service")
                     result = await match_service_name(file)
                     if result["service_name"]:
                         service_name = result["service_name"]
@@ -1869,7 +2333,7 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
 
                         if task_success:
                             file_counter += 1
-                            print(f"[Service Sorter: {country_code}/{org_folder}] Files_processed {file_counter}: {service_name} ā {file}")
+                            detail(f"[Service Sorter: {country_code}/{org_folder}] Files_processed {file_counter}: {service_name} ā {file}", "service")
                             service_totals[service_name] = service_totals.get(service_name, 0) + 1
                             folder_totals[org_folder] = folder_totals.get(org_folder, 0) + 1
 
@@ -1877,6 +2341,7 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
             with open(service_tracker_path, "w") as tf:
                 json.dump(service_tracker, tf, indent=2)
 
+        progress_done("service")
         print(f"\n[Service Sorter] ā Completed sorting.\n")
 
         print("\n[Service Sorter] Per-organization folder summary:")
@@ -1888,7 +2353,7 @@ async def sort_shadowserver_by_service(use_tracker=False, service_tracker_mode="
             print(f"  - {service}: {count} file(s)")
 
     except Exception as e:
-        print(f"[Service Sorter][ERROR] Failed to sort: {e}")
+        report_error(f"[Service Sorter][ERROR] Failed to sort: {e}", "service")
         
 
 async def main_sort_service_only(use_tracker=False, service_tracker_mode="manual"):
@@ -1896,7 +2361,10 @@ async def main_sort_service_only(use_tracker=False, service_tracker_mode="manual
 
                         
 
-async def shadowserver_knowledgebase_ingestion_only(use_tracker=False, tracker_mode="manual"):
+async def shadowserver_knowledgebase_ingestion_only(use_tracker=False, tracker_mode="manual", verify_indexes=False):
+    import pandas as pd
+    from pymongo import MongoClient
+    
     mongo_client = MongoClient(
         mongo_host, mongo_port,
         username=mongo_username,
@@ -1907,9 +2375,26 @@ async def shadowserver_knowledgebase_ingestion_only(use_tracker=False, tracker_m
     total_file_counter = 0
     completed_categories = []
 
+    # === Index registry: skip create_index round trips already done in earlier runs
+    registry = get_index_registry()
+    existing_databases = registry.prune_missing_databases(mongo_client)
+    created_databases = set()
+    if verify_indexes or KNOWLEDGEBASE_VERIFY_INDEX_REGISTRY:
+        registry.verify(mongo_client)
+    archive_sweeps = load_archive_sweeps() if KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS > 0 else None
+
     # Load ASN map
     asn_df = pd.read_csv(asn_map_path, dtype=str)
 
+    if progress_enabled():
+        org_paths = [
+            os.path.join(root_directory, country_code, org_folder)
+            for country_code, org_folder in zip(asn_df["country_code"], asn_df["org_folder"])
+        ]
+        progress_total("ingest", sum(
+            len(files) for org_path in org_paths if os.path.isdir(org_path) for _, _, files in os.walk(org_path)
+        ))
+
     for _, row in asn_df.iterrows():
         org_folder = row["org_folder"]
         asn = row["asn"]
@@ -1926,7 +2411,9 @@ async def shadowserver_knowledgebase_ingestion_only(use_tracker=False, tracker_m
             if not os.path.isdir(category_path):
                 continue
 
-            db_collection, discovered_fields_collection, files_collection = await create_database_and_collections(category, db)
+            db_collection, discovered_fields_collection, files_collection = await create_database_and_collections(category, db, registry)
+            if db.name not in existing_databases:
+                created_databases.add(db.name)
             total_files = await count_total_files(category_path)
 
             # ā Pass use_tracker and tracker_mode into ingestion
@@ -1940,19 +2427,36 @@ async def shadowserver_knowledgebase_ingestion_only(use_tracker=False, tracker_m
                 total_files,
                 org_folder,
                 use_tracker=use_tracker,
-                tracker_mode=tracker_mode
+                tracker_mode=tracker_mode,
+                asn=asn
             )
 
             total_file_counter += file_counter
             completed_categories.append(f"{country_code}/{org_folder}/{category}")
             print(f"\n[Knowledgebase] Completed: {country_code}/{org_folder}/{category} ā {file_counter}/{total_files} files.", end="\n", flush=True)
 
+            if archive_sweeps is not None:
+                archive_expired_documents(
+                    db, category, KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS, KNOWLEDGEBASE_ARCHIVE_TTL_DAYS,
+                    sweeps=archive_sweeps, registry=registry
+                )
+
             del db_collection, discovered_fields_collection, files_collection
-            gc.collect()
+            if KNOWLEDGEBASE_FORCE_GC:
+                gc.collect()
 
+        registry.save()
+        if archive_sweeps is not None:
+            save_archive_sweeps(archive_sweeps)
+
+    progress_done("ingest")
     print(f"\nā [Knowledgebase] Total files processed: {total_file_counter}")
     print("ā Completed categories:", completed_categories)
 
+    registry.save()
+    if created_databases:
+        # Invalidate saved ASN → database index snapshots used by the reporting scripts
+        bump_database_marker(mongo_client, reason=f"ingest created {len(created_databases)} database(s)")
     mongo_client.close()
 
 
@@ -1971,11 +2475,23 @@ async def main_shadowserver_knowledgebase_ingestion(
     total_files,
     org_folder,
     use_tracker=False,
-    tracker_mode="manual"  # NEW: manual or auto
+    tracker_mode="manual",  # NEW: manual or auto
+    asn=None
 ):
+    from pymongo import InsertOne
+    
     file_counter = 0
     batch_counter = 0
 
+    # Consolidated storage keeps every org in one collection, so rows carry their owner: the org
+    # and the ASN being ingested (owner_asn). The report's own asn column is left as it is.
+    owner_fields = {"org_folder": org_folder, "owner_asn": asn_field_value(asn)} if is_consolidated() else {}
+
+    # Rows moved to archive_<category> still count as ingested (see archive_expired_documents)
+    archive_collection = (
+        db_collection.database[f"{ARCHIVE_COLLECTION_PREFIX}{category}"] if KNOWLEDGEBASE_ARCHIVE_AFTER_DAYS > 0 else None
+    )
+
     # === Determine final tracker behavior ===
     if tracker_mode == "auto":
         use_tracker = total_files > 2000
@@ -2000,6 +2516,9 @@ async def main_shadowserver_knowledgebase_ingestion(
     FILE_BATCH_SIZE = int(os.getenv("number_of_files_ingested_into_knowledgebase_per_batch", "2000"))
     total_files_found = len(files_list)
 
+    # Union of headers seen in this category, written once per flush
+    pending_fields = set()
+
     for batch_start in range(0, total_files_found, FILE_BATCH_SIZE):
         batch_files = files_list[batch_start:batch_start + FILE_BATCH_SIZE]
         batch_counter += 1
@@ -2009,18 +2528,30 @@ async def main_shadowserver_knowledgebase_ingestion(
             filename = os.path.basename(file_path)
 
             if filename in processed_files:
-                print(f"[Tracker] SKIP {filename}", end="\r", flush=True)
+                detail(f"[Tracker] SKIP {filename}", "ingest")
+                progress("ingest", skipped=True)
                 continue
 
-            if files_collection.find_one({"filename": filename, "category": category, "ingested": True}):
+            add_metric("mongo_ops")
+            if files_collection.find_one({"filename": filename, "category": category, "ingested": True, **owner_fields}):
                 processed_files.add(filename)
+                progress("ingest", skipped=True)
                 continue
 
+            progress("ingest", nbytes=os.path.getsize(file_path))
+
             lines_to_hash = set()
+            add_metric("mongo_ops")
             existing_hashes = set(
                 doc["line_hash"]
-                for doc in db_collection.find({"filename": filename, "category": category}, {"line_hash": 1})
+                for doc in db_collection.find({"filename": filename, "category": category, **owner_fields}, {"line_hash": 1})
             )
+            if archive_collection is not None:
+                add_metric("mongo_ops")
+                existing_hashes.update(
+                    doc["line_hash"]
+                    for doc in archive_collection.find({"filename": filename, "category": category, **owner_fields}, {"line_hash": 1})
+                )
 
             file_successfully_ingested = True
 
@@ -2028,101 +2559,90 @@ async def main_shadowserver_knowledgebase_ingestion(
                 if filename.endswith(".csv"):
                     async with aiofiles.open(file_path, "r", encoding="utf-8", buffering=8192) as f:
                         content = await f.read()
-                        lines = content.splitlines()
+                        records = list(csv.reader(io.StringIO(content)))
+                        del content
 
-                        if not lines:
+                        if not records:
                             continue
 
-                        headers = [h.strip() for h in next(csv.reader(io.StringIO(lines[0])))]
-
-                        for line in lines[1:]:
-                            if not line.strip():
-                                continue
+                        headers = [h.strip() for h in records[0]]
+                        pending_fields.update(h for h in headers if h)
 
-                            reader = csv.reader(io.StringIO(line))
-                            fields = next(reader)
-
-                            if not fields or len(fields) != len(headers):
-                                continue
-
-                            row = dict(zip(headers, fields))
-                            line_hash = await hash_line(row)
+                        for normalized, document, timestamp in normalize_report_columns(headers, records[1:], category):
+                            line_hash = hash_normalized_row(normalized)
 
                             if line_hash in existing_hashes or line_hash in lines_to_hash:
                                 continue
 
-                            row = {k: (v.strip().lower() if isinstance(v, str) else v) for k, v in row.items()}
-                            row.update({
+                            document.update({
                                 "filename": filename,
                                 "category": category,
                                 "line_hash": line_hash,
                                 "geo_folder": country_code
                             })
+                            document.update(owner_fields)
 
-                            timestamp_str = row.get("timestamp")
-                            if timestamp_str:
-                                try:
-                                    date_entry = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                                    row.setdefault("logged_date", date_entry.strftime("%Y-%m-%d %H:%M:%S"))
-                                    row["extracted_date"] = date_entry
-                                except ValueError:
-                                    pass
+                            if timestamp:
+                                document.setdefault("logged_date", timestamp[1])
+                                document["extracted_date"] = timestamp[0]
 
-                            bulk_operations.append(InsertOne(row))
+                            bulk_operations.append(InsertOne(document))
                             lines_to_hash.add(line_hash)
-                            del row
+
+                        del records
 
                 elif filename.endswith(".json"):
                     async with aiofiles.open(file_path, 'r', encoding="utf-8", buffering=1) as jsonfile:
                         try:
                             json_data = await jsonfile.read()
                             json_object = json.loads(json_data)
+                            pending_fields.update(k for k in json_object if k)
 
-                            line_hash = await hash_line(json_object)
+                            normalized, document, timestamp = normalize_report_object(json_object, category)
+                            line_hash = hash_normalized_row(normalized)
 
                             if line_hash not in existing_hashes:
-                                json_object = {k: (v.strip().lower() if isinstance(v, str) else v) for k, v in json_object.items()}
+                                json_object = document
                                 json_object.update({
                                     "filename": filename,
                                     "category": category,
                                     "line_hash": line_hash,
                                     "geo_folder": country_code
                                 })
+                                json_object.update(owner_fields)
 
-                                timestamp_str = json_object.get("timestamp")
-                                if timestamp_str:
-                                    try:
-                                        date_entry = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                                        json_object.setdefault("logged_date", date_entry.strftime("%Y-%m-%d %H:%M:%S"))
-                                        json_object["extracted_date"] = date_entry
-                                    except ValueError:
-                                        pass
+                                if timestamp:
+                                    json_object.setdefault("logged_date", timestamp[1])
+                                    json_object["extracted_date"] = timestamp[0]
 
                                 bulk_operations.append(InsertOne(json_object))
 
                         except Exception as e:
-                            print(f"ā JSON parse error in {filename}: {e}")
+                            report_error(f"ā JSON parse error in {filename}: {e}", "ingest")
                             file_successfully_ingested = False
                         finally:
                             del json_data
                             del json_object
-                            gc.collect()
+                            if KNOWLEDGEBASE_FORCE_GC:
+                                gc.collect()
 
                 else:
                     print(f"āŖ Unknown file type: {filename}")
                     continue
 
             except Exception as e:
-                print(f"ā Error ingesting file {filename}: {e}")
+                report_error(f"ā Error ingesting file {filename}: {e}", "ingest")
                 file_successfully_ingested = False
 
             if file_successfully_ingested:
-                print(f"[Summary ({org_folder}  ā {category}) ] {filename} ā Inserted Document(s): {len(lines_to_hash)}")
+                detail(f"[Summary ({org_folder}  ā {category}) ] {filename} ā Inserted Document(s): {len(lines_to_hash)}", "ingest")
                 files_collection.update_one(
-                    {"filename": filename, "category": category},
+                    {"filename": filename, "category": category, **owner_fields},
                     {"$set": {"ingested": True, "path": file_path}},
                     upsert=True
                 )
+                add_metric("mongo_ops")
+                add_metric("rows", len(lines_to_hash))
                 processed_files.add(filename)
                 file_counter += 1
 
@@ -2132,11 +2652,17 @@ async def main_shadowserver_knowledgebase_ingestion(
         if bulk_operations:
             await flush_bulk_operations(db_collection, bulk_operations)
 
-        print(f"[Knowledgebase ({org_folder})] Category: {category}, Files processed: {file_counter}/{total_files} (Batch {batch_counter})", end="\r", flush=True)
+        if pending_fields:
+            await flush_discovered_fields(discovered_fields_collection, category, pending_fields)
+
+        detail(f"[Knowledgebase ({org_folder})] Category: {category}, Files processed: {file_counter}/{total_files} (Batch {batch_counter})", "ingest")
 
     if use_tracker and processed_tracker_path:
         save_tracker(processed_tracker_path, processed_files)
 
+    # === Indexes for date-window reporting queries (created once, then cached by the registry)
+    ensure_report_query_indexes(db_collection, load_discovered_fields(discovered_fields_collection, category))
+
     return file_counter
 
 
@@ -2145,8 +2671,11 @@ async def main_shadowserver_knowledgebase_ingestion(
 
 
 async def flush_bulk_operations(collection, operations):
+    from pymongo.errors import BulkWriteError
+    
     if not operations:
         return 0
+    add_metric("mongo_ops", len(operations))
     try:
         result = await asyncio.get_running_loop().run_in_executor(
             None,
@@ -2186,9 +2715,9 @@ async def main_sort_service_only(use_tracker=False, service_tracker_mode="manual
     print(f"š [Service Task] Tracker is {'ENABLED' if use_tracker else 'DISABLED'} ({service_tracker_mode.upper()} mode)")
     await sort_shadowserver_by_service(use_tracker=use_tracker, service_tracker_mode=service_tracker_mode)
 
-async def main_knowledgebase_ingestion_only(use_tracker=False, tracker_mode="manual"):
+async def main_knowledgebase_ingestion_only(use_tracker=False, tracker_mode="manual", verify_indexes=False):
     print(f"š§  [Knowledgebase Task] Tracker is {'ENABLED' if use_tracker else 'DISABLED'} ({tracker_mode.upper()} mode)")
-    await shadowserver_knowledgebase_ingestion_only(use_tracker=use_tracker, tracker_mode=tracker_mode)
+    await shadowserver_knowledgebase_ingestion_only(use_tracker=use_tracker, tracker_mode=tracker_mode, verify_indexes=verify_indexes)
 
 async def main_attachment_sorting_migration_only():
     await attachment_sorting_shadowserver_report_migration()
@@ -2199,12 +2728,15 @@ async def main():
 
 
     if len(sys.argv) < 2:
-        print("Usage: python3 shadow_server_data_analysis_system_builder_and_updater.py [email|migrate|refresh|process|country|service|ingest|all] [--tracker] [--tracker=auto] [--tracker-service=auto|manual|off] [--tracker-ingest=auto|manual|off]")
+        print("Usage: python3 shadow_server_data_analysis_system_builder_and_updater.py [email|migrate|refresh|process|country|service|ingest|all] [--tracker] [--tracker=auto] [--tracker-service=auto|manual|off] [--tracker-ingest=auto|manual|off] [--verify-indexes] [--skip-diagnostics] [--quiet|--progress] [--profile|--profile=stage,...]")
         sys.exit(1)
 
     tasks = [arg.lower() for arg in sys.argv[1:] if not arg.startswith("--")]
     flags = [arg.lower() for arg in sys.argv[1:] if arg.startswith("--")]
     force_reset_email = "--reset-email-method" in flags
+    verify_indexes = "--verify-indexes" in flags
+    skip_diagnostics = "--skip-diagnostics" in flags
+    set_console_mode(mode_from_flags(flags))
 
     # === Global tracker override ===
     global_tracker_enabled = False
@@ -2257,6 +2789,10 @@ async def main():
             print(f"ā Unknown task '{task}' ā valid options are: email, refresh, migrate, country, service, ingest, all")
             sys.exit(1)
 
+    # === Configuration for the selected tasks only ===
+    startup(tasks, skip_diagnostics=skip_diagnostics)
+    emit("run_start", tasks=tasks)
+
     # === Tracker Configuration Summary ===
     print("\nš¦ Tracker Configuration:")
     print(f"ā¢ service  ā {'ENABLED' if service_use_tracker else 'DISABLED'} ({service_tracker_mode.upper()} mode)")
@@ -2292,33 +2828,35 @@ async def main():
             print("[TODO] Google Workspace ingestion not implemented yet.")
             await ingest_google_workspace()
     
-        # === Execute all tasks ===
+    # === Execute tasks (each task is measured as one stage, see pipeline_profiler.py) ===
+    async def run_task(task):
+        with profile_stage(task):
+            if task == "email":
+                await handle_email_ingestion(force_reset=force_reset_email)
+            elif task == "migrate":
+                await main_attachment_sorting_migration_only()
+            elif task == "refresh":
+                await main_refresh_shadowserver_whois_only()
+            elif task == "process":
+                await main_shadowserver_processing_only()
+            elif task == "country":
+                await main_sort_country_code_only(use_tracker=country_use_tracker, country_tracker_mode=country_tracker_mode)
+            elif task == "service":
+                await main_sort_service_only(use_tracker=service_use_tracker, service_tracker_mode=service_tracker_mode)
+            elif task == "ingest":
+                await main_knowledgebase_ingestion_only(use_tracker=ingest_use_tracker, tracker_mode=ingest_tracker_mode, verify_indexes=verify_indexes)
+
     if "all" in tasks:
-        await handle_email_ingestion(force_reset=force_reset_email)
-        await main_attachment_sorting_migration_only()
-        await main_refresh_shadowserver_whois_only()
-        await main_shadowserver_processing_only()
-        await main_sort_country_code_only(use_tracker=country_use_tracker, country_tracker_mode=country_tracker_mode)
-        await main_sort_service_only(use_tracker=service_use_tracker, service_tracker_mode=service_tracker_mode)
-        await main_knowledgebase_ingestion_only(use_tracker=ingest_use_tracker, tracker_mode=ingest_tracker_mode)
-        return
+        run_tasks = ["email", "migrate", "refresh", "process", "country", "service", "ingest"]
+    else:
+        run_tasks = tasks
 
-    # === Execute selected tasks ===
-    for task in tasks:
-        if task == "email":
-            await handle_email_ingestion(force_reset=force_reset_email)
-        elif task == "migrate":
-            await main_attachment_sorting_migration_only()
-        elif task == "refresh":
-            await main_refresh_shadowserver_whois_only()
-        elif task == "process":
-            await main_shadowserver_processing_only()
-        elif task == "country":
-            await main_sort_country_code_only(use_tracker=country_use_tracker, country_tracker_mode=country_tracker_mode)
-        elif task == "service":
-            await main_sort_service_only(use_tracker=service_use_tracker, service_tracker_mode=service_tracker_mode)
-        elif task == "ingest":
-            await main_knowledgebase_ingestion_only(use_tracker=ingest_use_tracker, tracker_mode=ingest_tracker_mode)
+    start_run(run_tasks, profile_stages_from_flags(flags, run_tasks))
+    try:
+        for task in run_tasks:
+            await run_task(task)
+    finally:
+        write_run_report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import os
+import shutil
+from urllib.parse import quote
+import pandas as pd
+
+# ========== COLUMNAR STATISTICS STORE ==========
+# The statistics job also writes its per-org summary as a tidy table, one row per
+# (ip or prefix, category):
+#   statistical_parquet/org=<org>/date=<YYYY-MM-DD>/part-0.parquet
+#   columns: ip, prefix, asn, category, count   (org and date come from the partition path)
+# date is the report date used in the statistics CSV filenames, so both stores line up.
+# pyarrow is optional: without it the job skips this stage and the dashboard reads the CSVs.
+
+COLUMNAR_DIR = "statistical_parquet"
+TIDY_COLUMNS = ["ip", "prefix", "asn", "category", "count"]
+
+
+def columnar_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.dataset  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def partition_path(org, date, base_dir=COLUMNAR_DIR):
+    # Hive partition values are URI-encoded so org names with spaces or slashes stay one segment
+    return os.path.join(base_dir, f"org={quote(str(org), safe='')}", f"date={quote(str(date), safe='')}")
+
+
+def has_partition(org, date, base_dir=COLUMNAR_DIR):
+    return os.path.isdir(partition_path(org, date, base_dir))
+
+
+def write_partition(tidy_df, org, date, base_dir=COLUMNAR_DIR):
+    """Replace the (org, date) partition with tidy_df. Returns the file written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = partition_path(org, date, base_dir)
+    # Re-running the job for the same day overwrites instead of appending duplicates
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+    table = pa.Table.from_pandas(tidy_df[TIDY_COLUMNS], preserve_index=False, schema=pa.schema([
+        ("ip", pa.string()),
+        ("prefix", pa.string()),
+        ("asn", pa.string()),
+        ("category", pa.string()),
+        ("count", pa.int64()),
+    ]))
+    file_path = os.path.join(path, "part-0.parquet")
+    pq.write_table(table, file_path, compression="zstd")
+    return file_path
+
+
+def _dataset(orgs, dates, base_dir=COLUMNAR_DIR):
+    """
+    Dataset over just the (org, date) partitions asked for, or None when none exist.
+    Listing the whole store on every query would grow with the history, so the partition
+    directories are resolved directly and only their files are handed to pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    files = []
+    for org in orgs:
+        for date in dates:
+            path = partition_path(org, date, base_dir)
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".parquet")
+                )
+    if not files:
+        return None
+
+    partitioning = ds.partitioning(pa.schema([("org", pa.string()), ("date", pa.string())]), flavor="hive")
+    return ds.dataset(files, format="parquet", partitioning=partitioning, partition_base_dir=base_dir)
+
+
+def read_category_counts(orgs, dates, categories=None, base_dir=COLUMNAR_DIR):
+    """
+    Summed counts per (org, date, category) for the requested orgs and dates.
+    Only the matching partitions are opened.
+    """
+    import pyarrow.dataset as ds
+
+    empty = pd.DataFrame(columns=["org", "date", "category", "count"])
+    if not orgs or not dates or not os.path.isdir(base_dir):
+        return empty
+
+    dataset = _dataset(orgs, dates, base_dir)
+    if dataset is None:
+        return empty
+    expression = ds.field("category").isin(list(categories)) if categories else None
+    table = dataset.to_table(columns=["org", "date", "category", "count"], filter=expression)
+    if table.num_rows == 0:
+        return empty
+    summed = table.group_by(["org", "date", "category"]).aggregate([("count", "sum")])
+    return summed.to_pandas().rename(columns={"count_sum": "count"})
+
+
+def read_tidy_rows(orgs, dates, base_dir=COLUMNAR_DIR):
+    """The tidy rows (org, date, ip, prefix, asn, category, count) for the requested orgs and dates."""
+    columns = ["org", "date"] + TIDY_COLUMNS
+    if not orgs or not dates or not os.path.isdir(base_dir):
+        return pd.DataFrame(columns=columns)
+
+    dataset = _dataset(orgs, dates, base_dir)
+    if dataset is None:
+        return pd.DataFrame(columns=columns)
+    return dataset.to_table(columns=columns).to_pandas()
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import geopandas as gpd
+
+# ========== THREAT MAP CACHE ==========
+# Everything derived from a Natural Earth shapefile is computed once and kept next to data/:
+#   data/map_cache/<shapefile>_centroids.json   ISO_A2 → centroid (x, y) in the shapefile CRS
+#   data/map_cache/<shapefile>_basemap.png      the world drawn once, without axes
+#   data/map_cache/<shapefile>_basemap.json     extent/aspect needed to place the basemap
+# Cache files carry the shapefile's mtime/size and are rebuilt when the shapefile changes.
+
+MAP_CACHE_DIR = os.path.join("data", "map_cache")
+BASEMAP_DPI = 150
+MAP_FIGSIZE = (14, 8)
+MAP_FORMATS = ("png", "svg")
+
+_world_cache = {}
+_centroid_cache = {}
+_basemap_cache = {}
+
+
+def _cache_path(shapefile_path, suffix):
+    stem = os.path.splitext(os.path.basename(shapefile_path))[0]
+    return os.path.join(MAP_CACHE_DIR, f"{stem}_{suffix}")
+
+
+def _source_signature(shapefile_path):
+    stat = os.stat(shapefile_path)
+    return f"{int(stat.st_mtime)}:{stat.st_size}"
+
+
+def _load_cache_json(path, signature):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return data if data.get("source_signature") == signature else None
+
+
+def _save_cache_json(path, data):
+    os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def load_world(shapefile_path):
+    if shapefile_path not in _world_cache:
+        _world_cache[shapefile_path] = gpd.read_file(shapefile_path)
+    return _world_cache[shapefile_path]
+
+
+def load_centroid_table(shapefile_path):
+    """ISO_A2 → (x, y) centroid, computed in EPSG:3857 and returned in the shapefile CRS."""
+    if shapefile_path in _centroid_cache:
+        return _centroid_cache[shapefile_path]
+
+    signature = _source_signature(shapefile_path)
+    table_path = _cache_path(shapefile_path, "centroids.json")
+    cached = _load_cache_json(table_path, signature)
+
+    if cached is not None:
+        centroids = {code: tuple(xy) for code, xy in cached["centroids"].items()}
+    else:
+        world = load_world(shapefile_path)
+        # Project world to metric CRS for accurate centroid calculation, then back
+        centroids_proj = world.to_crs(epsg=3857).set_index('ISO_A2').centroid
+        points = centroids_proj.to_crs(world.crs)
+        centroids = {
+            str(code): (float(point.x), float(point.y))
+            for code, point in points.items()
+            if isinstance(code, str) and point is not None and not point.is_empty
+        }
+        _save_cache_json(table_path, {"source_signature": signature, "centroids": centroids})
+        print(f"[Map Cache] Centroid table saved: {table_path}")
+
+    _centroid_cache[shapefile_path] = centroids
+    return centroids
+
+
+def available_country_codes(shapefile_path):
+    return {code.upper() for code in load_centroid_table(shapefile_path)}
+
+
+def _render_basemap(shapefile_path, image_path):
+    world = load_world(shapefile_path)
+    minx, miny, maxx, maxy = (float(v) for v in world.total_bounds)
+
+    # Same aspect geopandas uses: geographic CRS is stretched by 1/cos(mean latitude)
+    if world.crs is not None and world.crs.is_geographic:
+        aspect = 1 / np.cos(np.deg2rad((miny + maxy) / 2))
+    else:
+        aspect = 1.0
+
+    width = MAP_FIGSIZE[0]
+    height = width * (maxy - miny) * aspect / (maxx - minx)
+    fig = plt.figure(figsize=(width, height))
+    ax = fig.add_axes([0, 0, 1, 1])
+    world.plot(ax=ax, color='lightgrey', edgecolor='white')
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    ax.set_aspect('auto')
+    ax.axis('off')
+    fig.savefig(image_path, dpi=BASEMAP_DPI, transparent=True)
+    plt.close(fig)
+    return {"extent": [minx, maxx, miny, maxy], "aspect": float(aspect)}
+
+
+def load_basemap(shapefile_path):
+    """Pre-rendered world background: {"image": RGBA array, "extent": [...], "aspect": float}."""
+    if shapefile_path in _basemap_cache:
+        return _basemap_cache[shapefile_path]
+
+    signature = _source_signature(shapefile_path)
+    image_path = _cache_path(shapefile_path, "basemap.png")
+    meta_path = _cache_path(shapefile_path, "basemap.json")
+    meta = _load_cache_json(meta_path, signature)
+
+    if meta is None or not os.path.exists(image_path):
+        os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+        meta = _render_basemap(shapefile_path, image_path)
+        meta["source_signature"] = signature
+        _save_cache_json(meta_path, meta)
+        print(f"[Map Cache] Basemap rendered: {image_path}")
+
+    basemap = {"image": plt.imread(image_path), "extent": meta["extent"], "aspect": meta["aspect"]}
+    _basemap_cache[shapefile_path] = basemap
+    return basemap
+
+
+def render_attack_map(attack_data, output_path, shapefile_path, map_date, map_format="png", dpi=100):
+    """Draw only the attack lines over the cached basemap. Returns (src_set, dst_set)."""
+    centroid_dict = load_centroid_table(shapefile_path)
+    basemap = load_basemap(shapefile_path)
+    minx, maxx, miny, maxy = basemap["extent"]
+
+    fig, ax = plt.subplots(figsize=MAP_FIGSIZE)
+    ax.imshow(basemap["image"], extent=basemap["extent"], aspect=basemap["aspect"], interpolation="bilinear")
+
+    src_set, dst_set = set(), set()
+    for src, dst, count in attack_data:
+        if src not in centroid_dict or dst not in centroid_dict:
+            continue
+        (sx, sy), (dx, dy) = centroid_dict[src], centroid_dict[dst]
+        ax.plot([sx, dx], [sy, dy],
+                color='red', linewidth=0.5 + min(count / 10, 3), alpha=0.6)
+        src_set.add(src)
+        dst_set.add(dst)
+
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    ax.set_title(f"Reported Malicious Communication ({map_date})", fontsize=16)
+    ax.axis('off')
+
+    fig.subplots_adjust(bottom=0.15)
+    label = f"From: {', '.join(sorted(src_set))} | To: {', '.join(sorted(dst_set))}"
+    fig.text(0.5, 0.08, label, ha="center", fontsize=10, wrap=True)
+
+    plt.tight_layout()
+    plt.savefig(output_path, format=map_format, dpi=dpi)
+    plt.close(fig)
+    del fig, ax
+
+    return src_set, dst_set
+
+
+# ========== BATCH RENDERER ==========
+
+# Settings are read when used: the report script loads .env after importing this module.
+# threat_map_format: png (dpi via threat_map_dpi, 100 = previous output) or svg for lighter PDFs
+
+def get_map_format():
+    map_format = os.getenv("threat_map_format", "png").strip('"').strip().lower()
+    map_format = map_format if map_format in MAP_FORMATS else "png"
+    if map_format == "svg":
+        try:
+            from svglib.svglib import svg2rlg  # noqa: F401  (places SVG maps in the PDF)
+        except ImportError:
+            print("[Map Render] threat_map_format=svg needs svglib for the PDF. Falling back to png.")
+            map_format = "png"
+    return map_format
+
+
+def get_map_dpi():
+    return int(os.getenv("threat_map_dpi", 100))
+
+
+def get_map_workers():
+    return max(1, int(os.getenv("threat_map_workers", max(1, (os.cpu_count() or 2) // 2))))
+
+
+def map_job(attack_data, output_base, shapefile_path, map_date, map_format=None, dpi=None):
+    """Describe one map; output_base has no extension, the format decides it."""
+    map_format = map_format or get_map_format()
+    return {
+        "attack_data": attack_data,
+        "output_path": f"{output_base}.{map_format}",
+        "shapefile_path": shapefile_path,
+        "map_date": map_date,
+        "map_format": map_format,
+        "dpi": dpi or get_map_dpi(),
+    }
+
+
+def render_map_job(job):
+    started = time.perf_counter()
+    src_set, dst_set = render_attack_map(
+        job["attack_data"], job["output_path"], job["shapefile_path"], job["map_date"],
+        map_format=job["map_format"], dpi=job["dpi"]
+    )
+    return job["output_path"], src_set, dst_set, time.perf_counter() - started
+
+
+def _warm_worker(shapefile_paths):
+    # Each worker loads geometry, centroids and basemap once, before its first job
+    for shapefile_path in shapefile_paths:
+        load_centroid_table(shapefile_path)
+        load_basemap(shapefile_path)
+
+
+def render_map_batch(jobs, workers=None):
+    """
+    Render map jobs, in a spawn-based process pool when more than one worker is configured.
+    Returns results in job order: (output_path, src_set, dst_set, seconds), or an Exception.
+    """
+    if not jobs:
+        return []
+    workers = min(workers or get_map_workers(), len(jobs))
+    shapefile_paths = sorted({job["shapefile_path"] for job in jobs})
+
+    # Build the on-disk caches once in the parent so workers never race to write them
+    _warm_worker(shapefile_paths)
+
+    started = time.perf_counter()
+    results = []
+    if workers <= 1:
+        for job in jobs:
+            try:
+                results.append(render_map_job(job))
+            except Exception as e:
+                results.append(e)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(shapefile_paths,)
+        ) as pool:
+            futures = [pool.submit(render_map_job, job) for job in jobs]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+
+    elapsed = time.perf_counter() - started
+    print(f"[Map Render] {len(jobs)} map(s) in {elapsed:.2f}s with {workers} worker(s) ({jobs[0]['map_format']})")
+    return results
+
+
+def map_flowable(map_path, width=500, height=280):
+    """ReportLab flowable for a finished map (PNG image or scaled SVG drawing)."""
+    if map_path.lower().endswith(".svg"):
+        from svglib.svglib import svg2rlg
+        drawing = svg2rlg(map_path)
+        scale_x, scale_y = width / drawing.width, height / drawing.height
+        drawing.width, drawing.height = width, height
+        drawing.scale(scale_x, scale_y)
+        return drawing
+    from reportlab.platypus import Image
+    return Image(map_path, width=width, height=height)